@@ -0,0 +1,50 @@
+"""批量货币转换基准测试：对比逐个调用 currency_convert 与向量化批量转换
+
+运行方式：
+    python3 exam_funcall/bench_currency_batch.py [转换次数]
+"""
+import sys
+import time
+
+import numpy as np
+
+from exam_funcall.func_advanced import currency_convert
+from exam_funcall.currency_rates import currency_convert_batch, get_rate_table
+
+def run_benchmark(count: int = 1_000_000) -> None:
+    """生成随机转换请求，对比两种实现的耗时并校验结果一致"""
+    rng = np.random.default_rng(0)
+    table = get_rate_table()
+    amounts = np.round(rng.uniform(0, 100_000, count), 2)
+    from_ids = rng.integers(0, len(table.codes), count)
+    to_ids = rng.integers(0, len(table.codes), count)
+    from_codes = table.codes[from_ids]
+    to_codes = table.codes[to_ids]
+
+    # 逐个调用（跳过日志装饰器，只测转换本身）
+    scalar = currency_convert.__wrapped__
+    start = time.perf_counter()
+    expected = [
+        scalar(amount, from_currency, to_currency)["converted_amount"]
+        for amount, from_currency, to_currency in zip(amounts.tolist(), from_codes.tolist(), to_codes.tolist())
+    ]
+    scalar_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    by_code = currency_convert_batch(amounts, from_codes, to_codes)
+    by_code_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    by_id = currency_convert_batch(amounts, from_ids, to_ids)
+    by_id_ms = (time.perf_counter() - start) * 1000
+
+    assert np.array_equal(by_code["converted_amount"], np.asarray(expected)), "批量转换结果与标量函数不一致"
+    assert np.array_equal(by_id["converted_amount"], by_code["converted_amount"]), "按ID与按代码转换结果不一致"
+
+    print(f"转换次数: {count}")
+    print(f"逐个调用:       {scalar_ms:10.1f} ms")
+    print(f"批量（货币代码）: {by_code_ms:10.1f} ms  ({scalar_ms / by_code_ms:.0f}x)")
+    print(f"批量（整数ID）:   {by_id_ms:10.1f} ms  ({scalar_ms / by_id_ms:.0f}x)")
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
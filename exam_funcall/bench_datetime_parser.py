@@ -0,0 +1,67 @@
+"""日期时间表达式解析基准测试：批量解析的吞吐量和解析失败率
+
+运行方式：
+    python3 exam_funcall/bench_datetime_parser.py [解析次数]
+"""
+import sys
+import time
+import random
+from datetime import datetime, timedelta
+
+from exam_funcall.datetime_parser import parse_datetime_expression, cache_info
+
+# 模型常见的输出变体
+EXPRESSIONS = [
+    "+2 hours", "+30 minutes", "+1 days", "+2h", "+30m", "+1d", "+1.5 hours", "+2 Hours",
+    "in 30 minutes", "in 2 hours", "30 minutes later", "2小时后", "30分钟后", "+3 天",
+    "2025-02-03T15:00:00", "2025-02-03", "2025-02-03 15:00", "2025-02-03T15:00:00Z",
+    "2025-02-03T15:00:00+08:00", "2025/02/03 15:00",
+]
+
+def legacy_parse(datetime_str: str) -> datetime:
+    """原 schedule_reminder 中的解析逻辑"""
+    if datetime_str.startswith('+'):
+        parts = datetime_str[1:].split()
+        if len(parts) != 2:
+            raise ValueError("Invalid relative time format. Expected format: '+N hours/minutes/days'")
+        amount = int(parts[0])
+        unit = parts[1].lower()
+        if unit not in ['hours', 'minutes', 'days']:
+            raise ValueError("Invalid time unit. Must be 'hours', 'minutes', or 'days'")
+        delta = {
+            'hours': timedelta(hours=amount),
+            'minutes': timedelta(minutes=amount),
+            'days': timedelta(days=amount)
+        }[unit]
+        return datetime.now() + delta
+    return datetime.fromisoformat(datetime_str)
+
+def run(parse, expressions) -> tuple:
+    """返回 (耗时毫秒, 失败次数)"""
+    failures = 0
+    start = time.perf_counter()
+    for expression in expressions:
+        try:
+            parse(expression)
+        except ValueError:
+            failures += 1
+    return (time.perf_counter() - start) * 1000, failures
+
+def run_benchmark(count: int = 200_000) -> None:
+    """对随机抽取的表达式批量解析，对比原实现与新实现"""
+    rng = random.Random(0)
+    expressions = [rng.choice(EXPRESSIONS) for _ in range(count)]
+
+    print("各变体的解析结果：")
+    for expression in EXPRESSIONS:
+        legacy_ok = run(legacy_parse, [expression])[1] == 0
+        print(f"  {expression:<28} 原实现: {'成功' if legacy_ok else '失败'}  新实现: {parse_datetime_expression(expression)}")
+
+    legacy_ms, legacy_failures = run(legacy_parse, expressions)
+    new_ms, new_failures = run(parse_datetime_expression, expressions)
+    print(f"\n批量解析 {count} 次：")
+    print(f"  原实现: {legacy_ms:9.1f} ms  失败率 {legacy_failures / count:6.1%}")
+    print(f"  新实现: {new_ms:9.1f} ms  失败率 {new_failures / count:6.1%}  缓存 {cache_info()}")
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,151 @@
+"""入口模块冷启动基准测试（基于 python -X importtime）
+每个入口在独立的子进程中导入，解析 -X importtime 的输出，报告：
+- import_ms: 导入入口模块本身的累计耗时（已扣除解释器启动时就会导入的模块），多次运行取中位数
+- heaviest: 耗时最多的几个顶层依赖
+- loaded: 应当延迟导入、却在导入入口时被加载的重型依赖（例如 openai、numpy）
+
+导入耗时超过入口的预算，或者重型依赖被提前加载时，以退出码 1 结束。
+
+运行方式：
+    python3 exam_funcall/bench_import_time.py --output bench_import_time.json
+    python3 exam_funcall/bench_import_time.py --runs 5 --only func_caller
+"""
+import os
+import sys
+import argparse
+import platform
+import statistics
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+from exam_funcall.function_caller.infra import fast_json
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 入口名 -> (模块, 额外的 sys.path 目录, 导入耗时预算 ms, 不应在导入时加载的依赖)
+ENTRY_POINTS: Dict[str, Tuple[str, Optional[str], float, Tuple[str, ...]]] = {
+    "func_caller": ("exam_funcall.function_caller.func_caller", None, 300, ("openai", "numpy", "colorlog")),
+    "func_advanced": ("exam_funcall.func_advanced", None, 300, ("openai", "numpy")),
+    "funcall_service": ("exam_funcall.funcall_service", None, 350, ("openai",)),
+    "weather_agent": ("exam_pai_complex.weather_agent", None, 1200, ("openai",)),
+    "question_graph_cli": ("question_graph_cli", "exam_pai_graph", 1200, ("openai",)),
+}
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """解析 -X importtime 输出，返回 (模块名, 累计微秒, 嵌套层级) 列表，顶层模块的层级为 0"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # 表头
+        # 模块名前有一个空格，每嵌套一层多缩进两个空格
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), int(cumulative), depth))
+    return modules
+
+def run_importtime(code: str, extra_path: Optional[str] = None) -> Tuple[List[Tuple[str, int, int]], str]:
+    """在子进程中执行 code，返回各模块导入耗时和标准输出"""
+    env = dict(os.environ)
+    paths = [REPO_ROOT] + ([os.path.join(REPO_ROOT, extra_path)] if extra_path else [])
+    env["PYTHONPATH"] = os.pathsep.join(paths + [env.get("PYTHONPATH", "")]).rstrip(os.pathsep)
+    # 导入时不会访问网络，但部分模块读取 Azure 配置
+    env.setdefault("AZURE_OPENAI_API_KEY", "bench")
+    env.setdefault("AZURE_OPENAI_ENDPOINT", "https://bench.invalid")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=os.path.join(REPO_ROOT, extra_path) if extra_path else REPO_ROOT,
+        env=env, capture_output=True, text=True, timeout=120
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"执行失败: {code}\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr), result.stdout
+
+def measure_entry(module: str, extra_path: Optional[str], watched: Tuple[str, ...], runs: int) -> Dict:
+    """多次冷启动导入一个入口模块，返回导入耗时中位数、最重的依赖和提前加载的依赖"""
+    startup, _ = run_importtime("pass", extra_path)
+    startup_modules = {name for name, _, depth in startup if depth == 0}
+    code = f"import sys, {module}; print(','.join(m for m in {list(watched)!r} if m in sys.modules))"
+
+    totals = []
+    heaviest = []
+    loaded = []
+    for _ in range(runs):
+        modules, stdout = run_importtime(code, extra_path)
+        top_level = [(name, us) for name, us, depth in modules if depth == 0 and name not in startup_modules]
+        totals.append(sum(us for _, us in top_level) / 1000)
+        # 入口模块的直接依赖（以及入口之前先导入的顶层模块）
+        dependencies = [(name, us) for name, us, depth in modules
+                        if depth == 1 or (depth == 0 and name not in startup_modules and name != module)]
+        heaviest = sorted(dependencies, key=lambda item: -item[1])[:5]
+        loaded = [m for m in stdout.strip().split(",") if m]
+    return {
+        "module": module,
+        "import_ms": round(statistics.median(totals), 1),
+        "min_ms": round(min(totals), 1),
+        "heaviest": [{"module": name, "ms": round(us / 1000, 1)} for name, us in heaviest],
+        "loaded": loaded,
+    }
+
+def run_suite(runs: int, only: Optional[List[str]] = None) -> Dict:
+    results = {}
+    for name, (module, extra_path, budget_ms, watched) in ENTRY_POINTS.items():
+        if only and name not in only:
+            continue
+        result = measure_entry(module, extra_path, watched, runs)
+        result["budget_ms"] = budget_ms
+        results[name] = result
+        heaviest = ", ".join(f"{item['module']} {item['ms']}" for item in result["heaviest"][:3])
+        print(f"{name:<20} {result['import_ms']:>8.1f} ms (预算 {budget_ms:.0f} ms)  "
+              f"最重: {heaviest}  提前加载: {result['loaded'] or '无'}")
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "meta": {
+            "commit": commit or "unknown",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "runs": runs,
+        },
+        "results": results,
+    }
+
+def check_budgets(report: Dict) -> List[str]:
+    """返回超出预算或提前加载重型依赖的入口"""
+    failures = []
+    for name, result in report["results"].items():
+        if result["import_ms"] > result["budget_ms"]:
+            failures.append(f"{name}: {result['import_ms']} ms > 预算 {result['budget_ms']} ms")
+        if result["loaded"]:
+            failures.append(f"{name}: 导入时加载了 {', '.join(result['loaded'])}")
+    return failures
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="入口模块冷启动基准测试（-X importtime）")
+    parser.add_argument("--output", help="结果写入的JSON文件")
+    parser.add_argument("--runs", type=int, default=3, help="每个入口的冷启动次数（取中位数）")
+    parser.add_argument("--only", nargs="+", choices=sorted(ENTRY_POINTS), help="只测量指定入口")
+    args = parser.parse_args()
+
+    report = run_suite(args.runs, args.only)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(fast_json.dumps(report, indent=True))
+        print(f"结果已写入 {args.output}")
+
+    failures = check_budgets(report)
+    if failures:
+        print("冷启动超出预算：")
+        for line in failures:
+            print(f"  {line}")
+        return 1
+    print("所有入口均在预算内")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
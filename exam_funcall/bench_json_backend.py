@@ -0,0 +1,86 @@
+"""JSON后端基准测试：对比每轮函数调用的CPU耗时
+旧路径：标准库 json.loads 解析参数 + 完整 response.model_dump() + json.dumps(indent=2) 记录日志
+新路径：fast_json 解析参数 + 只序列化 choices[0].message 记录日志
+
+运行方式：
+    python3 exam_funcall/bench_json_backend.py [轮数]
+"""
+import sys
+import json
+import time
+
+from openai.types.chat import ChatCompletion
+
+from exam_funcall.function_caller.infra import fast_json
+
+def build_response(tool_count: int = 6, payload_size: int = 2000) -> ChatCompletion:
+    """构造包含大参数 tool_calls 的响应"""
+    arguments = json.dumps({
+        "title": "季度复盘会议",
+        "datetime_str": "+2 hours",
+        "priority": "high",
+        "participants": [f"member{i}@example.com" for i in range(payload_size)]
+    }, ensure_ascii=False)
+    return ChatCompletion.model_validate({
+        "id": "chatcmpl-bench",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4o",
+        "choices": [{
+            "index": 0,
+            "finish_reason": "tool_calls",
+            "message": {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {
+                        "id": f"call_{i}",
+                        "type": "function",
+                        "function": {"name": "schedule_reminder", "arguments": arguments}
+                    }
+                    for i in range(tool_count)
+                ]
+            }
+        }],
+        "usage": {"prompt_tokens": 1000, "completion_tokens": 500, "total_tokens": 1500}
+    })
+
+def turn_before(response: ChatCompletion) -> None:
+    """改造前的每轮处理"""
+    response_data = response.model_dump()
+    json.dumps(response_data, indent=2, ensure_ascii=False)
+    for tool_call in response.choices[0].message.tool_calls:
+        json.loads(tool_call.function.arguments)
+
+def turn_after(response: ChatCompletion) -> None:
+    """改造后的每轮处理"""
+    message = response.choices[0].message
+    fast_json.dumps(message.model_dump(exclude_none=True), indent=True)
+    for tool_call in message.tool_calls:
+        fast_json.loads(tool_call.function.arguments)
+
+def measure(func, response: ChatCompletion, rounds: int) -> float:
+    """返回每轮平均CPU耗时（毫秒）"""
+    func(response)  # 预热
+    start = time.process_time()
+    for _ in range(rounds):
+        func(response)
+    return (time.process_time() - start) * 1000 / rounds
+
+def run_benchmark(rounds: int = 50) -> None:
+    """对不同负载大小和JSON后端运行基准测试"""
+    print(f"{'payload':>8} {'backend':>8} {'before(ms)':>11} {'after(ms)':>10} {'speedup':>8}")
+    for payload_size in (100, 2000, 20000):
+        response = build_response(payload_size=payload_size)
+        before = measure(turn_before, response, rounds)
+        for backend in fast_json.BACKENDS:
+            try:
+                fast_json.set_backend(backend)
+            except ImportError:
+                continue
+            after = measure(turn_after, response, rounds)
+            print(f"{payload_size:>8} {backend:>8} {before:>11.3f} {after:>10.3f} {before / after:>7.1f}x")
+    fast_json.set_backend()
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
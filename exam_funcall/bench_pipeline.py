@@ -0,0 +1,247 @@
+"""函数调用流水线基准测试（不含网络）
+用进程内的假 client 返回预先构造的 tool_calls，驱动 GPTFunctionCaller 的完整流程，
+测量我们自己的开销：消息准备、日志、JSON处理和函数分发。
+
+每个场景（工具数量 1/6/50 × 日志开/关 × call_single_function/call_with_conversation）报告：
+- turn_us: 每轮（每次模型请求）的平均开销，已扣除假 client 构造响应的耗时
+- calls_per_sec: 每秒完成的调用次数
+- peak_kb: 单次调用的 tracemalloc 峰值内存
+
+运行方式：
+    python3 exam_funcall/bench_pipeline.py --output bench_pipeline.json
+    python3 exam_funcall/bench_pipeline.py --compare bench_pipeline.json --threshold 0.2
+与基准结果相比 turn_us 或 peak_kb 增长超过阈值时，以退出码 1 结束。
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import platform
+import subprocess
+import tracemalloc
+from types import SimpleNamespace
+from typing import Dict, List
+
+# 假 client 不会访问网络，但 GPTBase 初始化时需要 Azure 配置
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "bench")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://bench.invalid")
+
+from openai.types.chat import ChatCompletion
+
+from exam_funcall.function_caller.func_caller import GPTFunctionCaller
+from exam_funcall.function_caller.infra import logger, fast_json
+
+TOOL_COUNTS = (1, 6, 50)
+CALLS_PER_TURN = 3  # 每轮响应中的 tool_calls 数量（不超过工具数量）
+MODES = ("single", "conversation")
+
+def build_tools(count: int):
+    """构造 count 个工具的描述和实现"""
+    functions = [
+        {
+            "name": f"tool_{i}",
+            "description": f"第 {i} 个基准测试工具，返回输入城市和日期对应的数据",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "city": {"type": "string", "description": "城市名称"},
+                    "date": {"type": "string", "description": "日期（YYYY-MM-DD）"},
+                    "limit": {"type": "integer", "description": "最多返回的数量"}
+                },
+                "required": ["city"]
+            }
+        }
+        for i in range(count)
+    ]
+
+    def tool(city: str, date: str = "", limit: int = 10) -> Dict:
+        return {"city": city, "date": date, "items": list(range(limit))}
+
+    return functions, {f["name"]: tool for f in functions}
+
+def build_response(tool_count: int, final: bool = False) -> Dict:
+    """构造假响应的原始字典：带 tool_calls 的响应，或最终的文本响应"""
+    calls = [
+        {
+            "id": f"call_{i}",
+            "type": "function",
+            "function": {
+                "name": f"tool_{i % tool_count}",
+                "arguments": fast_json.dumps({"city": "北京", "date": "2025-02-03", "limit": 5})
+            }
+        }
+        for i in range(min(CALLS_PER_TURN, tool_count))
+    ]
+    return {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4o",
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop" if final else "tool_calls",
+            "message": {
+                "role": "assistant",
+                "content": "北京的查询结果已汇总。" if final else None,
+                "tool_calls": None if final else calls
+            }
+        }],
+        "usage": {"prompt_tokens": 1000, "completion_tokens": 50, "total_tokens": 1050}
+    }
+
+class FakeCompletions:
+    """返回预构造响应的假 chat.completions
+    对话中已有工具结果时返回最终文本响应，否则返回 tool_calls。
+    构造响应对象的耗时记录在 elapsed 中，以便从测量结果中扣除。
+    """
+
+    def __init__(self, tool_count: int):
+        self.tool_response = build_response(tool_count)
+        self.final_response = build_response(tool_count, final=True)
+        self.requests = 0
+        self.elapsed = 0.0
+
+    def create(self, messages: List[Dict], **kwargs) -> ChatCompletion:
+        start = time.perf_counter()
+        self.requests += 1
+        has_tool_result = any(isinstance(m, dict) and m.get("role") == "tool" for m in messages)
+        data = self.final_response if has_tool_result else self.tool_response
+        # 调用方会修改响应对象，每次返回新对象
+        response = ChatCompletion.model_validate(data)
+        self.elapsed += time.perf_counter() - start
+        return response
+
+def build_caller(tool_count: int) -> GPTFunctionCaller:
+    functions, function_map = build_tools(tool_count)
+    caller = GPTFunctionCaller(functions=functions, function_map=function_map, debug=False)
+    caller.client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(tool_count)))
+    return caller
+
+def set_logging(enabled: bool) -> None:
+    """开启日志时输出到 os.devnull，只测量格式化和写入的开销；关闭时恢复输出到 stderr"""
+    handler = logger.handler
+    if enabled:
+        handler.setStream(open(os.devnull, "w", encoding="utf-8"))
+        logger.logger.setLevel(logging.DEBUG)
+    else:
+        stream = handler.setStream(sys.stderr)
+        if stream is not None and stream is not sys.stderr:
+            stream.close()
+        logger.logger.setLevel(logging.CRITICAL * 100)
+
+def run_call(caller: GPTFunctionCaller, mode: str) -> None:
+    if mode == "single":
+        caller.call_single_function("查询北京的数据", system_message="你是基准测试助手。")
+    else:
+        caller.call_with_conversation("查询北京的数据并汇总", system_message="你是基准测试助手。")
+
+def measure_scenario(tool_count: int, logging_enabled: bool, mode: str, calls: int, rounds: int) -> Dict:
+    """测量一个场景，耗时取多轮中的最小值以减少噪声"""
+    set_logging(logging_enabled)
+    caller = build_caller(tool_count)
+    completions = caller.client.chat.completions
+    for _ in range(5):  # 预热
+        run_call(caller, mode)
+
+    best = None
+    for _ in range(rounds):
+        completions.requests, completions.elapsed = 0, 0.0
+        start = time.perf_counter()
+        for _ in range(calls):
+            run_call(caller, mode)
+        elapsed = time.perf_counter() - start
+        overhead = elapsed - completions.elapsed
+        if best is None or overhead < best[0]:
+            best = (overhead, completions.requests)
+    overhead, requests = best
+
+    tracemalloc.start()
+    run_call(caller, mode)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "tools": tool_count,
+        "logging": logging_enabled,
+        "mode": mode,
+        "turn_us": round(overhead / requests * 1e6, 2),
+        "calls_per_sec": round(calls / overhead, 1),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def run_suite(calls: int = 200, rounds: int = 5) -> Dict:
+    """运行全部场景"""
+    results = {}
+    for tool_count in TOOL_COUNTS:
+        for logging_enabled in (False, True):
+            for mode in MODES:
+                result = measure_scenario(tool_count, logging_enabled, mode, calls, rounds)
+                key = f"{mode}/tools={tool_count}/logging={'on' if logging_enabled else 'off'}"
+                results[key] = result
+                print(
+                    f"{key:<36} {result['turn_us']:>10.1f} us/turn "
+                    f"{result['calls_per_sec']:>10.1f} calls/s {result['peak_kb']:>9.1f} KB peak"
+                )
+    set_logging(False)
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "json_backend": fast_json.backend_name(),
+            "calls": calls,
+            "rounds": rounds,
+        },
+        "results": results,
+    }
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """与基准结果比较，返回超过阈值的回退项"""
+    regressions = []
+    for key, result in current["results"].items():
+        base = baseline["results"].get(key)
+        if base is None:
+            continue
+        for metric in ("turn_us", "peak_kb"):
+            if base[metric] > 0 and result[metric] > base[metric] * (1 + threshold):
+                change = result[metric] / base[metric] - 1
+                regressions.append(f"{key} {metric}: {base[metric]} -> {result[metric]} (+{change:.0%})")
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="函数调用流水线基准测试（不含网络）")
+    parser.add_argument("--output", help="结果写入的JSON文件")
+    parser.add_argument("--compare", help="用于回归检查的基准结果JSON文件")
+    parser.add_argument("--threshold", type=float, default=0.2, help="允许的增长比例（默认0.2）")
+    parser.add_argument("--calls", type=int, default=200, help="每轮测量的调用次数")
+    parser.add_argument("--rounds", type=int, default=5, help="测量轮数（取最快的一轮）")
+    args = parser.parse_args()
+
+    report = run_suite(args.calls, args.rounds)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(fast_json.dumps(report, indent=True))
+        print(f"结果已写入 {args.output}")
+
+    if args.compare:
+        with open(args.compare, "rb") as f:
+            baseline = fast_json.loads(f.read())
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"与 {baseline['meta']['commit']} 相比存在性能回退：")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"与 {baseline['meta']['commit']} 相比无超过 {args.threshold:.0%} 的回退")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
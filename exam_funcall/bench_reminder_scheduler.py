@@ -0,0 +1,68 @@
+"""提醒调度器基准测试：插入、取消和触发的吞吐量
+
+运行方式：
+    python3 exam_funcall/bench_reminder_scheduler.py [提醒数量]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+from exam_funcall.reminder_scheduler import ReminderScheduler
+
+def make_reminders(count: int, seed: int = 0):
+    """生成未来一天内随机时间的提醒"""
+    rng = random.Random(seed)
+    base = datetime.now()
+    return [
+        {
+            "id": f"r{i}",
+            "title": f"提醒{i}",
+            "time": (base + timedelta(seconds=rng.uniform(0, 86400))).isoformat(),
+            "priority": "normal",
+            "participants": []
+        }
+        for i in range(count)
+    ]
+
+def report(name: str, count: int, seconds: float) -> None:
+    print(f"{name:<16} {count:>8} 条  {seconds * 1000:>9.1f} ms  {count / seconds:>12,.0f} 条/秒")
+
+def run_benchmark(count: int = 200_000) -> None:
+    """分别测试内存模式和追加日志模式"""
+    reminders = make_reminders(count)
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, log_path in (("内存", None), ("追加日志", os.path.join(tmp, "reminders.jsonl"))):
+            print(f"\n[{label}]")
+            scheduler = ReminderScheduler(log_path)
+            start = time.perf_counter()
+            for reminder in reminders[:count // 2]:
+                scheduler.add(reminder)
+            report("逐个插入", count // 2, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            scheduler.add_many(reminders[count // 2:])
+            report("批量插入", count - count // 2, time.perf_counter() - start)
+
+            cancel_ids = [r["id"] for r in reminders[::10]]
+            start = time.perf_counter()
+            for reminder_id in cancel_ids:
+                scheduler.cancel(reminder_id)
+            report("取消", len(cancel_ids), time.perf_counter() - start)
+
+            if log_path:
+                scheduler.close()
+                start = time.perf_counter()
+                scheduler = ReminderScheduler(log_path)
+                report("日志恢复", len(scheduler), time.perf_counter() - start)
+
+            start = time.perf_counter()
+            fired = scheduler.fire_due(now=float("inf"))
+            report("触发", len(fired), time.perf_counter() - start)
+            assert len(fired) == count - len(cancel_ids), "触发数量不正确"
+            scheduler.close()
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,117 @@
+"""请求调度器基准测试：批量任务压满并发时交互请求的延迟
+假 LLM 每次请求固定耗时，批量租户从多个线程持续提交请求，同时一个交互用户逐个发送请求。
+对比先到先服务（所有请求同一类别、同一租户）与按优先级/租户调度时：
+- 交互请求的端到端延迟
+- 小租户的批量任务完成时间（租户公平）
+- 带截止时间的批量请求被提前丢弃的数量
+
+运行方式：
+    python3 exam_funcall/bench_request_scheduler.py [批量请求数]
+"""
+import sys
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from exam_funcall.function_caller.infra.request_scheduler import (
+    DeadlineExceeded,
+    RequestScheduler,
+    ScheduledClient,
+    request_context
+)
+
+LLM_LATENCY = 0.01  # 模拟模型请求耗时（秒）
+MAX_CONCURRENCY = 4
+
+class FakeCompletions:
+    def create(self, **kwargs):
+        time.sleep(LLM_LATENCY)
+        return {"choices": []}
+
+def run_scenario(scheduled: bool, batch_requests: int, batch_timeout: float = None) -> dict:
+    """运行一个场景，返回交互延迟、小租户完成时间和丢弃数"""
+    classes = ("interactive", "batch") if scheduled else ("fifo",)
+    scheduler = RequestScheduler(max_concurrency=MAX_CONCURRENCY, classes=classes)
+    client = ScheduledClient(SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions())), scheduler)
+    dropped = [0]
+    lock = threading.Lock()
+
+    def request(priority: str, tenant: str, timeout: float = None) -> None:
+        if not scheduled:
+            priority, tenant = "fifo", "all"
+        with request_context(priority=priority, tenant=tenant, timeout=timeout):
+            try:
+                client.chat.completions.create(model="fake", messages=[])
+            except DeadlineExceeded:
+                with lock:
+                    dropped[0] += 1
+
+    start = time.perf_counter()
+    small_done = []
+
+    def small_tenant() -> None:
+        for _ in range(batch_requests // 10):
+            request("batch", "small", batch_timeout)
+        small_done.append(time.perf_counter() - start)
+
+    with ThreadPoolExecutor(max_workers=32) as executor:
+        executor.map(lambda _: request("batch", "large", batch_timeout), range(batch_requests))
+        small = threading.Thread(target=small_tenant)
+        small.start()
+
+        time.sleep(LLM_LATENCY * 5)  # 等待批量请求压满队列
+        latencies = []
+        for _ in range(20):
+            t0 = time.perf_counter()
+            request("interactive", "user")
+            latencies.append(time.perf_counter() - t0)
+        small.join()
+
+    p50, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 99])
+    return {
+        "interactive_p50_ms": round(float(p50), 1),
+        "interactive_p99_ms": round(float(p99), 1),
+        "small_tenant_done_s": round(small_done[0], 2),
+        "dropped": dropped[0],
+        "total_s": round(time.perf_counter() - start, 2),
+    }
+
+def check_cancel_accounting() -> None:
+    """取消一个已被分发丢弃、但结果尚未送达的 aslot 等待方，槽位计数和服务时间不应受影响"""
+    now = [0.0]
+    scheduler = RequestScheduler(max_concurrency=1, clock=lambda: now[0])
+
+    async def scenario() -> None:
+        holder = scheduler.slot()
+        holder.__enter__()
+
+        async def waiter() -> None:
+            async with scheduler.aslot(deadline=now[0] + 1.0):
+                pass
+
+        task = asyncio.create_task(waiter())
+        await asyncio.sleep(0)  # 等待方进入队列
+        now[0] += 5.0  # 服务时间估计变长，释放时等待方被判定为无法按时完成
+        holder.__exit__(None, None, None)
+        task.cancel()  # 丢弃结果送达之前取消
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+    stats = scheduler.stats["interactive"]
+    assert scheduler.running == 0, f"取消后槽位计数不正确: {scheduler.running}"
+    assert stats.completed == 1 and stats.service_time == 5.0, f"取消的请求不应计入服务时间: {stats}"
+
+def run_benchmark(batch_requests: int = 800) -> None:
+    check_cancel_accounting()
+    print(f"假 LLM 耗时 {LLM_LATENCY * 1000:.0f} ms，并发 {MAX_CONCURRENCY}，大租户 {batch_requests} 个批量请求，"
+          f"小租户 {batch_requests // 10} 个")
+    print(f"先到先服务:     {run_scenario(False, batch_requests)}")
+    print(f"优先级+公平:    {run_scenario(True, batch_requests)}")
+    print(f"批量截止 50 ms: {run_scenario(True, batch_requests, batch_timeout=0.05)}")
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 800)
@@ -0,0 +1,93 @@
+"""餐厅存储基准测试：对比线性过滤与索引查询的延迟
+
+运行方式：
+    python3 exam_funcall/bench_restaurant_store.py [行数 ...]
+"""
+import os
+import sys
+import time
+import tempfile
+
+import numpy as np
+
+from exam_funcall.restaurant_store import RestaurantStore, PRICE_RANGES
+
+LOCATIONS = [f"城市{i}" for i in range(300)]
+CUISINES = ["中餐", "意大利菜", "日本料理", "法国菜", "韩国料理", "泰国菜", "印度菜", "西班牙菜", "墨西哥菜", "火锅"]
+
+QUERIES = [
+    {"location": "城市1"},
+    {"location": "城市2", "cuisine_type": "中餐"},
+    {"location": "城市3", "cuisine_type": "日本料理", "price_range": "$$$"},
+    {"location": "城市4", "cuisine_type": "火锅", "price_range": "$", "min_rating": 4.8},
+]
+
+def generate_columns(rows: int, seed: int = 0):
+    """生成随机的餐厅列数据"""
+    rng = np.random.default_rng(seed)
+    return {
+        "names": np.char.add("餐厅", np.arange(rows).astype(str)),
+        "cuisines": np.asarray(CUISINES)[rng.integers(0, len(CUISINES), rows)],
+        "locations": np.asarray(LOCATIONS)[rng.integers(0, len(LOCATIONS), rows)],
+        "price_ranges": np.asarray(PRICE_RANGES)[rng.integers(0, len(PRICE_RANGES), rows)],
+        "ratings": np.round(rng.uniform(2.0, 5.0, rows), 1),
+    }
+
+def linear_search(restaurants, location, cuisine_type=None, price_range=None, min_rating=4.0, limit=10):
+    """原 search_restaurants 的线性过滤，再按评分取前 limit 个"""
+    results = []
+    for restaurant in restaurants:
+        if restaurant["location"] != location:
+            continue
+        if cuisine_type and restaurant["cuisine"] != cuisine_type:
+            continue
+        if price_range and restaurant["price_range"] != price_range:
+            continue
+        if restaurant["rating"] < min_rating:
+            continue
+        results.append(restaurant)
+    results.sort(key=lambda r: -r["rating"])
+    return results[:limit]
+
+def measure(func, repeat: int) -> float:
+    """返回每次查询的平均耗时（毫秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in QUERIES:
+            func(**query)
+    return (time.perf_counter() - start) * 1000 / (repeat * len(QUERIES))
+
+def run_benchmark(sizes=(10_000, 1_000_000)) -> None:
+    """对不同数据规模运行基准测试"""
+    print(f"{'rows':>10} {'load(ms)':>9} {'linear(ms)':>11} {'indexed(ms)':>12} {'speedup':>8}")
+    for rows in sizes:
+        columns = generate_columns(rows)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "restaurants.npz")
+            RestaurantStore(**columns).save(path)
+            start = time.perf_counter()
+            store = RestaurantStore.load(path)
+            load_ms = (time.perf_counter() - start) * 1000
+
+        records = [
+            {"name": n, "cuisine": c, "location": loc, "price_range": p, "rating": float(r)}
+            for n, c, loc, p, r in zip(
+                columns["names"].tolist(), columns["cuisines"].tolist(), columns["locations"].tolist(),
+                columns["price_ranges"].tolist(), columns["ratings"].tolist()
+            )
+        ]
+
+        # 两种实现返回的评分序列必须一致
+        for query in QUERIES:
+            expected = [r["rating"] for r in linear_search(records, **query)]
+            actual = [r["rating"] for r in store.search(**query)]
+            assert expected == actual, f"结果不一致: {query}"
+
+        repeat = max(1, 100_000 // rows)
+        linear_ms = measure(lambda **q: linear_search(records, **q), repeat)
+        indexed_ms = measure(store.search, repeat * 100)
+        print(f"{rows:>10} {load_ms:>9.1f} {linear_ms:>11.3f} {indexed_ms:>12.4f} {linear_ms / indexed_ms:>7.0f}x")
+
+if __name__ == "__main__":
+    sizes = tuple(int(arg) for arg in sys.argv[1:]) or (10_000, 1_000_000)
+    run_benchmark(sizes)
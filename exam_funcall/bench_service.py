@@ -0,0 +1,80 @@
+"""函数调用服务压测：通过 httpx.ASGITransport 在进程内压测 funcall_service
+使用 bench_pipeline 的假 client 作为本地 LLM 替身，每次模型请求模拟固定延迟。
+
+运行方式：
+    python3 exam_funcall/bench_service.py [并发请求数]
+"""
+import sys
+import time
+import asyncio
+
+import httpx
+
+from exam_funcall.bench_pipeline import FakeCompletions, build_caller, set_logging
+from exam_funcall.funcall_service import create_app
+from exam_funcall.function_caller.infra import fast_json
+
+LLM_LATENCY = 0.02  # 模拟模型请求耗时（秒）
+
+class SlowFakeCompletions(FakeCompletions):
+    """带固定延迟的假 chat.completions"""
+
+    def create(self, messages, **kwargs):
+        time.sleep(LLM_LATENCY)
+        return super().create(messages, **kwargs)
+
+def caller_factory():
+    caller = build_caller(6)
+    caller.client.chat.completions = SlowFakeCompletions(6)
+    return caller
+
+async def load_test(client: httpx.AsyncClient, path: str, requests: int) -> dict:
+    """同时发出 requests 个请求，统计状态码和延迟"""
+    async def one(i: int):
+        start = time.perf_counter()
+        r = await client.post(path, json={"message": f"查询第 {i} 个城市的数据"})
+        return r.status_code, time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    ok = sorted(latency for status, latency in results if status == 200)
+    return {
+        "ok": len(ok),
+        "rejected": sum(1 for status, _ in results if status == 429),
+        "ok_per_sec": round(len(ok) / elapsed, 1),
+        "p50_ms": round(ok[len(ok) // 2] * 1000, 1) if ok else 0.0,
+    }
+
+async def run_benchmark(requests: int = 200) -> None:
+    set_logging(False)
+    app = create_app(caller_factory, pool_size=8, max_queue=32)
+    # ASGITransport 不发送 lifespan 事件，手动预热调用器池
+    await app.state.pool.ensure_ready()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver", timeout=60) as client:
+        print((await client.get("/health")).json())
+
+        for path in ("/v1/call", "/v1/conversation"):
+            print(f"{path:<18} {requests} 个并发请求: {await load_test(client, path, requests)}")
+
+        # 批量请求：按完成顺序流式返回（ASGITransport 会缓冲整个响应体，真实服务器下首条结果会更早到达）
+        start = time.perf_counter()
+        first_line = None
+        lines = 0
+        async with client.stream("POST", "/v1/batch", json={"messages": [f"城市{i}" for i in range(64)]}) as r:
+            async for line in r.aiter_lines():
+                if not line:
+                    continue
+                if first_line is None:
+                    first_line = time.perf_counter() - start
+                assert fast_json.loads(line)["ok"]
+                lines += 1
+        total = time.perf_counter() - start
+        print(f"/v1/batch          {lines} 条结果，首条 {first_line * 1000:.1f} ms，全部 {total * 1000:.1f} ms")
+
+        print(fast_json.dumps((await client.get("/metrics")).json(), indent=True))
+    app.state.pool.close()
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
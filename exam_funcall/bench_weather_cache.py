@@ -0,0 +1,64 @@
+"""天气缓存基准测试：模拟热点城市的并发查询，统计上游请求次数、命中率和延迟
+
+运行方式：
+    python3 exam_funcall/bench_weather_cache.py [请求数]
+"""
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from exam_funcall.weather_cache import WeatherCache, location_key
+
+CITIES = [f"城市{i}" for i in range(500)]
+API_LATENCY = 0.005  # 模拟天气API耗时（秒）
+
+class FakeWeatherAPI:
+    """记录调用次数的模拟天气API"""
+
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, city: str) -> dict:
+        with self._lock:
+            self.calls += 1
+        time.sleep(API_LATENCY)
+        return {"temp": 23.5, "humidity": 65, "desc": "晴朗", "city": city}
+
+def run(cities, cache: WeatherCache = None, workers: int = 16):
+    """并发查询，返回 (上游请求次数, 每次查询耗时毫秒数组, 总耗时秒)"""
+    api = FakeWeatherAPI()
+
+    def query(city):
+        start = time.perf_counter()
+        if cache is None:
+            api.fetch(city)
+        else:
+            cache.get(location_key(city, "CN"), lambda: api.fetch(city))
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        latencies = np.fromiter(executor.map(query, cities), dtype=np.float64)
+    return api.calls, latencies, time.perf_counter() - start
+
+def run_benchmark(count: int = 20_000) -> None:
+    """城市按 Zipf 分布抽取（少数城市被频繁查询）"""
+    rng = np.random.default_rng(0)
+    ranks = np.minimum(rng.zipf(1.3, count), len(CITIES)) - 1
+    cities = [CITIES[r] for r in ranks]
+
+    print(f"{count} 次查询，{len(set(cities))} 个不同城市，模拟API耗时 {API_LATENCY * 1000:.0f} ms")
+    print(f"{'':>10} {'api calls':>10} {'p50(ms)':>8} {'p99(ms)':>8} {'total(s)':>9}")
+    for name, cache in (("no cache", None), ("cached", WeatherCache(ttl=0.5, stale_ttl=2.0))):
+        calls, latencies, elapsed = run(cities, cache)
+        p50, p99 = np.percentile(latencies, [50, 99])
+        print(f"{name:>10} {calls:>10} {p50:>8.3f} {p99:>8.3f} {elapsed:>9.2f}")
+        if cache is not None:
+            print(f"缓存统计: {cache.stats.to_dict()}")
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
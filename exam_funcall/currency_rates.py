@@ -0,0 +1,125 @@
+"""汇率表与向量化批量货币转换
+- RateTable 是不可变的汇率表：货币代码映射为整数ID，并预先计算交叉汇率矩阵
+- 当前生效的汇率表是一个模块级引用，set_rate_table() 直接替换该引用；
+  每次转换只读取一次引用，因此无需加锁即可得到一致的汇率快照
+- currency_convert_batch 对整批金额做向量化转换，舍入结果与 currency_convert 完全一致
+"""
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Sequence, Union
+
+import numpy as np
+
+# 基准汇率（以CNY为基准）
+DEFAULT_BASE_RATES = {
+    "USD": 0.155,  # 1 CNY = 0.155 USD
+    "EUR": 0.127,  # 1 CNY = 0.127 EUR
+    "JPY": 16.95,  # 1 CNY = 16.95 JPY
+    "CNY": 1.0     # 1 CNY = 1.0 CNY
+}
+
+@dataclass(frozen=True, eq=False)
+class RateTable:
+    """不可变的汇率表
+    Attributes:
+        base_rates: 货币代码到基准汇率（1 CNY 可兑换的数量）的映射
+        codes: 排序后的货币代码，位置即整数ID
+        rates: 按ID排列的基准汇率向量
+        cross_rates: 交叉汇率矩阵，cross_rates[i, j] 为 1 单位货币 i 可兑换的货币 j 数量
+    """
+    base_rates: Dict[str, float]
+    codes: np.ndarray = field(init=False, repr=False)
+    rates: np.ndarray = field(init=False, repr=False)
+    cross_rates: np.ndarray = field(init=False, repr=False)
+
+    def __post_init__(self):
+        codes = np.array(sorted(self.base_rates))
+        rates = np.array([self.base_rates[c] for c in codes], dtype=np.float64)
+        # 与标量函数相同的运算：base_rates[to] / base_rates[from]
+        cross_rates = rates[np.newaxis, :] / rates[:, np.newaxis]
+        for array in (codes, rates, cross_rates):
+            array.setflags(write=False)
+        object.__setattr__(self, "base_rates", dict(self.base_rates))
+        object.__setattr__(self, "codes", codes)
+        object.__setattr__(self, "rates", rates)
+        object.__setattr__(self, "cross_rates", cross_rates)
+
+    def encode(self, currencies: Union[Sequence[str], np.ndarray]) -> np.ndarray:
+        """将货币代码数组转换为整数ID数组
+        Raises:
+            ValueError: 存在不支持的货币代码
+        """
+        currencies = np.asarray(currencies, dtype=str)
+        ids = np.searchsorted(self.codes, currencies)
+        ids = np.minimum(ids, len(self.codes) - 1)
+        invalid = self.codes[ids] != currencies
+        if invalid.any():
+            unsupported = sorted(set(currencies[invalid].tolist()))
+            raise ValueError(f"Unsupported currency: {', '.join(unsupported)}")
+        return ids
+
+_active_table = RateTable(DEFAULT_BASE_RATES)
+
+def get_rate_table() -> RateTable:
+    """获取当前生效的汇率表"""
+    return _active_table
+
+def set_rate_table(table: Union[RateTable, Dict[str, float]]) -> RateTable:
+    """替换当前生效的汇率表（原子的引用替换，进行中的批量转换继续使用旧表）"""
+    global _active_table
+    _active_table = table if isinstance(table, RateTable) else RateTable(table)
+    return _active_table
+
+def round_like_builtin(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """与 Python 内置 round(x, ndigits) 结果完全一致的向量化舍入
+    np.round 通过缩放后取整实现，在十进制中点附近可能与 round() 相差一位，
+    因此对靠近中点的少量元素回退到内置 round()。
+    """
+    rounded = np.round(values, ndigits)
+    scaled = values * (10.0 ** ndigits)
+    # 容差覆盖 values * 10**ndigits 本身的浮点误差
+    tolerance = np.maximum(1e-9, np.abs(scaled) * 1e-12)
+    near_half = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < tolerance
+    if near_half.any():
+        indices = np.flatnonzero(near_half)
+        rounded[indices] = [round(float(v), ndigits) for v in values[indices]]
+    return rounded
+
+def currency_convert_batch(
+        amounts: Iterable[float],
+        from_currencies: Union[Sequence[str], np.ndarray],
+        to_currencies: Union[Sequence[str], np.ndarray],
+        table: RateTable = None
+) -> Dict[str, np.ndarray]:
+    """批量货币转换
+    货币代码（或已编码的整数ID数组）通过整数ID索引汇率向量和交叉汇率矩阵；
+    金额按与 currency_convert 相同的顺序先除后乘，保证逐位一致的舍入结果。
+
+    Args:
+        amounts: 金额数组
+        from_currencies: 源货币代码数组，或 RateTable.encode() 得到的整数ID数组
+        to_currencies: 目标货币代码数组，或整数ID数组
+        table: 使用的汇率表（可选，默认为当前生效的汇率表）
+    Returns:
+        result: 包含 converted_amount 和 rate 两个数组的字典
+    Raises:
+        ValueError: 存在不支持的货币代码或数组长度不一致
+    """
+    table = table or _active_table
+    amounts = np.asarray(amounts, dtype=np.float64)
+    from_ids = _as_ids(table, from_currencies)
+    to_ids = _as_ids(table, to_currencies)
+    if not (amounts.shape == from_ids.shape == to_ids.shape):
+        raise ValueError("amounts, from_currencies 和 to_currencies 的长度必须一致")
+
+    # 先转换为CNY，再转换为目标货币
+    converted = amounts / table.rates[from_ids] * table.rates[to_ids]
+    return {
+        "converted_amount": round_like_builtin(converted, 2),
+        "rate": round_like_builtin(table.cross_rates[from_ids, to_ids], 4),
+    }
+
+def _as_ids(table: RateTable, currencies: Union[Sequence[str], np.ndarray]) -> np.ndarray:
+    array = np.asarray(currencies)
+    if np.issubdtype(array.dtype, np.integer):
+        return array
+    return table.encode(array)
@@ -0,0 +1,107 @@
+"""日期时间表达式解析
+schedule_reminder 的 datetime_str 由模型生成，格式经常不统一。解析失败会让模型多一轮重试，
+因此这里用预编译的正则表支持常见变体：
+- 相对时间："+2 hours"、"+2h"、"+1.5 小时"、"in 30 minutes"、"30 minutes later"、"2小时后"
+- ISO 时间：完整时间、只有日期、带时区（Z / +08:00）的时间，以及 "2025/02/03 15:00" 这类斜杠格式
+带时区的时间统一转换为本地时间（与 datetime.now() 一致的 naive datetime）。
+相同表达式的解析结构（时间偏移或绝对时间）会被缓存，重复解析只需一次字典查找。
+"""
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Optional, Tuple, Union
+
+# 单位别名 -> timedelta 参数名
+UNIT_ALIASES = {
+    "s": "seconds", "sec": "seconds", "secs": "seconds", "second": "seconds", "seconds": "seconds", "秒": "seconds",
+    "秒钟": "seconds",
+    "m": "minutes", "min": "minutes", "mins": "minutes", "minute": "minutes", "minutes": "minutes",
+    "分": "minutes", "分钟": "minutes",
+    "h": "hours", "hr": "hours", "hrs": "hours", "hour": "hours", "hours": "hours",
+    "小时": "hours", "个小时": "hours", "钟头": "hours", "个钟头": "hours",
+    "d": "days", "day": "days", "days": "days", "天": "days", "日": "days",
+    "w": "weeks", "wk": "weeks", "wks": "weeks", "week": "weeks", "weeks": "weeks", "周": "weeks", "星期": "weeks",
+    "个星期": "weeks",
+}
+
+_NUMBER = r"(?P<amount>\d+(?:\.\d+)?)"
+_UNIT = r"(?P<unit>[a-z]+|[一-鿿]+?)"
+
+# 相对时间的正则表（按顺序尝试）
+RELATIVE_PATTERNS = [
+    re.compile(rf"^\+\s*{_NUMBER}\s*{_UNIT}$"),
+    re.compile(rf"^in\s+{_NUMBER}\s*{_UNIT}$"),
+    re.compile(rf"^{_NUMBER}\s*{_UNIT}\s*(?:later|from now)$"),
+    re.compile(rf"^{_NUMBER}\s*{_UNIT}\s*(?:后|之后|以后)$"),
+]
+
+# 斜杠日期格式，例如 2025/02/03 或 2025/2/3 15:00
+_SLASH_DATE = re.compile(r"^(\d{4})/(\d{1,2})/(\d{1,2})(?:[ T](\d{1,2}):(\d{2})(?::(\d{2}))?)?$")
+
+SUPPORTED_FORMATS = (
+    "支持的格式：ISO 时间（YYYY-MM-DDTHH:MM:SS，可只含日期或带时区）、"
+    "相对时间（+N hours/minutes/days/weeks，可简写为 +2h、+30m，或 'in 30 minutes'、'2小时后'）"
+)
+
+ParsedExpression = Tuple[str, Union[timedelta, datetime]]
+
+@lru_cache(maxsize=4096)
+def _parse_structure(expression: str) -> ParsedExpression:
+    """解析表达式结构：("relative", 时间偏移) 或 ("absolute", 本地时间)
+    Raises:
+        ValueError: 无法解析的表达式
+    """
+    text = expression.strip()
+    lowered = text.lower()
+
+    for pattern in RELATIVE_PATTERNS:
+        match = pattern.match(lowered)
+        if match:
+            unit = UNIT_ALIASES.get(match.group("unit"))
+            if unit is None:
+                raise ValueError(f"Invalid time unit: '{match.group('unit')}'. {SUPPORTED_FORMATS}")
+            try:
+                return "relative", timedelta(**{unit: float(match.group("amount"))})
+            except OverflowError:
+                raise ValueError(f"Time offset out of range: '{expression}'. {SUPPORTED_FORMATS}") from None
+
+    match = _SLASH_DATE.match(text)
+    if match:
+        parts = [int(p) if p else 0 for p in match.groups()]
+        return "absolute", datetime(*parts)
+
+    try:
+        # 兼容 "Z" 结尾的 UTC 时间
+        parsed = datetime.fromisoformat(text[:-1] + "+00:00" if text.endswith(("Z", "z")) else text)
+    except ValueError:
+        raise ValueError(f"Invalid datetime format: '{expression}'. {SUPPORTED_FORMATS}") from None
+
+    if parsed.tzinfo is not None:
+        # 转换为本地时间，并去掉时区信息
+        try:
+            parsed = parsed.astimezone().replace(tzinfo=None)
+        except OverflowError:
+            raise ValueError(f"Datetime out of range: '{expression}'. {SUPPORTED_FORMATS}") from None
+    return "absolute", parsed
+
+def parse_datetime_expression(expression: str, now: Optional[datetime] = None) -> datetime:
+    """将日期时间表达式解析为本地时间
+    Args:
+        expression: 日期时间表达式
+        now: 相对时间的基准（可选，默认 datetime.now()）
+    Returns:
+        datetime: 本地时间（naive datetime）
+    Raises:
+        ValueError: 无法解析的表达式，错误信息中包含支持的格式，便于模型一次改正
+    """
+    kind, value = _parse_structure(expression)
+    if kind == "relative":
+        try:
+            return (now or datetime.now()) + value
+        except OverflowError:
+            raise ValueError(f"Time offset out of range: '{expression}'. {SUPPORTED_FORMATS}") from None
+    return value
+
+def cache_info():
+    """解析缓存的命中统计"""
+    return _parse_structure.cache_info()
@@ -1,7 +1,10 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import List, Dict
 from dataclasses import dataclass, asdict
 from exam_funcall.function_caller.infra import logger, log_function_call
+from exam_funcall.reminder_scheduler import get_scheduler
+from exam_funcall.datetime_parser import parse_datetime_expression
+from exam_funcall.weather_cache import get_weather_cache, location_key
 
 # 高级函数描述
 ADVANCED_FUNCTION_DESCRIPTIONS = [
@@ -102,6 +105,12 @@ ADVANCED_FUNCTION_DESCRIPTIONS = [
                     "minimum": 0,
                     "maximum": 5,
                     "default": 4.0
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": "最多返回的餐厅数量，按评分从高到低",
+                    "minimum": 1,
+                    "default": 10
                 }
             },
             "required": ["location"]
@@ -130,36 +139,40 @@ def log_function(func):
         return result
     return wrapper
 
-@log_function_call("get_weather")
-def get_weather(city: str, country: str = "CN") -> WeatherInfo:
-    """获取指定城市的天气信息"""
+def _fetch_weather(city: str, country: str) -> Dict:
+    """请求天气数据（上游API调用）"""
     # 这里模拟天气API调用
-    weather_data = {
+    return {
         "temp": 23.5,
         "humidity": 65,
         "desc": "晴朗",
         "city": city,
         "country": country,
+        "fetched_at": datetime.now().isoformat(),
     }
+
+@log_function_call("get_weather")
+def get_weather(city: str, country: str = "CN") -> WeatherInfo:
+    """获取指定城市的天气信息（按城市+国家缓存，每个 TTL 内最多请求一次API）"""
+    weather_data = get_weather_cache().get(
+        location_key(city, country),
+        lambda: _fetch_weather(city, country)
+    )
     return WeatherInfo(
         temperature=weather_data["temp"],
         humidity=weather_data["humidity"],
         description=weather_data["desc"],
         location=f"{city}, {country}",
-        timestamp=datetime.now().isoformat()
+        timestamp=weather_data["fetched_at"]
     )
 
 @log_function_call("currency_convert")
 def currency_convert(amount: float, from_currency: str, to_currency: str) -> Dict:
-    """货币转换功能"""
+    """货币转换功能（批量转换见 currency_rates.currency_convert_batch）"""
     # 模拟汇率API调用
-    # 基准汇率（以CNY为基准）
-    base_rates = {
-        "USD": 0.155,  # 1 CNY = 0.155 USD
-        "EUR": 0.127,  # 1 CNY = 0.127 EUR
-        "JPY": 16.95,  # 1 CNY = 16.95 JPY
-        "CNY": 1.0     # 1 CNY = 1.0 CNY
-    }
+    # 基准汇率（以CNY为基准），来自当前生效的汇率表
+    from exam_funcall.currency_rates import get_rate_table  # 延迟导入 numpy，缩短模块冷启动
+    base_rates = get_rate_table().base_rates
     
     if from_currency not in base_rates or to_currency not in base_rates:
         raise ValueError(f"Unsupported currency: {from_currency} or {to_currency}")
@@ -180,86 +193,29 @@ def currency_convert(amount: float, from_currency: str, to_currency: str) -> Dic
 @log_function_call("schedule_reminder")
 def schedule_reminder(title: str, datetime_str: str, priority: str = "normal", participants: List[str] = None) -> Dict:
     """创建日程提醒"""
-    # 解析时间字符串
-    if datetime_str.startswith('+'):
-        # 处理相对时间
-        parts = datetime_str[1:].split()
-        if len(parts) != 2:
-            raise ValueError("Invalid relative time format. Expected format: '+N hours/minutes/days'")
-        
-        amount = int(parts[0])
-        unit = parts[1].lower()
-        
-        if unit not in ['hours', 'minutes', 'days']:
-            raise ValueError("Invalid time unit. Must be 'hours', 'minutes', or 'days'")
-        
-        delta = {
-            'hours': timedelta(hours=amount),
-            'minutes': timedelta(minutes=amount),
-            'days': timedelta(days=amount)
-        }[unit]
-        
-        reminder_time = datetime.now() + delta
-    else:
-        # 处理ISO格式时间
-        reminder_time = datetime.fromisoformat(datetime_str)
+    # 解析时间字符串（ISO 格式或相对时间，支持 +2h、in 30 minutes 等变体）
+    reminder_time = parse_datetime_expression(datetime_str)
     
-    # 创建提醒
+    # 创建提醒，并交给调度器保存和到期触发
     reminder = {
         "title": title,
         "time": reminder_time.isoformat(),
         "priority": priority,
         "participants": participants or []
     }
+    reminder["id"] = get_scheduler().add(reminder)
     
     return reminder
 
 @log_function_call("search_restaurants")
-def search_restaurants(location: str, cuisine_type: str = None, price_range: str = None, min_rating: float = 4.0) -> List[Dict]:
-    """搜索餐厅"""
-    # 模拟餐厅数据库
-    restaurants = [
-        {
-            "name": "北京烤鸭店",
-            "cuisine": "中餐",
-            "location": "北京",
-            "price_range": "$$",
-            "rating": 4.5
-        },
-        {
-            "name": "意大利面屋",
-            "cuisine": "意大利菜",
-            "location": "北京",
-            "price_range": "$$$",
-            "rating": 4.2
-        },
-        {
-            "name": "寿司之家",
-            "cuisine": "日本料理",
-            "location": "北京",
-            "price_range": "$$$",
-            "rating": 4.7
-        }
-    ]
-    
-    # 过滤结果
-    results = []
-    for restaurant in restaurants:
-        if restaurant["location"] != location:
-            continue
-            
-        if cuisine_type and restaurant["cuisine"] != cuisine_type:
-            continue
-            
-        if price_range and restaurant["price_range"] != price_range:
-            continue
-            
-        if restaurant["rating"] < min_rating:
-            continue
-            
-        results.append(restaurant)
-    
-    return results
+def search_restaurants(location: str, cuisine_type: str = None, price_range: str = None, min_rating: float = 4.0,
+                       limit: int = 10) -> List[Dict]:
+    """搜索餐厅
+    结果按评分降序排列，最多返回 limit 个（limit 在工具描述中对模型可见）。
+    之前的实现按数据顺序返回全部匹配的餐厅。
+    """
+    from exam_funcall.restaurant_store import get_restaurant_store  # 延迟导入 numpy，缩短模块冷启动
+    return get_restaurant_store().search(location, cuisine_type, price_range, min_rating, limit)
 
 if __name__ == "__main__":
     # 测试天气功能
@@ -0,0 +1,424 @@
+"""函数调用 ASGI 服务
+以 Starlette 应用的形式对外提供 GPTFunctionCaller：
+- POST /v1/call          单次函数调用（call_single_function）
+- POST /v1/conversation  交互式函数调用（call_with_conversation）
+- POST /v1/batch         批量调用，按完成顺序以 NDJSON 流式返回每条结果
+- GET  /health           健康检查和连接池状态
+- GET  /metrics          请求数、拒绝数、错误数、排队时间和延迟分位数
+
+所有请求共享一个预热的调用器池，每个调用器同一时间只处理一个请求（在线程池中执行阻塞调用）。
+调用器都在忙且排队请求数达到 max_queue 时，直接返回 429，而不是无限排队。
+模型请求经过全局请求调度器：/v1/batch 的请求属于 batch 类别，排在交互请求之后；
+X-Tenant 请求头指定租户，请求体中的 timeout（秒）作为截止时间，无法按时完成时返回 504。
+
+运行方式：
+    uvicorn exam_funcall.funcall_service:app
+环境变量 FUNCALL_POOL_SIZE / FUNCALL_MAX_QUEUE 配置池大小和最大排队数。
+"""
+import os
+import time
+import asyncio
+import threading
+import contextvars
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field, is_dataclass
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+from exam_funcall.function_caller import GPTFunctionCaller
+from exam_funcall.function_caller.infra import fast_json
+from exam_funcall.function_caller.infra.request_scheduler import (
+    DeadlineExceeded,
+    get_request_scheduler,
+    request_context
+)
+
+class PoolSaturated(Exception):
+    """调用器池已满，且排队请求数已达上限"""
+
+def _json_default(obj: Any) -> Any:
+    """序列化函数结果中的对象（dataclass、pydantic 模型等）"""
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if is_dataclass(obj):
+        return asdict(obj)
+    return str(obj)
+
+def json_response(data: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(
+        fast_json.dumps(data, default=_json_default),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json"
+    )
+
+def serialize_response(response: Any) -> Dict:
+    """将调用器返回的响应转换为可序列化的字典"""
+    message = response.choices[0].message if response is not None and response.choices else None
+    tool_calls = []
+    for tool_call in (message.tool_calls or []) if message is not None else []:
+        tool_calls.append({
+            "id": tool_call.id,
+            "name": tool_call.function.name,
+            "arguments": tool_call.function.arguments
+        })
+    return {
+        "content": message.content if message is not None else None,
+        "tool_calls": tool_calls,
+        "function_results": getattr(response, "function_results", None) or []
+    }
+
+@dataclass
+class ServiceMetrics:
+    """服务指标（延迟和排队时间只保留最近 window 个样本）"""
+    window: int = 1024
+    requests: Counter = field(default_factory=Counter)
+    errors: Counter = field(default_factory=Counter)
+    rejected: int = 0
+    latencies: Dict[str, Deque[float]] = field(default_factory=dict)
+    queue_waits: Deque[float] = field(init=False)
+
+    def __post_init__(self):
+        self.queue_waits = deque(maxlen=self.window)
+
+    def record(self, endpoint: str, latency: float, error: bool = False) -> None:
+        self.requests[endpoint] += 1
+        if error:
+            self.errors[endpoint] += 1
+        samples = self.latencies.setdefault(endpoint, deque(maxlen=self.window))
+        samples.append(latency)
+
+    def record_queue_wait(self, wait: float) -> None:
+        self.queue_waits.append(wait)
+
+    @staticmethod
+    def _percentiles(samples: Deque[float]) -> Dict[str, float]:
+        if not samples:
+            return {"p50_ms": 0.0, "p99_ms": 0.0}
+        ordered = sorted(samples)
+        p50 = ordered[int(0.5 * (len(ordered) - 1))]
+        p99 = ordered[int(0.99 * (len(ordered) - 1))]
+        return {"p50_ms": round(p50 * 1000, 3), "p99_ms": round(p99 * 1000, 3)}
+
+    def to_dict(self) -> Dict:
+        return {
+            "requests": dict(self.requests),
+            "errors": dict(self.errors),
+            "rejected": self.rejected,
+            "latency": {name: self._percentiles(samples) for name, samples in self.latencies.items()},
+            "queue_wait": self._percentiles(self.queue_waits),
+        }
+
+class CallerPool:
+    """预热的调用器池
+    每个调用器同一时间只被一个请求使用；阻塞的模型调用在专用线程池中执行，不占用事件循环。
+    """
+
+    def __init__(
+            self,
+            caller_factory: Callable[[], GPTFunctionCaller],
+            size: int = 4,
+            max_queue: int = 16,
+            metrics: Optional[ServiceMetrics] = None
+    ):
+        """初始化调用器池（调用器在 warm() 或首次使用时创建）
+        Args:
+            caller_factory: 创建调用器的函数
+            size: 调用器数量（即最大并发请求数）
+            max_queue: 最多排队等待的请求数，超过时拒绝新请求
+            metrics: 服务指标（可选）
+        """
+        if size < 1:
+            raise ValueError(f"size 必须大于 0: {size}")
+        self.caller_factory = caller_factory
+        self.size = size
+        self.max_queue = max_queue
+        self.metrics = metrics or ServiceMetrics()
+        self.waiting = 0
+        self.busy = 0
+
+        self._callers: List[GPTFunctionCaller] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._warm_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="funcall-service")
+
+    @property
+    def warmed(self) -> bool:
+        return len(self._callers) == self.size
+
+    def warm(self) -> None:
+        """创建全部调用器（重复调用无副作用）"""
+        with self._warm_lock:
+            while len(self._callers) < self.size:
+                self._callers.append(self.caller_factory())
+
+    def saturated(self) -> bool:
+        """没有空闲调用器且排队已满"""
+        idle = self._idle.qsize() if self._idle is not None else self.size
+        return idle == 0 and self.waiting >= self.max_queue
+
+    async def ensure_ready(self) -> None:
+        """确保调用器已创建并放入空闲队列"""
+        if self._idle is None:
+            if not self.warmed:
+                await asyncio.get_running_loop().run_in_executor(self._executor, self.warm)
+            if self._idle is None:
+                self._idle = asyncio.Queue()
+                for caller in self._callers:
+                    self._idle.put_nowait(caller)
+
+    @asynccontextmanager
+    async def acquire(self, block: bool = False) -> AsyncIterator[GPTFunctionCaller]:
+        """获取一个空闲调用器
+        Args:
+            block: 排队已满时是否继续等待（批量请求的子任务使用），否则抛出 PoolSaturated
+        Raises:
+            PoolSaturated: 排队已满且 block 为 False
+        """
+        await self.ensure_ready()
+        if not block and self.saturated():
+            self.metrics.rejected += 1
+            raise PoolSaturated()
+
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            caller = await self._idle.get()
+        finally:
+            self.waiting -= 1
+        self.metrics.record_queue_wait(time.perf_counter() - start)
+
+        self.busy += 1
+        try:
+            yield caller
+        finally:
+            self.busy -= 1
+            self._idle.put_nowait(caller)
+
+    async def run(self, func: Callable, *args: Any) -> Any:
+        """在线程池中执行阻塞调用（带上当前上下文中的调度信息）"""
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, context.run, func, *args)
+
+    def status(self) -> Dict:
+        return {
+            "pool_size": self.size,
+            "warmed": self.warmed,
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "busy": self.busy,
+            "waiting": self.waiting,
+            "max_queue": self.max_queue,
+        }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+async def _read_payload(request: Request) -> Dict:
+    """读取请求体，要求为包含 message（或 messages）的 JSON 对象
+    Raises:
+        ValueError: 请求体不是合法的 JSON 对象
+    """
+    try:
+        payload = fast_json.loads(await request.body())
+    except ValueError:
+        raise ValueError("请求体不是合法的 JSON") from None
+    if not isinstance(payload, dict):
+        raise ValueError("请求体必须是 JSON 对象")
+    return payload
+
+def _timeout(payload: Dict) -> Optional[float]:
+    """请求的超时时间（秒，可选）
+    Raises:
+        ValueError: timeout 不是正数
+    """
+    timeout = payload.get("timeout")
+    if timeout is None:
+        return None
+    if isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or not timeout > 0:
+        raise ValueError("timeout 必须是正数")
+    return float(timeout)
+
+def _history(payload: Dict) -> Optional[List[Dict]]:
+    """请求的对话历史（可选）
+    Raises:
+        ValueError: history 不是对象列表
+    """
+    history = payload.get("history")
+    if history is not None and (not isinstance(history, list) or not all(isinstance(m, dict) for m in history)):
+        raise ValueError("history 必须是对象列表")
+    return history
+
+def _tenant(request: Request) -> str:
+    """请求所属的租户（X-Tenant 请求头）"""
+    return request.headers.get("x-tenant") or "default"
+
+def _too_many_requests() -> Response:
+    return json_response({"error": "服务繁忙，请稍后重试"}, status_code=429, headers={"Retry-After": "1"})
+
+def create_app(
+        caller_factory: Callable[[], GPTFunctionCaller],
+        pool_size: int = 4,
+        max_queue: int = 16
+) -> Starlette:
+    """创建 ASGI 应用
+    Args:
+        caller_factory: 创建调用器的函数（池中每个调用器调用一次）
+        pool_size: 调用器数量
+        max_queue: 最多排队等待的请求数
+    Returns:
+        app: Starlette 应用，连接池保存在 app.state.pool
+    """
+    pool = CallerPool(caller_factory, size=pool_size, max_queue=max_queue)
+    metrics = pool.metrics
+
+    async def call_endpoint(request: Request, endpoint: str, method_name: str, build_args: Callable) -> Response:
+        start = time.perf_counter()
+        try:
+            payload = await _read_payload(request)
+            if not isinstance(payload.get("message"), str):
+                raise ValueError("缺少 message 字段")
+            timeout = _timeout(payload)
+            args = build_args(payload)
+        except ValueError as e:
+            return json_response({"error": str(e)}, status_code=400)
+
+        try:
+            with request_context(priority="interactive", tenant=_tenant(request), timeout=timeout):
+                async with pool.acquire() as caller:
+                    response = await pool.run(getattr(caller, method_name), *args)
+                    execution_time = caller.execution_time
+        except PoolSaturated:
+            return _too_many_requests()
+        except DeadlineExceeded as e:
+            metrics.record(endpoint, time.perf_counter() - start, error=True)
+            return json_response({"error": str(e)}, status_code=504)
+        except Exception as e:
+            metrics.record(endpoint, time.perf_counter() - start, error=True)
+            return json_response({"error": str(e)}, status_code=502)
+
+        metrics.record(endpoint, time.perf_counter() - start)
+        return json_response({**serialize_response(response), "execution_time": execution_time})
+
+    async def call(request: Request) -> Response:
+        return await call_endpoint(request, "call", "call_single_function", lambda p: (
+            p["message"],
+            p.get("system_message"),
+            _history(p),
+            p.get("force_function_call", True)
+        ))
+
+    async def conversation(request: Request) -> Response:
+        return await call_endpoint(request, "conversation", "call_with_conversation", lambda p: (
+            p["message"],
+            p.get("system_message"),
+            _history(p)
+        ))
+
+    async def batch(request: Request) -> Response:
+        try:
+            payload = await _read_payload(request)
+            messages = payload.get("messages")
+            if not isinstance(messages, list) or not all(isinstance(m, str) for m in messages):
+                raise ValueError("messages 必须是字符串列表")
+            concurrency = payload.get("concurrency", pool.size)
+            if isinstance(concurrency, bool) or not isinstance(concurrency, int) or concurrency < 1:
+                raise ValueError("concurrency 必须是正整数")
+        except ValueError as e:
+            return json_response({"error": str(e)}, status_code=400)
+
+        await pool.ensure_ready()
+        # 批量请求整体准入：排队已满时拒绝，准入后子任务按需等待空闲调用器
+        if pool.saturated():
+            metrics.rejected += 1
+            return _too_many_requests()
+
+        system_message = payload.get("system_message")
+        tenant = _tenant(request)
+        semaphore = asyncio.Semaphore(min(concurrency, pool.size))
+
+        async def run_one(index: int, message: str) -> Dict:
+            start = time.perf_counter()
+            async with semaphore:
+                try:
+                    # 批量请求的模型调用排在交互请求之后
+                    with request_context(priority="batch", tenant=tenant):
+                        async with pool.acquire(block=True) as caller:
+                            response = await pool.run(caller.call_single_function, message, system_message)
+                except Exception as e:
+                    metrics.record("batch_item", time.perf_counter() - start, error=True)
+                    return {"index": index, "message": message, "ok": False, "error": str(e)}
+            metrics.record("batch_item", time.perf_counter() - start)
+            return {"index": index, "message": message, "ok": True, **serialize_response(response)}
+
+        async def stream() -> AsyncIterator[str]:
+            start = time.perf_counter()
+            tasks = [asyncio.ensure_future(run_one(i, m)) for i, m in enumerate(messages)]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    yield fast_json.dumps(await next_done, default=_json_default) + "\n"
+            finally:
+                # 客户端断开时取消尚未开始的子任务
+                for task in tasks:
+                    task.cancel()
+                metrics.record("batch", time.perf_counter() - start)
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    async def health(request: Request) -> Response:
+        return json_response({"status": "ok", **pool.status()})
+
+    async def metrics_endpoint(request: Request) -> Response:
+        return json_response({
+            **metrics.to_dict(),
+            "pool": pool.status(),
+            "scheduler": get_request_scheduler().to_dict()
+        })
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette):
+        # 启动时预热调用器池（未发送 lifespan 事件时在首个请求时创建）
+        await pool.ensure_ready()
+        yield
+        pool.close()
+
+    app = Starlette(
+        routes=[
+            Route("/v1/call", call, methods=["POST"]),
+            Route("/v1/conversation", conversation, methods=["POST"]),
+            Route("/v1/batch", batch, methods=["POST"]),
+            Route("/health", health, methods=["GET"]),
+            Route("/metrics", metrics_endpoint, methods=["GET"]),
+        ],
+        lifespan=lifespan
+    )
+    app.state.pool = pool
+    return app
+
+def default_caller_factory() -> GPTFunctionCaller:
+    """使用全部简单函数和高级函数的调用器"""
+    from exam_funcall import func_simple, func_advanced
+
+    functions = func_simple.FUNCTION_DESCRIPTIONS + func_advanced.ADVANCED_FUNCTION_DESCRIPTIONS
+    function_map = {
+        "get_current_time": func_simple.get_current_time,
+        "calculate_circle_area": func_simple.calculate_circle_area,
+        "get_weather": func_advanced.get_weather,
+        "currency_convert": func_advanced.currency_convert,
+        "schedule_reminder": func_advanced.schedule_reminder,
+        "search_restaurants": func_advanced.search_restaurants,
+    }
+    return GPTFunctionCaller(functions=functions, function_map=function_map, debug=False)
+
+app = create_app(
+    default_caller_factory,
+    pool_size=int(os.getenv("FUNCALL_POOL_SIZE", "4")),
+    max_queue=int(os.getenv("FUNCALL_MAX_QUEUE", "16"))
+)
@@ -0,0 +1,364 @@
+import re
+import time
+import zlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# 默认的工具结果有效期（秒）。0 表示结果永不复用，命中缓存时总是重新执行该工具。
+# 有副作用的工具（schedule_reminder 会写入全局调度器）也必须为 0，否则重复请求不会真正执行。
+DEFAULT_TOOL_TTLS: Dict[str, float] = {
+    "get_current_time": 0.0,
+    "schedule_reminder": 0.0,
+}
+
+_NORMALIZE_PATTERN = re.compile(r"[\W_]+", re.UNICODE)
+
+def normalize_prompt(text: str) -> str:
+    """规范化提示文本：小写并去掉空白和标点"""
+    return _NORMALIZE_PATTERN.sub("", text.lower())
+
+# 中文提问中不影响调用计划的虚词和客套语，向量化前去掉，使"查查北京的天气"与"北京天气怎么样"相近
+_FILLER_PATTERN = re.compile(
+    r"帮我|帮忙|麻烦|请问|请|告诉我|查一下|查一查|查查|查询|看看|一下|怎么样|如何|情况|的|吗|呢|吧|呀|啊"
+)
+
+def _embedding_text(text: str) -> str:
+    """向量化使用的文本：规范化后去掉中文虚词，全是虚词时保留规范化文本"""
+    normalized = normalize_prompt(text)
+    return _FILLER_PATTERN.sub("", normalized) or normalized
+
+_NUMBER_PATTERN = re.compile(r"\d+(?:[.,]\d+)*")
+_LATIN_WORD_PATTERN = re.compile(r"[A-Za-z][A-Za-z'-]*")
+_SENTENCE_END = ".!?。！？"
+
+def entity_tokens(text: str) -> Tuple[str, ...]:
+    """提取必须完全一致才能命中缓存的 token：数字和句首以外的大写单词（地名、货币代码等）
+    字符 n-gram 向量无法区分只差一个数字或实体的提示（"convert 100 USD" 与 "convert 900 USD"），
+    而命中时会直接复用缓存的调用参数。
+
+    Args:
+        text: 用户消息
+    Returns:
+        tokens: 排序后的 token 元组
+    """
+    tokens = _NUMBER_PATTERN.findall(text)
+    for match in _LATIN_WORD_PATTERN.finditer(text):
+        word = match.group()
+        before = text[:match.start()].rstrip()
+        if word[0].isupper() and before and before[-1] not in _SENTENCE_END:
+            tokens.append(word)
+    return tuple(sorted(tokens))
+
+def plan_anchors(user_message: str, plan: List[Tuple[str, Dict]]) -> Tuple[str, ...]:
+    """提取调用计划中原样出现在用户消息里的参数值（如 city='南京'）
+    这些值是模型从提示中抄出的实体，只有同样包含它们的提示才能复用该计划；
+    对没有大写和空格的中文地名、人名，这是 entity_tokens 无法提供的保护。
+
+    Args:
+        user_message: 写入缓存时的用户消息
+        plan: 调用计划，(函数名, 参数) 列表
+    Returns:
+        anchors: 规范化后的参数值元组
+    """
+    normalized = normalize_prompt(user_message)
+    anchors = set()
+    for _, args in plan:
+        for value in (args or {}).values():
+            values = value if isinstance(value, list) else [value]
+            for item in values:
+                if isinstance(item, bool) or not isinstance(item, (str, int, float)):
+                    continue
+                anchor = normalize_prompt(str(item))
+                if anchor and anchor in normalized:
+                    anchors.add(anchor)
+    return tuple(sorted(anchors))
+
+def hashed_ngram_embedding(
+        text: str,
+        dim: int = 512,
+        ngram_range: Tuple[int, int] = (1, 2)
+) -> np.ndarray:
+    """将文本编码为哈希字符 n-gram 向量（L2 归一化）
+    编码前去掉中文虚词（见 _FILLER_PATTERN）。使用 crc32 保证跨进程稳定，并用哈希的最高位作为符号以减少碰撞偏差。
+
+    Args:
+        text: 输入文本
+        dim: 向量维度
+        ngram_range: n-gram 的最小和最大长度
+    Returns:
+        vector: float32 向量
+    """
+    normalized = _embedding_text(text)
+    vector = np.zeros(dim, dtype=np.float32)
+    low, high = ngram_range
+    for n in range(low, high + 1):
+        for i in range(len(normalized) - n + 1):
+            h = zlib.crc32(normalized[i:i + n].encode("utf-8"))
+            vector[h % dim] += -1.0 if h & 0x80000000 else 1.0
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+@dataclass
+class CacheEntry:
+    """语义缓存条目
+    Attributes:
+        user_message: 首次写入时的用户消息
+        response: GPT的响应（其中的 tool_calls 即缓存的调用计划）
+        plan: 调用计划，(函数名, 参数) 列表
+        results: 函数执行结果，与 plan 一一对应
+        result_times: 每个结果的执行时间戳
+        entities: 用户消息中的数字和实体（见 entity_tokens），命中要求完全一致
+        anchors: 调用参数中出现在用户消息里的值（见 plan_anchors），命中要求新提示也包含它们
+        created_at: 写入时间戳
+    """
+    user_message: str
+    response: Any
+    plan: List[Tuple[str, Dict]]
+    results: List[Any]
+    result_times: List[float]
+    entities: Tuple[str, ...] = ()
+    anchors: Tuple[str, ...] = ()
+    created_at: float = field(default_factory=time.time)
+
+@dataclass
+class CacheStats:
+    """语义缓存指标"""
+    lookups: int = 0
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    audits: int = 0
+    false_hits: int = 0
+    refreshed_tools: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """命中率"""
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    @property
+    def false_hit_rate(self) -> float:
+        """抽样审计中的误命中率"""
+        return self.false_hits / self.audits if self.audits else 0.0
+
+    def to_dict(self) -> Dict:
+        """转换为字典以便日志输出"""
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "audits": self.audits,
+            "false_hits": self.false_hits,
+            "refreshed_tools": self.refreshed_tools,
+            "hit_rate": round(self.hit_rate, 4),
+            "false_hit_rate": round(self.false_hit_rate, 4),
+        }
+
+class SemanticCache:
+    """近似重复提示的语义缓存
+    提示被编码为向量后存入一个固定容量的 NumPy 矩阵，查询时用一次矩阵乘法求余弦相似度。
+    只有相同上下文（系统消息 + 工具集）内、数字和实体完全一致、并且包含缓存计划中抄自提示的参数值的条目才会命中，
+    容量满时按 LRU 淘汰。
+    命中时复用缓存的调用计划，按工具的有效期决定复用结果还是重新执行工具。
+    """
+
+    def __init__(
+            self,
+            threshold: float = 0.9,
+            capacity: int = 1024,
+            dim: int = 512,
+            tool_ttls: Optional[Dict[str, float]] = None,
+            default_ttl: float = 300.0,
+            audit_rate: float = 0.05,
+            embed_fn: Optional[Callable[[str], np.ndarray]] = None,
+            entity_fn: Optional[Callable[[str], Tuple[str, ...]]] = None
+    ):
+        """初始化语义缓存
+        Args:
+            threshold: 命中所需的最小余弦相似度
+            capacity: 最大条目数
+            dim: 向量维度（使用自定义 embed_fn 时必须与其输出一致）
+            tool_ttls: 工具名到结果有效期（秒）的映射，会覆盖 DEFAULT_TOOL_TTLS
+            default_ttl: 未配置工具的结果有效期（秒）
+            audit_rate: 命中后仍向模型发送请求以核对计划的抽样比例，用于统计误命中
+            embed_fn: 自定义向量化函数（例如本地轻量模型），默认使用哈希 n-gram
+            entity_fn: 提取必须完全一致的 token 的函数，默认为 entity_tokens（数字和大写单词）
+        """
+        if capacity < 1:
+            raise ValueError(f"capacity 必须大于 0: {capacity}")
+        self.threshold = threshold
+        self.capacity = capacity
+        self.dim = dim
+        self.tool_ttls = {**DEFAULT_TOOL_TTLS, **(tool_ttls or {})}
+        self.default_ttl = default_ttl
+        self.audit_rate = audit_rate
+        self.embed_fn = embed_fn or (lambda text: hashed_ngram_embedding(text, dim))
+        self.entity_fn = entity_fn or entity_tokens
+        self.stats = CacheStats()
+
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._context_ids = np.full(capacity, -1, dtype=np.int64)
+        self._entries: List[Optional[CacheEntry]] = [None] * capacity
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        self._contexts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def context_key(functions: List[Dict], system_message: Optional[str], force_function_call: bool) -> str:
+        """根据系统消息和工具集生成上下文键"""
+        names = ",".join(sorted(f.get("name", "") for f in functions or []))
+        return f"{system_message or ''}\x00{names}\x00{int(force_function_call)}"
+
+    def ttl_for(self, tool_name: str) -> float:
+        """获取工具结果的有效期"""
+        return self.tool_ttls.get(tool_name, self.default_ttl)
+
+    def is_fresh(self, tool_name: str, executed_at: float, now: Optional[float] = None) -> bool:
+        """判断工具结果是否仍可复用"""
+        ttl = self.ttl_for(tool_name)
+        if ttl <= 0:
+            return False
+        return ((now or time.time()) - executed_at) <= ttl
+
+    def lookup(self, context: str, user_message: str) -> Optional[CacheEntry]:
+        """查找语义相近的缓存条目
+        Args:
+            context: 上下文键
+            user_message: 用户消息
+        Returns:
+            entry: 命中的条目，未命中时为 None
+        """
+        vector = self.embed_fn(user_message)
+        entities = self.entity_fn(user_message)
+        normalized = normalize_prompt(user_message)
+        with self._lock:
+            self.stats.lookups += 1
+            context_id = self._contexts.get(context)
+            if context_id is None or not self._lru:
+                self.stats.misses += 1
+                return None
+
+            slot = self._best_slot(vector, context_id, entities, normalized, self.threshold)
+            if slot is None:
+                self.stats.misses += 1
+                return None
+
+            self._lru.move_to_end(slot)
+            self.stats.hits += 1
+            return self._entries[slot]
+
+    def store(
+            self,
+            context: str,
+            user_message: str,
+            response: Any,
+            plan: List[Tuple[str, Dict]],
+            results: List[Any]
+    ) -> None:
+        """写入缓存条目，容量满时淘汰最久未使用的条目
+        Args:
+            context: 上下文键
+            user_message: 用户消息
+            response: GPT的响应
+            plan: 调用计划，(函数名, 参数) 列表
+            results: 函数执行结果，与 plan 一一对应
+        """
+        vector = self.embed_fn(user_message)
+        now = time.time()
+        entry = CacheEntry(
+            user_message=user_message,
+            response=response,
+            plan=plan,
+            results=list(results),
+            result_times=[now] * len(results),
+            entities=self.entity_fn(user_message),
+            anchors=plan_anchors(user_message, plan)
+        )
+        with self._lock:
+            context_id = self._contexts.setdefault(context, len(self._contexts))
+
+            # 近乎相同的提示直接覆盖原条目，避免同一问题占用多个槽位
+            normalized = normalize_prompt(user_message)
+            slot = self._best_slot(vector, context_id, entry.entities, normalized, 0.999) if self._lru else None
+            if slot is None:
+                slot = self._free_slot()
+
+            self._vectors[slot] = vector
+            self._context_ids[slot] = context_id
+            self._entries[slot] = entry
+            self._lru[slot] = None
+            self._lru.move_to_end(slot)
+
+    def refresh_result(self, entry: CacheEntry, position: int, result: Any) -> None:
+        """用重新执行的工具结果更新缓存条目"""
+        with self._lock:
+            entry.results[position] = result
+            entry.result_times[position] = time.time()
+            self.stats.refreshed_tools += 1
+
+    def record_audit(self, entry: CacheEntry, plan: List[Tuple[str, Dict]]) -> bool:
+        """记录一次抽样审计，返回缓存计划是否与模型给出的计划一致
+        不一致时视为误命中，并移除该条目。
+        """
+        matched = entry.plan == plan
+        with self._lock:
+            self.stats.audits += 1
+            if not matched:
+                self.stats.false_hits += 1
+                for slot in self._lru:
+                    if self._entries[slot] is entry:
+                        self._release_slot(slot)
+                        break
+        return matched
+
+    def clear(self) -> None:
+        """清空缓存（保留统计指标）"""
+        with self._lock:
+            self._context_ids[:] = -1
+            self._entries = [None] * self.capacity
+            self._lru.clear()
+            self._contexts.clear()
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def _best_slot(
+            self,
+            vector: np.ndarray,
+            context_id: int,
+            entities: Tuple[str, ...],
+            normalized: str,
+            threshold: float
+    ) -> Optional[int]:
+        """相似度不低于 threshold、实体一致且 normalized 包含条目全部锚点的最相似槽位（调用方需持有锁）"""
+        scores = self._vectors @ vector
+        scores[self._context_ids != context_id] = -1.0
+        candidates = np.flatnonzero(scores >= threshold)
+        for slot in candidates[np.argsort(-scores[candidates])]:
+            entry = self._entries[slot]
+            if entry.entities == entities and all(anchor in normalized for anchor in entry.anchors):
+                return int(slot)
+        return None
+
+    def _free_slot(self) -> int:
+        """分配一个空槽位，必要时淘汰 LRU 条目（调用方需持有锁）"""
+        if len(self._lru) < self.capacity:
+            # 第一个从未使用过或已被清空的槽位
+            return int(np.argmax(self._context_ids < 0))
+        slot = next(iter(self._lru))
+        self._release_slot(slot)
+        self.stats.evictions += 1
+        return slot
+
+    def _release_slot(self, slot: int) -> None:
+        """释放槽位（调用方需持有锁）"""
+        del self._lru[slot]
+        self._context_ids[slot] = -1
+        self._entries[slot] = None
@@ -1,10 +1,42 @@
+import copy
 import time
-import json
-from typing import Dict, List, Any, Optional
+import random
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from typing import Dict, List, Any, Optional, Iterable, Iterator
 
-from exam_funcall.function_caller.infra import GPTBase, logger, GPT_MODEL_NAME
-from exam_funcall.function_caller.func_utils import prepare_messages, prepare_request_data
+from exam_funcall.function_caller.infra import GPTBase, logger, GPT_MODEL_NAME, fast_json
+from exam_funcall.function_caller.func_utils import (
+    build_tools,
+    prefix_fingerprint,
+    leading_system_contents,
+    prepare_messages,
+    prepare_request_data
+)
+from exam_funcall.function_caller.func_usage import prompt_cache_tracker
 from exam_funcall.function_caller.func_handlers import execute_function, handle_conversation_tool_call
+from exam_funcall.function_caller.func_checkpoint import CheckpointStore, ConversationState
+from exam_funcall.function_caller.func_speculation import SpeculativeExecutor, SpeculationSession
+
+@dataclass
+class CallResult:
+    """call_many 的单条结果
+    Attributes:
+        index: 消息在输入序列中的位置
+        user_message: 用户输入的消息
+        response: GPT的响应（失败时为 None）
+        error: 调用失败时的异常（成功时为 None）
+    """
+    index: int
+    user_message: str
+    response: Any = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        """调用是否成功"""
+        return self.error is None
 
 class GPTFunctionCaller(GPTBase):
     """支持函数调用的GPT调用器"""
@@ -13,17 +45,36 @@ class GPTFunctionCaller(GPTBase):
             self,
             functions: List[Dict],
             function_map: Dict[str, callable],
-            debug: bool = True
+            debug: bool = True,
+            cache: Optional[Any] = None,
+            checkpoint_store: Optional[CheckpointStore] = None,
+            speculative_tools: Optional[List[str]] = None,
+            scenario: Optional[str] = None
     ):
         """初始化函数调用器
         Args:
             functions: Function descriptions 列表
             function_map: 函数名到实际函数的映射
             debug: 是否启用调试模式
+            cache: 语义缓存（可选，见 func_cache.SemanticCache），仅用于 call_single_function
+            checkpoint_store: 会话检查点存储（可选），用于 call_with_conversation 的断点恢复
+            speculative_tools: 允许在流式调用中投机执行的工具名（可选），只应包含无副作用的工具
+            scenario: 提示缓存统计的场景名（可选，默认按请求前缀的指纹分组，见 func_usage）
         """
         super().__init__()
         self.functions = functions
         self.available_functions = function_map
+        # 规范化的 tools 只生成一次，每次请求的前缀字节相同
+        self.tools = build_tools(functions)
+        self.scenario = scenario
+        self._prefix_keys: Dict[tuple, str] = {}
+        self.cache = cache
+        self.checkpoint_store = checkpoint_store
+        self.conversation_id = None
+        self.speculator = (
+            SpeculativeExecutor(functions, function_map, speculative_tools)
+            if speculative_tools else None
+        )
 
     def call_single_function(
             self,
@@ -50,7 +101,7 @@ class GPTFunctionCaller(GPTBase):
         try:
             # 准备请求
             messages = prepare_messages(user_message, system_message, history)
-            request_data = prepare_request_data(messages, self.functions, force_function_call, user_message)
+            request_data = prepare_request_data(messages, self.functions, force_function_call, user_message, self.tools)
             # 确保 last_request 是可序列化的
             self.last_request = {
                 "model": request_data["model"],
@@ -60,41 +111,38 @@ class GPTFunctionCaller(GPTBase):
             }
             logger.request_data(self.last_request)
             
+            # 查询语义缓存，命中时复用调用计划，跳过模型请求（按 audit_rate 抽样核对）
+            cache_context = None
+            entry = None
+            if self.cache is not None and not history:
+                cache_context = self.cache.context_key(self.functions, system_message, force_function_call)
+                entry = self.cache.lookup(cache_context, user_message)
+                if entry is not None and random.random() >= self.cache.audit_rate:
+                    response = self._replay_cache_entry(entry)
+                    self.execution_time = time.time() - start_time
+                    logger.execution_time(self.execution_time)
+                    return response
+            
             # 发送请求
             response = self.client.chat.completions.create(**request_data)
-            response_data = response.model_dump()
-            self.raw_response = response_data
-            logger.api_response(response_data)
+            self._record_response(response)
             
             # 处理函数调用
             if response.choices and response.choices[0].message:
                 message = response.choices[0].message
-                function_results = []
-                
-                # 处理tool_calls
-                if message.tool_calls:
-                    for tool_call in message.tool_calls:
-                        if tool_call.type == "function":
-                            logger.function_call(
-                                tool_call.function.name,
-                                tool_call.function.arguments
-                            )
-                            
-                            func_name = tool_call.function.name
-                            func_args = json.loads(tool_call.function.arguments)
-                            function_response = execute_function(
-                                func_name,
-                                func_args,
-                                self.available_functions,
-                                logger
-                            )
-                            
-                            function_results.append({
-                                'name': func_name,
-                                'result': function_response
-                            })
-                
+                function_results, plan = self._execute_tool_calls(message)
                 response.function_results = function_results
+                
+                if entry is not None:
+                    self.cache.record_audit(entry, plan)
+                if cache_context is not None:
+                    self.cache.store(
+                        cache_context,
+                        user_message,
+                        response,
+                        plan,
+                        [r['result'] for r in function_results]
+                    )
             
             # 记录耗时
             self.execution_time = time.time() - start_time
@@ -106,35 +154,34 @@ class GPTFunctionCaller(GPTBase):
             logger.error(str(e))
             raise
 
-    def call_with_conversation(
+    def call_single_function_stream(
             self,
             user_message: str,
             system_message: Optional[str] = None,
-            history: Optional[List[Dict[str, str]]] = None
+            history: Optional[List[Dict[str, str]]] = None,
+            force_function_call: bool = True
     ) -> Any:
-        """交互式函数调用
-        支持多轮函数调用，会将函数结果加入对话历史，并生成最终响应。
-        适用于需要多个函数协同工作的复杂场景。
+        """流式单次函数调用
+        与 call_single_function 相同，但以流式方式接收响应。
+        配置了 speculative_tools 时，一旦某个工具的名称和必填参数在流中确定，
+        就提前执行该工具；最终参数不一致时丢弃投机结果。
         
         Args:
             user_message: 用户输入的消息
             system_message: 系统提示消息（可选）
             history: 对话历史（可选）
+            force_function_call: 是否强制使用函数调用（默认True）
         Returns:
-            response: GPT的响应，包含所有函数调用结果的总结
+            response: 由流式片段组装的完整GPT响应
         """
         start_time = time.time()
         logger.user_input(user_message)
+        speculation = self.speculator.session() if self.speculator is not None else None
         
         try:
             # 准备请求
             messages = prepare_messages(user_message, system_message, history)
-            request_data = {
-                **prepare_request_data(messages, self.functions, True, user_message),
-                "tool_choice": "auto"  # 让模型自动选择是否调用函数
-            }
-            
-            # 确保 last_request 是可序列化的
+            request_data = prepare_request_data(messages, self.functions, force_function_call, user_message, self.tools)
             self.last_request = {
                 "model": request_data["model"],
                 "messages": request_data["messages"],
@@ -143,62 +190,445 @@ class GPTFunctionCaller(GPTBase):
             }
             logger.request_data(self.last_request)
             
-            # 发送请求
-            response = self.client.chat.completions.create(**request_data)
-            response_data = response.model_dump()
-            self.raw_response = response_data
-            logger.api_response(response_data)
+            # 发送流式请求并组装响应
+            stream = self.client.chat.completions.create(**request_data, stream=True)
+            response = self._assemble_stream(stream, speculation)
+            self._record_response(response)
             
             # 处理函数调用
             if response.choices and response.choices[0].message:
-                message = response.choices[0].message
-                
-                # 处理tool_calls
-                while message.tool_calls:
-                    for tool_call in message.tool_calls:
-                        handle_conversation_tool_call(
-                            tool_call,
-                            messages,
+                function_results, _ = self._execute_tool_calls(response.choices[0].message, speculation)
+                response.function_results = function_results
+            
+            # 记录耗时
+            self.execution_time = time.time() - start_time
+            logger.execution_time(self.execution_time)
+            
+            return response
+            
+        except Exception as e:
+            logger.error(str(e))
+            raise
+        finally:
+            if speculation is not None:
+                speculation.close()
+
+    def _assemble_stream(self, stream: Iterable[Any], speculation: Optional[SpeculationSession] = None) -> Any:
+        """将流式片段组装为完整响应，并把部分 tool_call 交给投机执行会话
+        Args:
+            stream: chat.completions 的流式响应
+            speculation: 投机执行会话（可选）
+        Returns:
+            response: ChatCompletion
+        """
+        # openai 的类型模块导入很慢（约 1 秒），只在真正组装流式响应时才导入
+        from openai.types.chat import ChatCompletion
+
+        meta = {}
+        content_parts = []
+        tool_calls = {}
+        finish_reason = None
+        
+        for chunk in stream:
+            if not meta:
+                meta = {"id": chunk.id, "created": chunk.created, "model": chunk.model}
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            delta = choice.delta
+            if delta.content:
+                content_parts.append(delta.content)
+            for tool_delta in delta.tool_calls or []:
+                entry = tool_calls.setdefault(tool_delta.index, {
+                    "id": None,
+                    "type": "function",
+                    "function": {"name": "", "arguments": ""}
+                })
+                if tool_delta.id:
+                    entry["id"] = tool_delta.id
+                if tool_delta.function:
+                    entry["function"]["name"] += tool_delta.function.name or ""
+                    entry["function"]["arguments"] += tool_delta.function.arguments or ""
+                if speculation is not None:
+                    speculation.observe(
+                        tool_delta.index,
+                        entry["function"]["name"],
+                        entry["function"]["arguments"]
+                    )
+            if choice.finish_reason:
+                finish_reason = choice.finish_reason
+        
+        return ChatCompletion.model_validate({
+            **meta,
+            "object": "chat.completion",
+            "choices": [{
+                "index": 0,
+                "finish_reason": finish_reason or "stop",
+                "message": {
+                    "role": "assistant",
+                    "content": "".join(content_parts) or None,
+                    "tool_calls": [tool_calls[i] for i in sorted(tool_calls)] or None
+                }
+            }]
+        })
+
+    def _record_response(self, response: Any) -> None:
+        """记录API响应
+        只记录实际使用的 choices[0].message；完整响应在读取 raw_response 时才转换为字典。
+        """
+        self.raw_response = response
+        self._record_usage(response)
+        if response.choices:
+            logger.api_response(response.choices[0].message)
+        else:
+            logger.api_response(response)
+
+    def _record_usage(self, response: Any) -> None:
+        """记录提示缓存命中情况（按 scenario 或请求前缀指纹分组）"""
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        scenario = self.scenario
+        if scenario is None:
+            messages = self.last_request["messages"] if self.last_request else []
+            system = leading_system_contents(messages)
+            scenario = self._prefix_keys.get(system)
+            if scenario is None:
+                scenario = self._prefix_keys[system] = f"prefix:{prefix_fingerprint(messages, self.tools)}"
+        prompt_cache_tracker.record(scenario, usage)
+
+    def _execute_tool_calls(self, message: Any, speculation: Optional[SpeculationSession] = None):
+        """执行消息中的所有 tool_calls
+        Args:
+            message: GPT响应中的消息
+            speculation: 投机执行会话（可选），参数一致时直接使用投机执行的结果
+        Returns:
+            (function_results, plan): 函数执行结果列表和 (函数名, 参数) 调用计划
+        """
+        function_results = []
+        plan = []
+        
+        # 处理tool_calls
+        if message.tool_calls:
+            for index, tool_call in enumerate(message.tool_calls):
+                if tool_call.type == "function":
+                    logger.function_call(
+                        tool_call.function.name,
+                        tool_call.function.arguments
+                    )
+                    
+                    func_name = tool_call.function.name
+                    func_args = fast_json.loads(tool_call.function.arguments)
+                    hit = False
+                    if speculation is not None:
+                        hit, function_response = speculation.resolve(index, func_name, func_args)
+                    if not hit:
+                        function_response = execute_function(
+                            func_name,
+                            func_args,
                             self.available_functions,
                             logger
                         )
                     
-                    # 生成新的响应
-                    response = self.client.chat.completions.create(
-                        model=GPT_MODEL_NAME,
-                        messages=messages,
-                        tools=[{"type": "function", "function": f} for f in self.functions],
-                        tool_choice="auto"
-                    )
-                    
-                    if response.choices and response.choices[0].message:
-                        message = response.choices[0].message
-                        if not message.tool_calls:
-                            # 如果没有更多的函数调用，添加最终响应到消息历史
-                            messages.append({
-                                "role": "assistant",
-                                "content": message.content,
-                                "tool_calls": None
-                            })
-                    else:
-                        break
+                    function_results.append({
+                        'name': func_name,
+                        'result': function_response
+                    })
+                    plan.append((func_name, func_args))
+        return function_results, plan
+
+    def _replay_cache_entry(self, entry: Any) -> Any:
+        """根据缓存条目生成响应
+        复用缓存的调用计划；结果已过期的工具（如 get_current_time）会重新执行。
+        
+        Args:
+            entry: 语义缓存条目
+        Returns:
+            response: 缓存响应的副本，function_results 为本次结果
+        """
+        logger.system_message(f"语义缓存命中: {entry.user_message}")
+        response = copy.copy(entry.response)
+        function_results = []
+        for position, (func_name, func_args) in enumerate(entry.plan):
+            result = entry.results[position]
+            if not self.cache.is_fresh(func_name, entry.result_times[position]):
+                logger.function_call(func_name, fast_json.dumps(func_args))
+                result = execute_function(func_name, func_args, self.available_functions, logger)
+                self.cache.refresh_result(entry, position, result)
+            function_results.append({
+                'name': func_name,
+                'result': result
+            })
+        response.function_results = function_results
+        self.raw_response = None
+        return response
+
+    def call_with_conversation(
+            self,
+            user_message: str,
+            system_message: Optional[str] = None,
+            history: Optional[List[Dict[str, str]]] = None,
+            conversation_id: Optional[str] = None
+    ) -> Any:
+        """交互式函数调用
+        支持多轮函数调用，会将函数结果加入对话历史，并生成最终响应。
+        适用于需要多个函数协同工作的复杂场景。
+        配置了 checkpoint_store 时，每完成一个函数调用都会写入检查点，
+        失败后可通过 resume_conversation(conversation_id) 从最后完成的一轮继续。
+        
+        Args:
+            user_message: 用户输入的消息
+            system_message: 系统提示消息（可选）
+            history: 对话历史（可选）
+            conversation_id: 会话ID（可选，启用检查点时默认自动生成，见 self.conversation_id）
+        Returns:
+            response: GPT的响应，包含所有函数调用结果的总结
+        """
+        start_time = time.time()
+        logger.user_input(user_message)
+        
+        try:
+            # 准备请求
+            messages = prepare_messages(user_message, system_message, history)
+            request_data = {
+                **prepare_request_data(messages, self.functions, True, user_message, self.tools),
+                "tool_choice": "auto"  # 让模型自动选择是否调用函数
+            }
             
-            # 记录耗时
-            self.execution_time = time.time() - start_time
-            logger.execution_time(self.execution_time)
+            state = None
+            if self.checkpoint_store is not None:
+                state = ConversationState(
+                    conversation_id=conversation_id or self.checkpoint_store.new_conversation_id(),
+                    messages=messages
+                )
+                self.conversation_id = state.conversation_id
+                self.checkpoint_store.save(state)
             
-            # 返回最后一个响应，但保持tool_calls字段
-            if response.choices and response.choices[0].message:
-                message = response.choices[0].message
-                if not message.tool_calls:
-                    # 如果最后一个响应没有tool_calls，我们需要从历史中找到最后一个带有tool_calls的消息
-                    for msg in reversed(messages):
-                        if msg.get("role") == "assistant" and msg.get("tool_calls"):
-                            response.choices[0].message.tool_calls = msg["tool_calls"]
-                            break
+            return self._run_conversation(request_data, state, start_time)
             
-            return response
+        except Exception as e:
+            logger.error(str(e))
+            raise
+
+    def resume_conversation(self, conversation_id: str) -> Any:
+        """从检查点恢复交互式函数调用
+        从最后完成的一轮继续：已执行过的函数不会再次执行，
+        若中断时还有未执行完的 tool_calls，会先执行完它们再请求模型。
+        会话已完成时直接返回保存的最终响应，不再请求模型。
+        
+        Args:
+            conversation_id: 会话ID
+        Returns:
+            response: GPT的响应，包含所有函数调用结果的总结
+        Raises:
+            ValueError: 未配置检查点存储或检查点不存在
+        """
+        if self.checkpoint_store is None:
+            raise ValueError("未配置 checkpoint_store，无法恢复会话")
+        state = self.checkpoint_store.load(conversation_id)
+        if state is None:
+            raise ValueError(f"未找到会话检查点: {conversation_id}")
+        
+        self.conversation_id = conversation_id
+        if state.completed and state.response is not None:
+            from openai.types.chat import ChatCompletion  # 延迟导入，只有恢复会话时才需要
+            logger.system_message(f"会话已完成，返回保存的最终响应: {conversation_id}")
+            self.raw_response = None
+            self.execution_time = 0.0
+            return ChatCompletion.model_validate(state.response)
+        
+        start_time = time.time()
+        logger.system_message(f"从第 {state.turn} 轮恢复会话: {conversation_id}")
+        
+        try:
+            request_data = {
+                "model": GPT_MODEL_NAME,
+                "messages": state.messages,
+                "tools": self.tools,
+                "tool_choice": "auto"
+            }
+            return self._run_conversation(request_data, state, start_time)
             
         except Exception as e:
             logger.error(str(e))
-            raise 
\ No newline at end of file
+            raise
+
+    def _run_conversation(
+            self,
+            request_data: Dict,
+            state: Optional[ConversationState],
+            start_time: float
+    ) -> Any:
+        """执行多轮函数调用循环，并在每个函数调用完成后写入检查点
+        Args:
+            request_data: 首次请求的数据
+            state: 检查点状态（未启用检查点时为 None）
+            start_time: 开始时间
+        Returns:
+            response: GPT的响应
+        """
+        messages = request_data["messages"]
+        executed_results = state.tool_results if state is not None else None
+        
+        # 确保 last_request 是可序列化的
+        self.last_request = {
+            "model": request_data["model"],
+            "messages": request_data["messages"],
+            "tools": request_data["tools"],
+            "tool_choice": request_data.get("tool_choice", "auto")
+        }
+        logger.request_data(self.last_request)
+        
+        response = None
+        tool_calls = state.pending_tool_calls if state is not None else None
+        if not tool_calls:
+            # 发送请求
+            response = self.client.chat.completions.create(**request_data)
+            self._record_response(response)
+            
+            if response.choices and response.choices[0].message:
+                tool_calls = response.choices[0].message.tool_calls
+        
+        # 处理tool_calls
+        while tool_calls:
+            self._save_checkpoint(state, pending_tool_calls=list(tool_calls))
+            for tool_call in tool_calls:
+                if executed_results is not None and tool_call.id in executed_results:
+                    # 已执行并写入消息历史的函数调用（从检查点恢复时）
+                    continue
+                handle_conversation_tool_call(
+                    tool_call,
+                    messages,
+                    self.available_functions,
+                    logger,
+                    executed_results
+                )
+                self._save_checkpoint(state)
+            
+            # 本轮函数调用全部完成
+            self._save_checkpoint(state, pending_tool_calls=[], turn_done=True)
+            
+            # 生成新的响应
+            response = self.client.chat.completions.create(
+                model=GPT_MODEL_NAME,
+                messages=messages,
+                tools=self.tools,
+                tool_choice="auto"
+            )
+            self._record_usage(response)
+            
+            if response.choices and response.choices[0].message:
+                message = response.choices[0].message
+                tool_calls = message.tool_calls
+                if not tool_calls:
+                    # 如果没有更多的函数调用，添加最终响应到消息历史
+                    messages.append({
+                        "role": "assistant",
+                        "content": message.content,
+                        "tool_calls": None
+                    })
+            else:
+                break
+        
+        # 返回最后一个响应，但保持tool_calls字段
+        if response.choices and response.choices[0].message:
+            message = response.choices[0].message
+            if not message.tool_calls:
+                # 如果最后一个响应没有tool_calls，我们需要从历史中找到最后一个带有tool_calls的消息
+                for msg in reversed(messages):
+                    if msg.get("role") == "assistant" and msg.get("tool_calls"):
+                        response.choices[0].message.tool_calls = msg["tool_calls"]
+                        break
+        
+        if state is not None:
+            state.completed = True
+            state.response = response.model_dump()
+            self._save_checkpoint(state)
+        
+        # 记录耗时
+        self.execution_time = time.time() - start_time
+        logger.execution_time(self.execution_time)
+        
+        return response
+
+    def _save_checkpoint(
+            self,
+            state: Optional[ConversationState],
+            pending_tool_calls: Optional[List[Any]] = None,
+            turn_done: bool = False
+    ) -> None:
+        """更新并写入检查点（未启用检查点时不做任何事）"""
+        if state is None:
+            return
+        if pending_tool_calls is not None:
+            state.pending_tool_calls = pending_tool_calls
+        if turn_done:
+            state.turn += 1
+        self.checkpoint_store.save(state)
+
+    def call_many(
+            self,
+            messages: Iterable[str],
+            system_message: Optional[str] = None,
+            concurrency: int = 8,
+            force_function_call: bool = True
+    ) -> Iterator[CallResult]:
+        """批量函数调用
+        对一组相互独立的用户消息执行 call_single_function，
+        在共享的 client 上以有界并发流水线发送请求，按完成顺序产出结果。
+        单条消息失败不会影响其它消息，异常记录在 CallResult.error 中。
+        注意：last_request / raw_response / execution_time 在并发下只反映最后完成的一次调用。
+        
+        Args:
+            messages: 用户消息序列（可以是惰性迭代器）
+            system_message: 系统提示消息（可选，所有消息共用）
+            concurrency: 同时进行中的最大请求数
+            force_function_call: 是否强制使用函数调用（默认True）
+        Yields:
+            CallResult: 按完成顺序产出的调用结果
+        """
+        if concurrency < 1:
+            raise ValueError(f"concurrency 必须大于 0: {concurrency}")
+        
+        pending = iter(enumerate(messages))
+        in_flight = {}
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="call_many")
+        
+        def submit_next() -> bool:
+            item = next(pending, None)
+            if item is None:
+                return False
+            index, user_message = item
+            # 复制当前上下文，使 request_context() 声明的调度信息对线程池中的调用生效
+            future = executor.submit(
+                contextvars.copy_context().run,
+                self.call_single_function,
+                user_message,
+                system_message,
+                None,
+                force_function_call
+            )
+            in_flight[future] = (index, user_message)
+            return True
+        
+        try:
+            # 填满并发窗口
+            while len(in_flight) < concurrency and submit_next():
+                pass
+            
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, user_message = in_flight.pop(future)
+                    # 先补充新请求再产出结果，避免调用方处理结果时流水线空转
+                    submit_next()
+                    error = future.exception()
+                    yield CallResult(
+                        index=index,
+                        user_message=user_message,
+                        response=None if error else future.result(),
+                        error=error
+                    )
+        finally:
+            # 调用方提前停止迭代时，取消尚未开始的请求
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,103 @@
+import os
+import uuid
+from datetime import datetime
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional
+
+from exam_funcall.function_caller.infra import fast_json
+
+@dataclass
+class ConversationState:
+    """多轮函数调用会话的检查点状态
+    Attributes:
+        conversation_id: 会话ID
+        messages: 当前的消息历史
+        turn: 已完成的函数调用轮数
+        pending_tool_calls: 当前轮模型返回、尚未全部执行完的 tool_calls
+        tool_results: tool_call_id 到函数执行结果的映射，恢复时不会重复执行
+        completed: 会话是否已生成最终响应
+        response: 最终响应（completed 时保存），恢复已完成的会话时直接返回，不再请求模型
+        updated_at: 最后更新时间
+    """
+    conversation_id: str
+    messages: List[Dict] = field(default_factory=list)
+    turn: int = 0
+    pending_tool_calls: List[Any] = field(default_factory=list)
+    tool_results: Dict[str, str] = field(default_factory=dict)
+    completed: bool = False
+    response: Optional[Dict] = None
+    updated_at: str = ""
+
+def _to_serializable(obj: Any) -> Any:
+    """将消息中的 tool_call 对象转换为可 JSON 序列化的字典"""
+    if hasattr(obj, 'model_dump'):
+        return obj.model_dump()
+    if isinstance(obj, dict):
+        return {k: _to_serializable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_to_serializable(x) for x in obj]
+    return obj
+
+def _restore_tool_calls(tool_calls: Optional[List[Dict]]) -> Optional[List[Any]]:
+    """将字典形式的 tool_calls 还原为 SDK 对象"""
+    if not tool_calls:
+        return tool_calls
+    from openai.types.chat import ChatCompletionMessageToolCall  # 延迟导入，只有恢复会话时才需要
+    return [ChatCompletionMessageToolCall.model_validate(tc) for tc in tool_calls]
+
+class CheckpointStore:
+    """基于本地目录的会话检查点存储，每个会话一个 JSON 文件"""
+
+    def __init__(self, directory: str = ".funcall_checkpoints"):
+        """初始化检查点存储
+        Args:
+            directory: 检查点文件所在目录
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def new_conversation_id() -> str:
+        """生成新的会话ID"""
+        return uuid.uuid4().hex
+
+    def _path(self, conversation_id: str) -> str:
+        return os.path.join(self.directory, f"{conversation_id}.json")
+
+    def save(self, state: ConversationState) -> None:
+        """原子地写入检查点（先写临时文件再替换）"""
+        state.updated_at = datetime.now().isoformat()
+        data = _to_serializable(asdict(state))
+        path = self._path(state.conversation_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(fast_json.dumps(data))
+        os.replace(tmp_path, path)
+
+    def load(self, conversation_id: str) -> Optional[ConversationState]:
+        """读取检查点，不存在时返回 None"""
+        path = self._path(conversation_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            data = fast_json.loads(f.read())
+
+        state = ConversationState(**data)
+        for message in state.messages:
+            if message.get("tool_calls"):
+                message["tool_calls"] = _restore_tool_calls(message["tool_calls"])
+        state.pending_tool_calls = _restore_tool_calls(state.pending_tool_calls) or []
+        return state
+
+    def delete(self, conversation_id: str) -> None:
+        """删除检查点"""
+        path = self._path(conversation_id)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def list_ids(self) -> List[str]:
+        """列出所有检查点的会话ID"""
+        return sorted(
+            name[:-len(".json")] for name in os.listdir(self.directory)
+            if name.endswith(".json")
+        )
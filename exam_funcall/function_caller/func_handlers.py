@@ -1,6 +1,5 @@
-import json
-from typing import Dict, List, Any
-from exam_funcall.function_caller.infra import logger
+from typing import Dict, List, Any, Optional
+from exam_funcall.function_caller.infra import logger, fast_json
 
 def execute_function(
         func_name: str,
@@ -45,7 +44,8 @@ def handle_conversation_tool_call(
         tool_call: Any,
         messages: List[Dict],
         available_functions: Dict[str, callable],
-        custom_logger: Any = None
+        custom_logger: Any = None,
+        executed_results: Optional[Dict[str, str]] = None
 ) -> None:
     """处理会话中的单个工具调用，并将结果添加到消息历史
     Args:
@@ -53,15 +53,24 @@ def handle_conversation_tool_call(
         messages: 消息历史列表
         available_functions: 可用函数映射
         custom_logger: 自定义日志器（可选）
+        executed_results: tool_call_id 到已执行结果的映射（可选）。
+            已存在的结果直接复用，不会重复执行函数；新结果会写回该映射。
     """
     log = custom_logger or logger
     
     if tool_call.type == "function":
-        log.function_call(tool_call.function.name, tool_call.function.arguments)
-        
         func_name = tool_call.function.name
-        func_args = json.loads(tool_call.function.arguments)
-        function_response = execute_function(func_name, func_args, available_functions, log)
+        
+        if executed_results is not None and tool_call.id in executed_results:
+            # 从检查点恢复时复用已执行的结果
+            function_response = executed_results[tool_call.id]
+            log.function_result(f"复用已执行的结果: {function_response}")
+        else:
+            log.function_call(tool_call.function.name, tool_call.function.arguments)
+            func_args = fast_json.loads(tool_call.function.arguments)
+            function_response = execute_function(func_name, func_args, available_functions, log)
+            if executed_results is not None:
+                executed_results[tool_call.id] = str(function_response)
         
         # 将函数调用结果添加到消息历史
         messages.append({
@@ -0,0 +1,270 @@
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from exam_funcall.function_caller.infra import logger, fast_json
+from exam_funcall.function_caller.func_handlers import execute_function
+
+def parse_partial_arguments(text: str) -> Dict:
+    """从流式输出中尚未完整的参数 JSON 里提取已经确定的顶层参数
+    只返回值已经完整结束的参数：字符串值在右引号处结束，
+    数字、布尔值等在其后的逗号或右括号处结束，数组和对象在匹配的右括号处结束。
+
+    Args:
+        text: 部分参数 JSON，例如 '{"city": "北京", "coun'
+    Returns:
+        args: 已确定的参数字典，无法解析时为空字典
+    """
+    depth = 0
+    in_string = False
+    escaped = False
+    string_is_value = False
+    after_colon = False
+    complete_at = None
+
+    for pos, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+                if depth == 1 and string_is_value:
+                    complete_at = pos + 1
+                    after_colon = False
+            continue
+
+        if char == '"':
+            in_string = True
+            string_is_value = depth == 1 and after_colon
+        elif char in "[{":
+            depth += 1
+        elif char in "]}":
+            depth -= 1
+            if depth == 1 and after_colon:
+                complete_at = pos + 1
+                after_colon = False
+            elif depth == 0:
+                complete_at = pos
+                break
+        elif depth == 1 and char == ":":
+            after_colon = True
+        elif depth == 1 and char == ",":
+            if after_colon:
+                complete_at = pos
+            after_colon = False
+
+    if complete_at is None:
+        return {}
+    try:
+        args = fast_json.loads(text[:complete_at].rstrip().rstrip(",") + "}")
+    except ValueError:
+        return {}
+    return args if isinstance(args, dict) else {}
+
+def parse_complete_arguments(text: str) -> Optional[Dict]:
+    """参数 JSON 已经完整结束时返回解析结果，否则返回 None"""
+    if not text.rstrip().endswith("}"):
+        return None
+    try:
+        args = fast_json.loads(text)
+    except ValueError:
+        return None
+    return args if isinstance(args, dict) else None
+
+@dataclass
+class ToolSpeculationStats:
+    """单个工具的投机执行指标"""
+    speculations: int = 0
+    hits: int = 0
+    misses: int = 0
+    saved_seconds: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        """命中率"""
+        return self.hits / self.speculations if self.speculations else 0.0
+
+    def to_dict(self) -> Dict:
+        """转换为字典以便日志输出"""
+        return {
+            "speculations": self.speculations,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+            "saved_seconds": round(self.saved_seconds, 4),
+        }
+
+@dataclass
+class _Speculation:
+    """一次进行中的投机执行"""
+    name: str
+    args: Dict
+    future: Future
+    started_at: float
+    complete: bool = False
+    """是否基于完整的参数对象启动"""
+
+class SpeculativeExecutor:
+    """流式工具参数的投机执行器
+    当流式输出中某个工具的名称和全部必填参数都已确定时，提前在线程池中执行该工具。
+    之后若参数对象结束时又多出了参数（例如可选参数），用完整参数重新投机一次。
+    补齐 schema 默认值后最终参数与投机参数一致时直接使用其结果，否则丢弃。
+    投机执行可能重复执行工具，只应对无副作用（或幂等、可缓存）的工具开启。
+    """
+
+    def __init__(
+            self,
+            functions: List[Dict],
+            available_functions: Dict[str, callable],
+            enabled_tools: Iterable[str],
+            max_workers: int = 4
+    ):
+        """初始化投机执行器
+        Args:
+            functions: Function descriptions 列表，用于获取各工具的必填参数
+            available_functions: 函数名到实际函数的映射
+            enabled_tools: 允许投机执行的工具名
+            max_workers: 投机执行线程数
+        """
+        self.available_functions = available_functions
+        self.enabled_tools = set(enabled_tools)
+        self.required_args = {
+            f["name"]: tuple(f.get("parameters", {}).get("required", []))
+            for f in functions
+        }
+        self.default_args = {
+            f["name"]: {
+                key: prop["default"]
+                for key, prop in f.get("parameters", {}).get("properties", {}).items()
+                if "default" in prop
+            }
+            for f in functions
+        }
+        self.stats: Dict[str, ToolSpeculationStats] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculation")
+        self._lock = threading.Lock()
+
+    def session(self) -> "SpeculationSession":
+        """为一次流式请求创建投机会话"""
+        return SpeculationSession(self)
+
+    def report(self) -> Dict[str, Dict]:
+        """各工具的投机执行指标"""
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in self.stats.items()}
+
+    def _tool_stats(self, name: str) -> ToolSpeculationStats:
+        return self.stats.setdefault(name, ToolSpeculationStats())
+
+    def _with_defaults(self, name: str, args: Dict) -> Dict:
+        """补齐 schema 中声明了默认值的参数，省略默认参数与显式传入默认值视为相同"""
+        return {**self.default_args.get(name, {}), **args}
+
+    def _record(self, name: str, hit: bool, saved: float = 0.0) -> None:
+        with self._lock:
+            stats = self._tool_stats(name)
+            stats.speculations += 1
+            if hit:
+                stats.hits += 1
+                stats.saved_seconds += saved
+            else:
+                stats.misses += 1
+
+    def _run(self, name: str, args: Dict) -> Tuple[Any, float]:
+        """执行工具并返回 (结果, 执行耗时)"""
+        start = time.time()
+        result = execute_function(name, args, self.available_functions, logger)
+        return result, time.time() - start
+
+class SpeculationSession:
+    """一次流式请求内的投机执行状态，按 tool_call 的 index 跟踪"""
+
+    def __init__(self, executor: SpeculativeExecutor):
+        self.executor = executor
+        self._speculations: Dict[int, _Speculation] = {}
+
+    def observe(self, index: int, name: Optional[str], partial_arguments: str) -> None:
+        """观察流式输出中的部分 tool_call，条件满足时启动投机执行
+        Args:
+            index: tool_call 在消息中的位置
+            name: 工具名（可能尚未出现）
+            partial_arguments: 目前为止累积的参数文本
+        """
+        executor = self.executor
+        if name not in executor.enabled_tools or name not in executor.available_functions:
+            return
+
+        speculation = self._speculations.get(index)
+        if speculation is not None:
+            if speculation.complete:
+                return
+            args = parse_complete_arguments(partial_arguments)
+            if args is None:
+                return
+            if speculation.name == name and executor._with_defaults(name, args) == speculation.args:
+                speculation.complete = True
+                return
+            # 参数对象结束时多出了参数，丢弃先前的投机，用完整参数重新投机
+            speculation.future.cancel()
+            executor._record(speculation.name, hit=False)
+            self._start(index, name, args, complete=True)
+            return
+
+        args = parse_partial_arguments(partial_arguments)
+        if not all(key in args for key in executor.required_args.get(name, ())):
+            return
+        self._start(index, name, args, complete=parse_complete_arguments(partial_arguments) is not None)
+
+    def _start(self, index: int, name: str, args: Dict, complete: bool) -> None:
+        executor = self.executor
+        logger.system_message(f"投机执行 {name}: {fast_json.dumps(args)}")
+        self._speculations[index] = _Speculation(
+            name=name,
+            args=executor._with_defaults(name, args),
+            future=executor._pool.submit(executor._run, name, args),
+            started_at=time.time(),
+            complete=complete
+        )
+
+    def resolve(self, index: int, name: str, final_args: Dict) -> Tuple[bool, Any]:
+        """用最终参数核对投机执行
+        Args:
+            index: tool_call 在消息中的位置
+            name: 最终的工具名
+            final_args: 最终的完整参数
+        Returns:
+            (hit, result): 命中时 result 为投机执行的结果；未命中时 result 为 None
+        """
+        speculation = self._speculations.pop(index, None)
+        if speculation is None:
+            return False, None
+
+        if speculation.name != name or speculation.args != self.executor._with_defaults(name, final_args):
+            # 参数发生变化，丢弃投机结果
+            speculation.future.cancel()
+            self.executor._record(speculation.name, hit=False)
+            return False, None
+
+        resolved_at = time.time()
+        try:
+            result, duration = speculation.future.result()
+        except Exception:
+            # 投机执行失败时按未命中处理，由正常路径重新执行并报告错误
+            self.executor._record(name, hit=False)
+            return False, None
+
+        # 节省的时间 = 工具执行中与流式输出重叠的部分
+        saved = min(duration, resolved_at - speculation.started_at)
+        self.executor._record(name, hit=True, saved=saved)
+        return True, result
+
+    def close(self) -> None:
+        """丢弃所有未核对的投机执行（例如最终响应中没有对应的 tool_call）"""
+        for speculation in self._speculations.values():
+            speculation.future.cancel()
+            self.executor._record(speculation.name, hit=False)
+        self._speculations.clear()
@@ -0,0 +1,76 @@
+"""提示缓存命中统计
+读取响应中的 usage.prompt_tokens_details.cached_tokens，按场景汇总缓存命中的 token 比例，
+用于确认规范化的请求前缀（见 func_utils.build_tools）确实命中了服务端的提示缓存。
+"""
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+@dataclass
+class PromptCacheStats:
+    """一个场景的提示缓存统计"""
+    requests: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    cache_hits: int = 0  # cached_tokens > 0 的请求数
+
+    @property
+    def cached_ratio(self) -> float:
+        """缓存命中的 prompt token 比例"""
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cache_hits": self.cache_hits,
+            "cached_ratio": round(self.cached_ratio, 4),
+        }
+
+def _field(obj: Any, name: str) -> Any:
+    """兼容对象和字典两种形式的字段读取"""
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+class PromptCacheTracker:
+    """按场景汇总提示缓存统计（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.scenarios: Dict[str, PromptCacheStats] = {}
+
+    def record(self, scenario: str, usage: Any) -> Optional[int]:
+        """记录一次响应的 usage
+        Args:
+            scenario: 场景名
+            usage: 响应的 usage（没有 usage 时忽略）
+        Returns:
+            cached_tokens: 本次命中缓存的 token 数（没有 usage 时为 None）
+        """
+        prompt_tokens = _field(usage, "prompt_tokens")
+        if prompt_tokens is None:
+            return None
+        cached_tokens = _field(_field(usage, "prompt_tokens_details"), "cached_tokens") or 0
+        with self._lock:
+            stats = self.scenarios.setdefault(scenario, PromptCacheStats())
+            stats.requests += 1
+            stats.prompt_tokens += prompt_tokens
+            stats.cached_tokens += cached_tokens
+            stats.cache_hits += cached_tokens > 0
+        return cached_tokens
+
+    def report(self) -> Dict[str, Dict]:
+        """各场景的统计"""
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in self.scenarios.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.scenarios.clear()
+
+# 全局统计，所有调用器共用
+prompt_cache_tracker = PromptCacheTracker()
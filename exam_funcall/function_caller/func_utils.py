@@ -1,6 +1,40 @@
-from typing import Dict, List, Optional
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
 
-from exam_funcall.function_caller.infra import GPT_MODEL_NAME
+from exam_funcall.function_caller.infra import GPT_MODEL_NAME, fast_json
+
+def canonicalize(value: Any) -> Any:
+    """递归地按键排序字典，使相同内容总是序列化为相同的字节（列表顺序保持不变）"""
+    if isinstance(value, dict):
+        return {key: canonicalize(value[key]) for key in sorted(value)}
+    if isinstance(value, (list, tuple)):
+        return [canonicalize(item) for item in value]
+    return value
+
+def build_tools(functions: List[Dict]) -> List[Dict]:
+    """生成规范化的 tools 列表
+    工具按名称排序、字段按键排序，保证相同的工具集总是产生字节相同的请求前缀，
+    从而命中服务端的提示缓存（prompt caching）。
+    """
+    return [
+        {"type": "function", "function": canonicalize(f)}
+        for f in sorted(functions, key=lambda f: f.get("name", ""))
+    ]
+
+def leading_system_contents(messages: List[Dict]) -> Tuple[Any, ...]:
+    """消息列表开头连续的系统消息内容（对话中途的系统消息不属于请求前缀）"""
+    system = []
+    for m in messages:
+        if not (isinstance(m, dict) and m.get("role") == "system"):
+            break
+        system.append(m.get("content"))
+    return tuple(system)
+
+def prefix_fingerprint(messages: List[Dict], tools: Optional[List[Dict]]) -> str:
+    """请求前缀（开头的系统消息 + tools）的指纹，用于按前缀分组统计缓存命中"""
+    system = list(leading_system_contents(messages))
+    digest = hashlib.sha1(fast_json.dumps({"system": system, "tools": tools or []}).encode("utf-8"))
+    return digest.hexdigest()[:12]
 
 def prepare_messages(
         user_message: str,
@@ -8,6 +42,7 @@ def prepare_messages(
         history: Optional[List[Dict[str, str]]]
 ) -> List[Dict[str, str]]:
     """准备消息列表
+    system_message 放在最前面作为稳定的请求前缀，历史消息保持原有顺序（对话中途的系统消息不前移）。
     Args:
         user_message: 用户消息
         system_message: 系统消息
@@ -27,7 +62,8 @@ def prepare_request_data(
         messages: List[Dict[str, str]],
         functions: List[Dict],
         force_function_call: bool,
-        user_message: str
+        user_message: str,
+        tools: Optional[List[Dict]] = None
 ) -> Dict:
     """准备请求数据
     Args:
@@ -35,6 +71,7 @@ def prepare_request_data(
         functions: 函数描述列表
         force_function_call: 是否强制使用函数调用
         user_message: 用户消息
+        tools: 预先生成的规范化 tools 列表（可选，默认由 functions 生成）
     Returns:
         request_data: 准备好的请求数据
     """
@@ -45,7 +82,7 @@ def prepare_request_data(
     
     if functions and (force_function_call or "function" in user_message.lower()):
         request_data.update({
-            "tools": [{"type": "function", "function": f} for f in functions],
+            "tools": tools if tools is not None else build_tools(functions),
             "tool_choice": "auto"
         })
     return request_data
@@ -1,7 +1,8 @@
 import os
 from typing import Dict, List, Any, Optional, Tuple
 from dotenv import load_dotenv
-from openai import AzureOpenAI
+
+from exam_funcall.function_caller.infra.request_scheduler import ScheduledClient, get_request_scheduler
 
 # 加载环境变量
 load_dotenv()
@@ -18,6 +19,8 @@ class AzureConfig:
     @classmethod
     def test_connection(cls) -> Tuple[bool, str]:
         """测试Azure OpenAI连接"""
+        from openai import AzureOpenAI
+
         try:
             client = AzureOpenAI(
                 api_key=cls.API_KEY,
@@ -33,20 +36,60 @@ class AzureConfig:
         except Exception as e:
             return False, str(e)
 
+_shared_client: Optional[ScheduledClient] = None
+
+def get_shared_client() -> ScheduledClient:
+    """进程内共享的 Azure OpenAI client（复用连接池），请求经过全局请求调度器排队
+    client 在第一次使用时才创建，openai 也在此时才导入，导入本模块不会触发网络客户端的构建。
+    """
+    global _shared_client
+    if _shared_client is None:
+        from openai import AzureOpenAI
+
+        _shared_client = ScheduledClient(
+            AzureOpenAI(
+                api_key=AzureConfig.API_KEY,
+                api_version=AzureConfig.API_VERSION,
+                azure_endpoint=AzureConfig.ENDPOINT
+            ),
+            get_request_scheduler()
+        )
+    return _shared_client
+
 class GPTBase:
     """GPT调用器基类"""
     
     def __init__(self):
         """初始化基类"""
-        self.client = AzureOpenAI(
-            api_key=AzureConfig.API_KEY,
-            api_version=AzureConfig.API_VERSION,
-            azure_endpoint=AzureConfig.ENDPOINT
-        )
+        self._client = None
         self.last_request = None
         self.raw_response = None
         self.execution_time = 0.0
     
+    @property
+    def client(self) -> Any:
+        """API client，第一次发请求时才获取共享 client（可直接赋值替换）"""
+        if self._client is None:
+            self._client = get_shared_client()
+        return self._client
+    
+    @client.setter
+    def client(self, value: Any):
+        self._client = value
+    
+    @property
+    def raw_response(self) -> Optional[Dict]:
+        """最后一次API响应
+        可以直接赋值响应对象，只有在读取时才转换为字典，避免每轮都执行 model_dump。
+        """
+        if hasattr(self._raw_response, 'model_dump'):
+            self._raw_response = self._raw_response.model_dump()
+        return self._raw_response
+    
+    @raw_response.setter
+    def raw_response(self, value: Any):
+        self._raw_response = value
+    
     def call(
             self,
             user_message: str,
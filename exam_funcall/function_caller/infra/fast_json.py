@@ -0,0 +1,95 @@
+"""可插拔的JSON后端
+优先使用 orjson，其次 msgspec，都未安装时回退到标准库 json。
+可以通过环境变量 FUNCALL_JSON_BACKEND=orjson|msgspec|json 指定后端，
+或在运行时调用 set_backend() 切换（例如基准测试中对比不同后端）。
+"""
+import os
+import json
+from typing import Any, Callable, Optional
+
+BACKENDS = ("orjson", "msgspec", "json")
+
+def _json_dumps(obj: Any, indent: bool = False, default: Optional[Callable] = None) -> str:
+    return json.dumps(obj, indent=2 if indent else None, ensure_ascii=False, default=default)
+
+_backend_name = "json"
+_loads: Callable[[Any], Any] = json.loads
+_dumps: Callable[..., str] = _json_dumps
+
+def _make_orjson():
+    import orjson
+
+    def dumps(obj: Any, indent: bool = False, default: Optional[Callable] = None) -> str:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=default, option=option).decode("utf-8")
+
+    return orjson.loads, dumps
+
+def _make_msgspec():
+    import msgspec
+
+    encoder = msgspec.json.Encoder()
+    decoder = msgspec.json.Decoder()
+
+    def dumps(obj: Any, indent: bool = False, default: Optional[Callable] = None) -> str:
+        data = msgspec.json.encode(obj, enc_hook=default) if default else encoder.encode(obj)
+        if indent:
+            data = msgspec.json.format(data, indent=2)
+        return data.decode("utf-8")
+
+    return decoder.decode, dumps
+
+def set_backend(name: Optional[str] = None) -> str:
+    """选择JSON后端
+    Args:
+        name: 后端名称（orjson / msgspec / json），为 None 时按优先级自动选择已安装的后端
+    Returns:
+        name: 实际使用的后端名称
+    Raises:
+        ValueError: 未知的后端名称
+        ImportError: 指定的后端未安装
+    """
+    global _backend_name, _loads, _dumps
+
+    if name is not None and name not in BACKENDS:
+        raise ValueError(f"未知的JSON后端: {name}，可选: {', '.join(BACKENDS)}")
+
+    candidates = [name] if name else list(BACKENDS)
+    for candidate in candidates:
+        try:
+            if candidate == "orjson":
+                _loads, _dumps = _make_orjson()
+            elif candidate == "msgspec":
+                _loads, _dumps = _make_msgspec()
+            else:
+                _loads, _dumps = json.loads, _json_dumps
+        except ImportError:
+            if name:
+                raise
+            continue
+        _backend_name = candidate
+        break
+    return _backend_name
+
+def backend_name() -> str:
+    """当前使用的JSON后端名称"""
+    return _backend_name
+
+def loads(data: Any) -> Any:
+    """解析JSON字符串或字节串"""
+    return _loads(data)
+
+def dumps(obj: Any, indent: bool = False, default: Optional[Callable] = None) -> str:
+    """序列化为JSON字符串（保留非ASCII字符）
+    Args:
+        obj: 要序列化的对象
+        indent: 是否使用2空格缩进
+        default: 不可序列化对象的转换函数（可选）
+    Raises:
+        TypeError: 对象不可序列化
+    """
+    return _dumps(obj, indent=indent, default=default)
+
+set_backend(os.getenv("FUNCALL_JSON_BACKEND") or None)
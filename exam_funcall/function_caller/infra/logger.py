@@ -1,9 +1,10 @@
 import logging
-import colorlog
 from enum import Enum
 from typing import Any, Dict, List
 from functools import wraps
 
+from exam_funcall.function_caller.infra import fast_json
+
 class LogLevel(Enum):
     """自定义日志级别，避免与标准日志级别混淆"""
     TEST = 100
@@ -44,28 +45,41 @@ class Logger:
         return cls._instance
     
     def _init(self):
-        """初始化日志器"""
-        self.logger = colorlog.getLogger('gpt_caller')
+        """初始化日志器
+        只注册日志级别，colorlog 处理器推迟到第一次输出日志时才创建，避免导入时的开销。
+        """
+        self.logger = logging.getLogger('gpt_caller')
         if not self.logger.handlers:
             # 注册自定义日志级别
             for level in LogLevel:
                 logging.addLevelName(level.value, level.name)
-            
-            # 配置处理器
+            self.logger.setLevel(min(level.value for level in LogLevel))
+    
+    @property
+    def handler(self) -> logging.Handler:
+        """输出处理器（第一次访问时创建）"""
+        return self._ensure_handler()
+    
+    def _ensure_handler(self) -> logging.Handler:
+        """创建输出处理器（已存在时直接返回），延迟到第一次输出日志时导入 colorlog"""
+        if not self.logger.handlers:
+            import colorlog
+
             handler = colorlog.StreamHandler()
             handler.setFormatter(colorlog.ColoredFormatter(
                 '%(log_color)s%(message)s%(reset)s',
                 log_colors={name: log_type.color for name, log_type in LogType.__members__.items()}
             ))
             self.logger.addHandler(handler)
-            self.logger.setLevel(min(level.value for level in LogLevel))
+        return self.logger.handlers[0]
     
     def _format_content(self, content: Any) -> str:
         """格式化日志内容"""
+        if hasattr(content, 'model_dump'):
+            content = content.model_dump(exclude_none=True)
         if isinstance(content, (dict, list)):
-            import json
             try:
-                return json.dumps(content, indent=2, ensure_ascii=False)
+                return fast_json.dumps(content, indent=True)
             except TypeError:
                 # 如果对象不可序列化，尝试将其转换为可序列化的形式
                 def convert_to_serializable(obj):
@@ -80,11 +94,15 @@ class Logger:
                     return str(obj)
                 
                 serializable_content = convert_to_serializable(content)
-                return json.dumps(serializable_content, indent=2, ensure_ascii=False)
+                return fast_json.dumps(serializable_content, indent=True)
         return str(content)
     
     def _log(self, log_type: LogType, content: Any):
         """输出带格式的日志"""
+        # 日志级别未启用时跳过格式化，避免序列化大对象的开销
+        if not self.logger.isEnabledFor(log_type.level):
+            return
+        self._ensure_handler()
         self.logger.log(log_type.level, f"\n{'='*80}")
         self.logger.log(log_type.level, f"{log_type.title}")
         self.logger.log(log_type.level, f"{'='*80}\n")
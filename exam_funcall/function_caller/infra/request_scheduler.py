@@ -0,0 +1,395 @@
+"""模型请求调度器
+位于共享的 LLM client 之前，决定哪个请求先发出：
+- 优先级类别：interactive 总是先于 batch 获得并发槽位
+- 同一类别内按租户公平排队（按权重的虚拟时间轮转），每个租户内按截止时间最早优先（EDF）
+- 预计已无法在截止时间前完成的请求（排队时间 + 该类别的平均服务时间超过截止时间）提前丢弃，
+  抛出 DeadlineExceeded，而不是占用槽位后再超时
+- 每个类别记录排队时间分位数、丢弃数和平均服务时间
+
+调用方通过 request_context() 声明当前请求的类别、租户和截止时间，
+ScheduledClient / AsyncScheduledClient 在 chat.completions.create 时按该上下文排队。
+"""
+import os
+import time
+import heapq
+import asyncio
+import threading
+import itertools
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+PRIORITY_CLASSES = ("interactive", "batch")  # 按优先级从高到低
+DEFAULT_TENANT = "default"
+
+class DeadlineExceeded(Exception):
+    """请求无法在截止时间前完成，已被调度器丢弃"""
+
+@dataclass(frozen=True)
+class RequestContext:
+    """当前请求的调度信息
+    Attributes:
+        priority: 优先级类别
+        tenant: 租户
+        deadline: 截止时间（调度器时钟，None 表示没有截止时间）
+    """
+    priority: str = PRIORITY_CLASSES[0]
+    tenant: str = DEFAULT_TENANT
+    deadline: Optional[float] = None
+
+_current_context: ContextVar[RequestContext] = ContextVar("request_context", default=RequestContext())
+
+@contextmanager
+def request_context(
+        priority: Optional[str] = None,
+        tenant: Optional[str] = None,
+        timeout: Optional[float] = None,
+        deadline: Optional[float] = None
+) -> Iterator[RequestContext]:
+    """在当前上下文中声明请求的调度信息（未指定的字段沿用外层上下文）
+    Args:
+        priority: 优先级类别（interactive / batch）
+        tenant: 租户
+        timeout: 从现在起的超时时间（秒），与 deadline 二选一
+        deadline: 截止时间（time.monotonic 时钟）
+    注意：线程池不会自动继承 contextvars，提交任务时需使用 contextvars.copy_context().run。
+    """
+    outer = _current_context.get()
+    if timeout is not None:
+        deadline = time.monotonic() + timeout
+    context = RequestContext(
+        priority=priority or outer.priority,
+        tenant=tenant or outer.tenant,
+        deadline=deadline if deadline is not None else outer.deadline
+    )
+    token = _current_context.set(context)
+    try:
+        yield context
+    finally:
+        _current_context.reset(token)
+
+def current_context() -> RequestContext:
+    return _current_context.get()
+
+@dataclass
+class _Ticket:
+    context: RequestContext
+    enqueued_at: float
+    on_done: Callable[[Optional[Exception]], None]
+    state: str = "queued"  # queued / granted / dropped / cancelled
+
+class _ClassQueue:
+    """一个优先级类别的队列：租户间按虚拟时间公平轮转，租户内按截止时间排序"""
+
+    def __init__(self):
+        self.tenants: Dict[str, List[Tuple[float, int, _Ticket]]] = {}
+        self.vtime: Dict[str, float] = {}
+        self.system_vtime = 0.0
+        self.size = 0
+
+    def push(self, ticket: _Ticket, seq: int) -> None:
+        tenant = ticket.context.tenant
+        heap = self.tenants.get(tenant)
+        if not heap:
+            heap = self.tenants[tenant] = []
+            # 重新变为积压状态的租户不能用空闲期间“攒下”的份额插队
+            self.vtime[tenant] = max(self.vtime.get(tenant, 0.0), self.system_vtime)
+        deadline = ticket.context.deadline if ticket.context.deadline is not None else float("inf")
+        heapq.heappush(heap, (deadline, seq, ticket))
+        self.size += 1
+
+    def pop(self, weights: Dict[str, float]) -> _Ticket:
+        tenant = min(self.tenants, key=lambda t: self.vtime[t])
+        heap = self.tenants[tenant]
+        _, _, ticket = heapq.heappop(heap)
+        if not heap:
+            del self.tenants[tenant]
+        self.size -= 1
+        self.system_vtime = self.vtime[tenant]
+        self.vtime[tenant] += 1.0 / weights.get(tenant, 1.0)
+        return ticket
+
+@dataclass
+class ClassStats:
+    """一个优先级类别的统计"""
+    window: int = 1024
+    admitted: int = 0
+    dropped: int = 0
+    completed: int = 0
+    service_time: float = 0.0  # 服务时间的指数移动平均（秒）
+    queue_times: Deque[float] = field(init=False)
+
+    def __post_init__(self):
+        self.queue_times = deque(maxlen=self.window)
+
+    def record_service(self, seconds: float, alpha: float = 0.2) -> None:
+        self.completed += 1
+        self.service_time = seconds if self.completed == 1 else (1 - alpha) * self.service_time + alpha * seconds
+
+    def to_dict(self, queued: int) -> Dict:
+        ordered = sorted(self.queue_times)
+
+        def percentile_ms(q: float) -> float:
+            return round(ordered[int(q * (len(ordered) - 1))] * 1000, 3) if ordered else 0.0
+
+        return {
+            "queued": queued,
+            "admitted": self.admitted,
+            "dropped": self.dropped,
+            "completed": self.completed,
+            "queue_p50_ms": percentile_ms(0.5),
+            "queue_p99_ms": percentile_ms(0.99),
+            "service_ms": round(self.service_time * 1000, 3),
+        }
+
+class RequestScheduler:
+    """带优先级类别、截止时间和租户公平排队的并发调度器"""
+
+    def __init__(
+            self,
+            max_concurrency: int = 16,
+            classes: Tuple[str, ...] = PRIORITY_CLASSES,
+            tenant_weights: Optional[Dict[str, float]] = None,
+            clock: Callable[[], float] = time.monotonic
+    ):
+        """初始化调度器
+        Args:
+            max_concurrency: 同时进行中的最大请求数
+            classes: 优先级类别，按优先级从高到低
+            tenant_weights: 租户权重（可选，默认均为 1），权重越大分到的份额越多
+            clock: 时钟函数，截止时间使用同一时钟
+        """
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency 必须大于 0: {max_concurrency}")
+        self.max_concurrency = max_concurrency
+        self.classes = tuple(classes)
+        self.tenant_weights = dict(tenant_weights or {})
+        self.clock = clock
+        self.running = 0
+
+        self._queues = {name: _ClassQueue() for name in self.classes}
+        self.stats = {name: ClassStats() for name in self.classes}
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+
+    def _check_priority(self, priority: str) -> None:
+        if priority not in self._queues:
+            raise ValueError(f"未知的优先级类别: {priority}，可选: {', '.join(self.classes)}")
+
+    def _infeasible(self, context: RequestContext, now: float) -> bool:
+        """按该类别的平均服务时间估计，请求已无法在截止时间前完成"""
+        if context.deadline is None:
+            return False
+        return now + self.stats[context.priority].service_time > context.deadline
+
+    def _submit(self, context: RequestContext, on_done: Callable[[Optional[Exception]], None]) -> _Ticket:
+        """加入队列并尝试分发
+        Raises:
+            DeadlineExceeded: 提交时就已无法在截止时间前完成
+        """
+        self._check_priority(context.priority)
+        now = self.clock()
+        with self._lock:
+            if self._infeasible(context, now):
+                self.stats[context.priority].dropped += 1
+                raise DeadlineExceeded(f"请求无法在截止时间前完成（{context.priority}/{context.tenant}）")
+            ticket = _Ticket(context, now, on_done)
+            self._queues[context.priority].push(ticket, next(self._seq))
+        self._dispatch()
+        return ticket
+
+    def _dispatch(self) -> None:
+        """在有空闲槽位时按优先级放行请求，并丢弃已无法按时完成的请求"""
+        granted, dropped = [], []
+        with self._lock:
+            now = self.clock()
+            while self.running < self.max_concurrency:
+                queue = next((self._queues[c] for c in self.classes if self._queues[c].size), None)
+                if queue is None:
+                    break
+                ticket = queue.pop(self.tenant_weights)
+                if ticket.state != "queued":
+                    # 等待方已超时放弃
+                    continue
+                stats = self.stats[ticket.context.priority]
+                if self._infeasible(ticket.context, now):
+                    ticket.state = "dropped"
+                    stats.dropped += 1
+                    dropped.append(ticket)
+                    continue
+                ticket.state = "granted"
+                stats.admitted += 1
+                stats.queue_times.append(now - ticket.enqueued_at)
+                self.running += 1
+                granted.append(ticket)
+
+        for ticket in dropped:
+            ticket.on_done(DeadlineExceeded(
+                f"请求无法在截止时间前完成（{ticket.context.priority}/{ticket.context.tenant}）"
+            ))
+        for ticket in granted:
+            ticket.on_done(None)
+
+    def _abandon(self, ticket: _Ticket) -> bool:
+        """等待方超时：仍在排队时标记为丢弃（已放行时返回 False，由调用方正常释放）"""
+        with self._lock:
+            if ticket.state != "queued":
+                return False
+            # 留在堆中，分发时跳过
+            ticket.state = "dropped"
+            self.stats[ticket.context.priority].dropped += 1
+            return True
+
+    def _cancel(self, ticket: _Ticket) -> None:
+        """等待方被取消：仍在排队时标记为丢弃，已放行时归还槽位
+        只有状态为 granted 的请求占用了槽位（分发时已丢弃的请求没有），
+        被取消的请求没有真正执行，不计入平均服务时间。
+        """
+        with self._lock:
+            if ticket.state == "queued":
+                ticket.state = "dropped"
+                self.stats[ticket.context.priority].dropped += 1
+                return
+            if ticket.state != "granted":
+                return
+            ticket.state = "cancelled"
+            self.running -= 1
+        self._dispatch()
+
+    def _release(self, priority: str, service_time: float) -> None:
+        with self._lock:
+            self.running -= 1
+            self.stats[priority].record_service(service_time)
+        self._dispatch()
+
+    def _resolve(self, priority: Optional[str], tenant: Optional[str], deadline: Optional[float]) -> RequestContext:
+        context = _current_context.get()
+        return RequestContext(
+            priority=priority or context.priority,
+            tenant=tenant or context.tenant,
+            deadline=deadline if deadline is not None else context.deadline
+        )
+
+    @contextmanager
+    def slot(
+            self,
+            priority: Optional[str] = None,
+            tenant: Optional[str] = None,
+            deadline: Optional[float] = None
+    ) -> Iterator[RequestContext]:
+        """获取一个并发槽位（同步，阻塞当前线程），未指定的字段取自 request_context()
+        Raises:
+            DeadlineExceeded: 请求在排队期间无法按时完成
+        """
+        context = self._resolve(priority, tenant, deadline)
+        event = threading.Event()
+        outcome: List[Optional[Exception]] = []
+
+        def on_done(error: Optional[Exception]) -> None:
+            outcome.append(error)
+            event.set()
+
+        ticket = self._submit(context, on_done)
+        timeout = None if context.deadline is None else max(0.0, context.deadline - self.clock())
+        if not event.wait(timeout) and self._abandon(ticket):
+            raise DeadlineExceeded(f"请求排队超过截止时间（{context.priority}/{context.tenant}）")
+        event.wait()
+        if outcome[0] is not None:
+            raise outcome[0]
+
+        start = self.clock()
+        try:
+            yield context
+        finally:
+            self._release(context.priority, self.clock() - start)
+
+    @asynccontextmanager
+    async def aslot(
+            self,
+            priority: Optional[str] = None,
+            tenant: Optional[str] = None,
+            deadline: Optional[float] = None
+    ):
+        """slot() 的异步版本，排队时不阻塞事件循环"""
+        context = self._resolve(priority, tenant, deadline)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def on_done(error: Optional[Exception]) -> None:
+            def settle():
+                if not future.done():
+                    if error is None:
+                        future.set_result(None)
+                    else:
+                        future.set_exception(error)
+            loop.call_soon_threadsafe(settle)
+
+        ticket = self._submit(context, on_done)
+        timeout = None if context.deadline is None else max(0.0, context.deadline - self.clock())
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            if self._abandon(ticket):
+                raise DeadlineExceeded(f"请求排队超过截止时间（{context.priority}/{context.tenant}）") from None
+            await future
+        except asyncio.CancelledError:
+            self._cancel(ticket)
+            raise
+
+        start = self.clock()
+        try:
+            yield context
+        finally:
+            self._release(context.priority, self.clock() - start)
+
+    def to_dict(self) -> Dict:
+        """各类别的统计"""
+        with self._lock:
+            return {
+                "running": self.running,
+                "max_concurrency": self.max_concurrency,
+                "classes": {name: self.stats[name].to_dict(self._queues[name].size) for name in self.classes},
+            }
+
+class _ScheduledCompletions:
+    def __init__(self, completions: Any, scheduler: RequestScheduler):
+        self._completions = completions
+        self._scheduler = scheduler
+
+    def create(self, **kwargs) -> Any:
+        # 流式请求只在建立请求期间占用槽位
+        with self._scheduler.slot():
+            return self._completions.create(**kwargs)
+
+class _AsyncScheduledCompletions(_ScheduledCompletions):
+    async def create(self, **kwargs) -> Any:
+        async with self._scheduler.aslot():
+            return await self._completions.create(**kwargs)
+
+class ScheduledClient:
+    """为同步 OpenAI client 的 chat.completions.create 加上调度，其余属性直接转发"""
+    _completions_type = _ScheduledCompletions
+
+    def __init__(self, client: Any, scheduler: RequestScheduler):
+        self._client = client
+        self.scheduler = scheduler
+        self.chat = SimpleNamespace(completions=self._completions_type(client.chat.completions, scheduler))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+class AsyncScheduledClient(ScheduledClient):
+    """异步 OpenAI client（例如 pydantic-ai 的 OpenAIModel 使用的 client）的调度包装"""
+    _completions_type = _AsyncScheduledCompletions
+
+_scheduler: Optional[RequestScheduler] = None
+
+def get_request_scheduler() -> RequestScheduler:
+    """获取全局请求调度器，最大并发数来自环境变量 FUNCALL_MAX_CONCURRENCY（默认16）"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = RequestScheduler(max_concurrency=int(os.getenv("FUNCALL_MAX_CONCURRENCY", "16")))
+    return _scheduler
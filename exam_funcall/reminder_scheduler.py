@@ -0,0 +1,242 @@
+"""日程提醒调度器
+为 schedule_reminder 提供真正的提醒存储和触发：
+- 待触发的提醒保存在按触发时间排序的最小堆中，插入和触发都是 O(log n)
+- 取消操作只从索引中删除，堆中残留的条目在弹出时跳过（惰性删除）
+- 批量插入较多时直接 heapify，代价为 O(n)
+- 所有变更追加写入 JSONL 日志，启动时重放日志即可从崩溃中恢复；compact() 只保留未触发的提醒
+"""
+import os
+import time
+import heapq
+import uuid
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from exam_funcall.function_caller.infra import fast_json
+
+class ReminderScheduler:
+    """基于最小堆、带追加日志的提醒调度器"""
+
+    def __init__(
+            self,
+            log_path: Optional[str] = None,
+            dispatch: Optional[Callable[[Dict], Any]] = None,
+            durable: bool = False
+    ):
+        """初始化调度器，存在日志文件时重放日志恢复未触发的提醒
+        Args:
+            log_path: 追加日志文件路径（可选，为 None 时只保存在内存中）
+            dispatch: 提醒到期时调用的函数（可选，默认只记录为已触发）
+            durable: 每次写日志后是否 fsync（更安全但更慢）
+        """
+        self.log_path = log_path
+        self.dispatch = dispatch
+        self.durable = durable
+        self.fired_count = 0
+
+        self._heap: List[Tuple[float, int, str]] = []
+        self._pending: Dict[str, Dict] = {}
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._log_file = None
+
+        if log_path:
+            if os.path.exists(log_path):
+                self._replay(log_path)
+            self._log_file = open(log_path, "a", encoding="utf-8")
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    @staticmethod
+    def _fire_at(reminder: Dict) -> float:
+        return datetime.fromisoformat(reminder["time"]).timestamp()
+
+    def _push(self, reminder: Dict) -> None:
+        """加入索引和堆（调用方需持有锁）"""
+        self._pending[reminder["id"]] = reminder
+        heapq.heappush(self._heap, (self._fire_at(reminder), self._seq, reminder["id"]))
+        self._seq += 1
+
+    def _write_log(self, records: Iterable[Dict]) -> None:
+        """追加写入日志记录（调用方需持有锁）"""
+        if self._log_file is None:
+            return
+        self._log_file.write("".join(fast_json.dumps(r) + "\n" for r in records))
+        self._log_file.flush()
+        if self.durable:
+            os.fsync(self._log_file.fileno())
+
+    def _replay(self, log_path: str) -> None:
+        """重放日志，恢复未触发也未取消的提醒"""
+        pending: Dict[str, Dict] = {}
+        with open(log_path, "rb+") as f:
+            data = f.read()
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                # 崩溃时最后一行可能只写了一半：截断到最后一个换行，之后追加的记录才会从新的一行开始
+                f.truncate(end)
+            for line in data[:end].splitlines():
+                try:
+                    record = fast_json.loads(line)
+                except ValueError:
+                    continue
+                if record["op"] == "add":
+                    pending[record["reminder"]["id"]] = record["reminder"]
+                else:
+                    pending.pop(record["id"], None)
+
+        self._pending = pending
+        self._heap = [(self._fire_at(r), seq, r["id"]) for seq, r in enumerate(pending.values())]
+        heapq.heapify(self._heap)
+        self._seq = len(self._heap)
+
+    def add(self, reminder: Dict) -> str:
+        """添加一个提醒
+        Args:
+            reminder: schedule_reminder 返回的提醒字典（time 为 ISO 格式），缺少 id 时自动生成
+        Returns:
+            reminder_id: 提醒ID
+        """
+        return self.add_many([reminder])[0]
+
+    def add_many(self, reminders: Iterable[Dict]) -> List[str]:
+        """批量添加提醒，批量较大时重建堆而不是逐个插入
+        Args:
+            reminders: 提醒字典序列
+        Returns:
+            reminder_ids: 提醒ID列表
+        """
+        reminders = [r if "id" in r else {**r, "id": uuid.uuid4().hex} for r in reminders]
+        with self._cond:
+            self._write_log({"op": "add", "reminder": r} for r in reminders)
+            if len(reminders) > len(self._heap) // 4:
+                for reminder in reminders:
+                    self._pending[reminder["id"]] = reminder
+                    self._heap.append((self._fire_at(reminder), self._seq, reminder["id"]))
+                    self._seq += 1
+                heapq.heapify(self._heap)
+            else:
+                for reminder in reminders:
+                    self._push(reminder)
+            self._cond.notify_all()
+        return [r["id"] for r in reminders]
+
+    def cancel(self, reminder_id: str) -> bool:
+        """取消提醒
+        Returns:
+            cancelled: 提醒存在且尚未触发时返回 True
+        """
+        with self._cond:
+            if self._pending.pop(reminder_id, None) is None:
+                return False
+            self._write_log([{"op": "cancel", "id": reminder_id}])
+            # 已取消的条目过多时重建堆，避免堆无限增长
+            if len(self._heap) > 2 * len(self._pending) + 1024:
+                self._heap = [e for e in self._heap if e[2] in self._pending]
+                heapq.heapify(self._heap)
+            return True
+
+    def get(self, reminder_id: str) -> Optional[Dict]:
+        """获取未触发的提醒"""
+        return self._pending.get(reminder_id)
+
+    def next_fire_time(self) -> Optional[float]:
+        """下一个提醒的触发时间戳，没有待触发的提醒时为 None"""
+        with self._cond:
+            self._drop_cancelled()
+            return self._heap[0][0] if self._heap else None
+
+    def _drop_cancelled(self) -> None:
+        """弹出堆顶已取消的条目（调用方需持有锁）"""
+        while self._heap and self._heap[0][2] not in self._pending:
+            heapq.heappop(self._heap)
+
+    def fire_due(self, now: Optional[float] = None) -> List[Dict]:
+        """触发所有已到期的提醒
+        Args:
+            now: 当前时间戳（可选，默认 time.time()）
+        Returns:
+            fired: 本次触发的提醒列表（按触发时间排序）
+        """
+        now = time.time() if now is None else now
+        fired = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now:
+                _, _, reminder_id = heapq.heappop(self._heap)
+                reminder = self._pending.pop(reminder_id, None)
+                if reminder is not None:
+                    fired.append(reminder)
+            self._write_log({"op": "fire", "id": r["id"]} for r in fired)
+            self.fired_count += len(fired)
+
+        # 在锁外分发，避免回调阻塞插入
+        if self.dispatch is not None:
+            for reminder in fired:
+                self.dispatch(reminder)
+        return fired
+
+    def run(self, stop_event: threading.Event, max_wait: float = 1.0) -> None:
+        """触发循环：睡眠到下一个提醒到期（或有新提醒插入），然后分发到期的提醒
+        Args:
+            stop_event: 设置后退出循环
+            max_wait: 最长睡眠时间（秒）
+        """
+        while not stop_event.is_set():
+            self.fire_due()
+            with self._cond:
+                self._drop_cancelled()
+                wait = max_wait
+                if self._heap:
+                    wait = min(max_wait, max(0.0, self._heap[0][0] - time.time()))
+                if wait > 0:
+                    self._cond.wait(wait)
+
+    def start(self, max_wait: float = 1.0) -> threading.Event:
+        """在后台线程中启动触发循环
+        Returns:
+            stop_event: 设置后停止循环
+        """
+        stop_event = threading.Event()
+        thread = threading.Thread(target=self.run, args=(stop_event, max_wait), daemon=True, name="reminder-scheduler")
+        thread.start()
+        return stop_event
+
+    def compact(self) -> None:
+        """压缩日志：只保留未触发的提醒"""
+        if not self.log_path:
+            return
+        with self._cond:
+            tmp_path = f"{self.log_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write("".join(
+                    fast_json.dumps({"op": "add", "reminder": r}) + "\n"
+                    for r in self._pending.values()
+                ))
+            self._log_file.close()
+            os.replace(tmp_path, self.log_path)
+            self._log_file = open(self.log_path, "a", encoding="utf-8")
+
+    def close(self) -> None:
+        """关闭日志文件"""
+        with self._cond:
+            if self._log_file is not None:
+                self._log_file.close()
+                self._log_file = None
+
+_scheduler: Optional[ReminderScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> ReminderScheduler:
+    """获取全局提醒调度器，首次调用时创建并在后台线程中启动触发循环
+    日志路径来自环境变量 REMINDER_LOG_FILE（未设置时只保存在内存中）
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                scheduler = ReminderScheduler(os.getenv("REMINDER_LOG_FILE"))
+                scheduler.start()
+                _scheduler = scheduler
+    return _scheduler
@@ -0,0 +1,195 @@
+"""餐厅索引存储
+为 search_restaurants 提供可容纳百万级餐厅的列式存储：
+- 按评分降序排列行号，因此任何行号有序的倒排列表天然按评分排序
+- 位置、菜系、价格区间各有一个倒排索引（行号数组）
+- 查询时先按最低评分截断，再从最短的倒排列表开始与其余条件求交集，取前 N 个即为评分最高的结果
+- 数据以 NumPy .npz 列式文件保存和加载
+"""
+import os
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+# 默认示例数据（未配置数据文件时使用）
+SAMPLE_RESTAURANTS = [
+    {
+        "name": "北京烤鸭店",
+        "cuisine": "中餐",
+        "location": "北京",
+        "price_range": "$$",
+        "rating": 4.5
+    },
+    {
+        "name": "意大利面屋",
+        "cuisine": "意大利菜",
+        "location": "北京",
+        "price_range": "$$$",
+        "rating": 4.2
+    },
+    {
+        "name": "寿司之家",
+        "cuisine": "日本料理",
+        "location": "北京",
+        "price_range": "$$$",
+        "rating": 4.7
+    }
+]
+
+PRICE_RANGES = ("$", "$$", "$$$")
+
+def _encode(values: np.ndarray):
+    """字典编码：返回 (取值表, 整数编码)"""
+    vocab, codes = np.unique(values, return_inverse=True)
+    return vocab, codes.astype(np.int32)
+
+def _build_postings(codes: np.ndarray, size: int) -> List[np.ndarray]:
+    """为每个编码构建有序的行号倒排列表"""
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(size + 1))
+    return [order[bounds[i]:bounds[i + 1]] for i in range(size)]
+
+class RestaurantStore:
+    """按评分排序、带二级索引的列式餐厅存储"""
+
+    def __init__(
+            self,
+            names: Iterable[str],
+            cuisines: Iterable[str],
+            locations: Iterable[str],
+            price_ranges: Iterable[str],
+            ratings: Iterable[float]
+    ):
+        """从列数据构建存储和索引
+        Args:
+            names: 餐厅名称列
+            cuisines: 菜系列
+            locations: 位置列
+            price_ranges: 价格区间列（$ / $$ / $$$）
+            ratings: 评分列
+        """
+        ratings = np.asarray(ratings, dtype=np.float32)
+        # 按评分降序排列，评分相同时保持原顺序
+        order = np.argsort(-ratings, kind="stable")
+
+        self.ratings = ratings[order]
+        self.names = np.asarray(names, dtype=str)[order]
+        self.cuisine_vocab, self.cuisine_codes = _encode(np.asarray(cuisines, dtype=str)[order])
+        self.location_vocab, self.location_codes = _encode(np.asarray(locations, dtype=str)[order])
+
+        price_lookup = {price: code for code, price in enumerate(PRICE_RANGES)}
+        self.price_codes = np.fromiter(
+            (price_lookup[p] for p in np.asarray(price_ranges, dtype=str)[order]),
+            dtype=np.int8,
+            count=len(order)
+        )
+
+        self._location_index = self._vocab_index(self.location_vocab, self.location_codes)
+        self._cuisine_index = self._vocab_index(self.cuisine_vocab, self.cuisine_codes)
+        self._price_index = dict(zip(PRICE_RANGES, _build_postings(self.price_codes, len(PRICE_RANGES))))
+
+    @staticmethod
+    def _vocab_index(vocab: np.ndarray, codes: np.ndarray) -> Dict[str, np.ndarray]:
+        return dict(zip(vocab.tolist(), _build_postings(codes, len(vocab))))
+
+    @classmethod
+    def from_records(cls, records: List[Dict]) -> "RestaurantStore":
+        """从字典列表构建存储"""
+        return cls(
+            names=[r["name"] for r in records],
+            cuisines=[r["cuisine"] for r in records],
+            locations=[r["location"] for r in records],
+            price_ranges=[r["price_range"] for r in records],
+            ratings=[r["rating"] for r in records]
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "RestaurantStore":
+        """从 .npz 列式文件加载"""
+        with np.load(path) as data:
+            return cls(
+                names=data["name"],
+                cuisines=data["cuisine"],
+                locations=data["location"],
+                price_ranges=data["price_range"],
+                ratings=data["rating"]
+            )
+
+    def save(self, path: str) -> None:
+        """保存为 .npz 列式文件"""
+        np.savez(
+            path,
+            name=self.names,
+            cuisine=self.cuisine_vocab[self.cuisine_codes],
+            location=self.location_vocab[self.location_codes],
+            price_range=np.asarray(PRICE_RANGES)[self.price_codes],
+            rating=self.ratings
+        )
+
+    def __len__(self) -> int:
+        return len(self.ratings)
+
+    def search(
+            self,
+            location: str,
+            cuisine_type: Optional[str] = None,
+            price_range: Optional[str] = None,
+            min_rating: float = 4.0,
+            limit: Optional[int] = 10
+    ) -> List[Dict]:
+        """按条件查询评分最高的餐厅
+        Args:
+            location: 位置
+            cuisine_type: 菜系类型（可选）
+            price_range: 价格范围（可选）
+            min_rating: 最低评分
+            limit: 最多返回的数量，None 表示返回全部
+        Returns:
+            restaurants: 按评分降序排列的餐厅列表
+        """
+        # (倒排列表, 编码列, 取值表, 取值) 形式的过滤条件；取值表均已排序
+        conditions = [(self._location_index.get(location), self.location_codes, self.location_vocab, location)]
+        if cuisine_type:
+            conditions.append((self._cuisine_index.get(cuisine_type), self.cuisine_codes, self.cuisine_vocab, cuisine_type))
+        if price_range:
+            conditions.append((self._price_index.get(price_range), self.price_codes, PRICE_RANGES, price_range))
+        if any(posting is None for posting, _, _, _ in conditions):
+            return []
+
+        # 行号按评分降序排列，评分达标的行正好是前 cutoff 行
+        cutoff = int(np.searchsorted(-self.ratings, -np.float32(min_rating), side="right"))
+
+        # 从最短的倒排列表开始，其余条件直接在列上做向量化比较，代价与最短列表成正比
+        conditions.sort(key=lambda c: len(c[0]))
+        posting = conditions[0][0]
+        rows = posting[:np.searchsorted(posting, cutoff)]
+        for _, column, vocab, value in conditions[1:]:
+            if not len(rows):
+                break
+            rows = rows[column[rows] == np.searchsorted(vocab, value)]
+        if limit is not None:
+            rows = rows[:limit]
+        return [self._record(int(row)) for row in rows]
+
+    def _record(self, row: int) -> Dict:
+        return {
+            "name": str(self.names[row]),
+            "cuisine": str(self.cuisine_vocab[self.cuisine_codes[row]]),
+            "location": str(self.location_vocab[self.location_codes[row]]),
+            "price_range": PRICE_RANGES[self.price_codes[row]],
+            "rating": round(float(self.ratings[row]), 2)
+        }
+
+_store: Optional[RestaurantStore] = None
+
+def get_restaurant_store() -> RestaurantStore:
+    """获取全局餐厅存储
+    首次调用时加载环境变量 RESTAURANT_DATA_FILE 指定的 .npz 文件，未配置时使用示例数据。
+    """
+    global _store
+    if _store is None:
+        data_file = os.getenv("RESTAURANT_DATA_FILE")
+        if data_file and os.path.exists(data_file):
+            _store = RestaurantStore.load(data_file)
+        else:
+            _store = RestaurantStore.from_records(SAMPLE_RESTAURANTS)
+    return _store
@@ -0,0 +1,51 @@
+from exam_funcall.function_caller import GPTFunctionCaller
+from exam_funcall import func_advanced
+from exam_funcall.function_caller.infra import (
+    print_test_header,
+    print_user_input,
+    print_execution_time
+)
+import json
+import time
+
+def test_multisteps_call_many():
+    """测试批量并发调用：多个独立的天气查询"""
+    print_test_header("测试批量并发调用 call_many")
+    
+    # 初始化函数调用器
+    caller = GPTFunctionCaller(
+        functions=[func_advanced.ADVANCED_FUNCTION_DESCRIPTIONS[0]],  # 只使用天气查询函数
+        function_map={"get_weather": func_advanced.get_weather}
+    )
+    
+    # 测试输入：每条消息都是一次独立的LLM调用
+    cities = ["北京", "上海", "广州", "深圳", "杭州", "成都"]
+    user_inputs = [f"查询{city}的天气" for city in cities]
+    for user_input in user_inputs:
+        print_user_input(user_input)
+    
+    # 执行批量调用
+    start_time = time.time()
+    results = list(caller.call_many(
+        user_inputs,
+        system_message="请使用get_weather函数查询用户指定城市的天气。",
+        concurrency=4
+    ))
+    print_execution_time(time.time() - start_time)
+    
+    # 验证每条消息都有结果，且结果与输入一一对应
+    assert len(results) == len(user_inputs), "结果数量不正确"
+    assert sorted(r.index for r in results) == list(range(len(user_inputs))), "结果索引不正确"
+    
+    for result in results:
+        assert result.ok, f"调用失败: {result.user_message}: {result.error}"
+        tool_calls = result.response.choices[0].message.tool_calls
+        assert tool_calls is not None, f"没有函数调用: {result.user_message}"
+        assert tool_calls[0].function.name == "get_weather", "应该调用get_weather"
+        
+        # 验证查询参数与原始输入对应
+        weather_call = json.loads(tool_calls[0].function.arguments)
+        assert weather_call["city"] == cities[result.index], "城市不正确"
+
+if __name__ == "__main__":
+    test_multisteps_call_many()
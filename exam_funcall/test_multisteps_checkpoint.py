@@ -0,0 +1,112 @@
+import os
+import tempfile
+from types import SimpleNamespace
+
+# 假 client 不会访问网络，但 GPTBase 初始化时需要 Azure 配置
+os.environ.setdefault("AZURE_OPENAI_API_KEY", "test")
+os.environ.setdefault("AZURE_OPENAI_ENDPOINT", "https://test.invalid")
+
+from openai.types.chat import ChatCompletion
+
+from exam_funcall.function_caller import GPTFunctionCaller
+from exam_funcall.function_caller.func_checkpoint import CheckpointStore
+from exam_funcall.function_caller.infra import print_test_header, print_user_input, fast_json
+from exam_funcall import func_advanced
+
+FINAL_CONTENT = "北京和上海的天气已查询完毕。"
+
+class ScriptedCompletions:
+    """不访问网络的 chat.completions：第一次返回两个 get_weather 调用，对话中已有工具结果后返回最终文本"""
+
+    def __init__(self):
+        self.requests = 0
+
+    def create(self, messages, **kwargs) -> ChatCompletion:
+        self.requests += 1
+        has_tool_result = any(isinstance(m, dict) and m.get("role") == "tool" for m in messages)
+        calls = [
+            {
+                "id": f"call_{i}",
+                "type": "function",
+                "function": {"name": "get_weather", "arguments": fast_json.dumps({"city": city})}
+            }
+            for i, city in enumerate(["北京", "上海"])
+        ]
+        return ChatCompletion.model_validate({
+            "id": f"chatcmpl-{self.requests}",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4o",
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop" if has_tool_result else "tool_calls",
+                "message": {
+                    "role": "assistant",
+                    "content": FINAL_CONTENT if has_tool_result else None,
+                    "tool_calls": None if has_tool_result else calls
+                }
+            }]
+        })
+
+def test_multisteps_checkpoint():
+    """测试会话检查点：函数执行中途崩溃后恢复，已执行的函数不重复执行；已完成的会话恢复时不再请求模型"""
+    print_test_header("测试会话检查点和恢复（不请求模型）")
+
+    executed = []
+    crash = {"上海": True}
+
+    def get_weather(city: str, country: str = "CN"):
+        executed.append(city)
+        if crash.pop(city, False):
+            raise RuntimeError(f"进程在查询{city}时崩溃")
+        return func_advanced.get_weather(city, country)
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = CheckpointStore(directory)
+        caller = GPTFunctionCaller(
+            functions=[func_advanced.ADVANCED_FUNCTION_DESCRIPTIONS[0]],
+            function_map={"get_weather": get_weather},
+            checkpoint_store=store
+        )
+        completions = ScriptedCompletions()
+        caller.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+        # 场景1：第一个函数执行完后，第二个函数执行时崩溃
+        user_input = "查询北京和上海的天气"
+        print_user_input(user_input)
+        try:
+            caller.call_with_conversation(user_input, conversation_id="weather")
+            assert False, "第二个函数应该抛出异常"
+        except RuntimeError:
+            pass
+        assert executed == ["北京", "上海"], f"执行记录不正确: {executed}"
+        state = store.load("weather")
+        assert not state.completed, "崩溃的会话不应标记为完成"
+        assert list(state.tool_results) == ["call_0"], "检查点应只记录已执行完的函数"
+        assert [tc.id for tc in state.pending_tool_calls] == ["call_0", "call_1"], "检查点应保留本轮的 tool_calls"
+
+        # 场景2：恢复会话，只执行未完成的函数，然后请求最终响应
+        caller = GPTFunctionCaller(
+            functions=[func_advanced.ADVANCED_FUNCTION_DESCRIPTIONS[0]],
+            function_map={"get_weather": get_weather},
+            checkpoint_store=store
+        )
+        caller.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        response = caller.resume_conversation("weather")
+        assert executed == ["北京", "上海", "上海"], f"北京不应重复执行: {executed}"
+        assert completions.requests == 2, f"恢复后应只请求一次模型: {completions.requests}"
+        assert response.choices[0].message.content == FINAL_CONTENT, "最终响应不正确"
+        state = store.load("weather")
+        assert state.completed and state.turn == 1, "会话应已完成一轮"
+        tool_messages = [m for m in state.messages if m.get("role") == "tool"]
+        assert [m["tool_call_id"] for m in tool_messages] == ["call_0", "call_1"], "每个函数结果只应出现一次"
+
+        # 场景3：恢复已完成的会话，直接返回保存的最终响应
+        again = caller.resume_conversation("weather")
+        assert completions.requests == 2, "已完成的会话不应再请求模型"
+        assert executed == ["北京", "上海", "上海"], "已完成的会话不应再执行函数"
+        assert again.choices[0].message.content == FINAL_CONTENT, "应返回保存的最终响应"
+        assert [tc.id for tc in again.choices[0].message.tool_calls] == ["call_1"], "应保留最后一次函数调用"
+
+if __name__ == "__main__":
+    test_multisteps_checkpoint()
@@ -0,0 +1,55 @@
+from exam_funcall.function_caller import GPTFunctionCaller
+from exam_funcall.function_caller.func_usage import prompt_cache_tracker
+from exam_funcall import func_advanced
+from exam_funcall.function_caller.infra import (
+    print_test_header,
+    print_user_input,
+    print_system_message,
+    fast_json
+)
+
+# 提示缓存只对 1024 token 以上的前缀生效，这里用较长的系统消息
+SYSTEM_MESSAGE = "你是出行助手，请使用提供的函数回答用户的问题。\n" + "\n".join(
+    f"规则{i}: 回答前先确认城市名称和国家代码，天气查询默认国家为CN，货币转换保留两位小数，餐厅搜索默认最低评分4.0。"
+    for i in range(60)
+)
+
+def test_multisteps_prompt_cache():
+    """测试请求前缀规范化：工具顺序不同的调用器产生相同的前缀，并统计缓存命中的 token 比例"""
+    print_test_header("测试提示缓存友好的请求布局")
+    prompt_cache_tracker.reset()
+    
+    functions = func_advanced.ADVANCED_FUNCTION_DESCRIPTIONS
+    function_map = {
+        "get_weather": func_advanced.get_weather,
+        "currency_convert": func_advanced.currency_convert,
+        "schedule_reminder": func_advanced.schedule_reminder,
+        "search_restaurants": func_advanced.search_restaurants
+    }
+    caller_a = GPTFunctionCaller(functions=functions, function_map=function_map, scenario="prompt_cache")
+    caller_b = GPTFunctionCaller(functions=list(reversed(functions)), function_map=function_map, scenario="prompt_cache")
+    
+    # 不同的函数顺序应生成字节相同的 tools
+    assert fast_json.dumps(caller_a.tools) == fast_json.dumps(caller_b.tools), "tools 前缀不一致"
+    
+    cities = ["北京", "上海", "广州", "深圳"]
+    for index, city in enumerate(cities):
+        user_input = f"查询{city}的天气"
+        print_user_input(user_input)
+        caller = caller_a if index % 2 == 0 else caller_b
+        response = caller.call_single_function(user_input, system_message=SYSTEM_MESSAGE)
+        tool_calls = response.choices[0].message.tool_calls
+        assert tool_calls is not None, "没有函数调用"
+        assert tool_calls[0].function.name == "get_weather", "应该调用get_weather"
+    
+    # 两个调用器的请求前缀（系统消息 + tools）完全一致
+    prefix_a = fast_json.dumps([caller_a.last_request["messages"][0], caller_a.last_request["tools"]])
+    prefix_b = fast_json.dumps([caller_b.last_request["messages"][0], caller_b.last_request["tools"]])
+    assert prefix_a == prefix_b, "请求前缀不一致"
+    
+    report = prompt_cache_tracker.report()
+    print_system_message(fast_json.dumps(report, indent=True))
+    assert report["prompt_cache"]["requests"] == len(cities), "usage 统计次数不正确"
+
+if __name__ == "__main__":
+    test_multisteps_prompt_cache()
@@ -0,0 +1,99 @@
+from exam_funcall.function_caller import GPTFunctionCaller
+from exam_funcall.function_caller.func_cache import SemanticCache
+from exam_funcall import func_advanced
+from exam_funcall.func_simple import get_current_time, FUNCTION_DESCRIPTIONS
+from exam_funcall.function_caller.infra import (
+    print_test_header,
+    print_user_input,
+    print_api_response,
+    print_execution_time
+)
+import time
+
+def test_multisteps_semantic_cache():
+    """测试语义缓存：改写后的相同问题不再请求模型，时间查询不复用旧结果"""
+    print_test_header("测试语义缓存")
+    
+    cache = SemanticCache(threshold=0.9, audit_rate=0.0)  # 不抽样核对，命中时一定不请求模型
+    caller = GPTFunctionCaller(
+        functions=[
+            func_advanced.ADVANCED_FUNCTION_DESCRIPTIONS[0],  # get_weather
+            FUNCTION_DESCRIPTIONS[0]  # get_current_time
+        ],
+        function_map={
+            "get_weather": func_advanced.get_weather,
+            "get_current_time": get_current_time
+        },
+        cache=cache
+    )
+    system_message = "请使用提供的函数回答用户的问题。"
+    
+    # 场景1：首次查询，请求模型并写入缓存
+    print_test_header("场景1：首次查询天气")
+    user_input = "查询北京的天气"
+    print_user_input(user_input)
+    first = caller.call_single_function(user_input, system_message=system_message)
+    print_api_response(first.model_dump())
+    print_execution_time(caller.execution_time)
+    assert first.function_results[0]['name'] == "get_weather", "应该调用get_weather"
+    
+    # 场景2：改写后的问题命中缓存，不再请求模型
+    print_test_header("场景2：改写后的问题命中缓存")
+    user_input = "北京的天气查询"
+    print_user_input(user_input)
+    second = caller.call_single_function(user_input, system_message=system_message)
+    print_execution_time(caller.execution_time)
+    assert cache.stats.hits == 1, "应该命中缓存"
+    assert caller.raw_response is None, "命中缓存时不应请求模型"
+    assert second.function_results[0]['result'] == first.function_results[0]['result'], "天气结果应该被复用"
+    
+    # 场景3：时间查询命中缓存时必须重新执行函数
+    print_test_header("场景3：时间查询不复用旧结果")
+    before = caller.call_single_function("现在几点了", system_message=system_message)
+    time.sleep(1.1)
+    third = caller.call_single_function("现在几点了？", system_message=system_message)
+    print_execution_time(caller.execution_time)
+    assert cache.stats.hits == 2, "应该命中缓存"
+    assert cache.stats.refreshed_tools >= 1, "get_current_time 应该重新执行"
+    assert third.function_results[0]['result'] != before.function_results[0]['result'], "时间不应来自缓存"
+
+def test_semantic_cache_entity_mismatch():
+    """测试语义缓存：只差一个数字或实体的提示不能复用其他提示的调用参数（不请求模型）"""
+    print_test_header("测试语义缓存：数字和实体不同的提示不命中")
+    
+    cache = SemanticCache(threshold=0.85, audit_rate=0.0)
+    context = SemanticCache.context_key(func_advanced.ADVANCED_FUNCTION_DESCRIPTIONS, None, True)
+    cases = [
+        ("convert 100 USD to CNY", ("currency_convert", {"amount": 100, "from_currency": "USD", "to_currency": "CNY"}),
+         "convert 900 USD to CNY", "Convert 100 USD to CNY."),
+        ("weather in Paris", ("get_weather", {"city": "Paris", "country": "FR"}),
+         "weather in Parma", "Weather in Paris"),
+        # 中文地名没有大写，由调用参数中抄自提示的值（city='南京'）拒绝
+        ("帮我查询一下南京今天的天气情况，请告诉我温度和湿度", ("get_weather", {"city": "南京"}),
+         "帮我查询一下北京今天的天气情况，请告诉我温度和湿度", "南京今天天气怎么样？告诉我温度和湿度"),
+        ("帮我搜索一下南京评分4.5以上的川菜餐厅", ("search_restaurants", {"location": "南京", "cuisine_type": "川菜", "min_rating": 4.5}),
+         "帮我搜索一下北京评分4.5以上的川菜餐厅", "请搜索南京评分4.5以上的川菜餐厅"),
+    ]
+    for prompt, call, other, paraphrase in cases:
+        cache.store(context, prompt, None, [call], [None])
+        # 字符 n-gram 相似度已超过阈值，必须由实体检查拒绝
+        assert cache.embed_fn(prompt) @ cache.embed_fn(other) >= cache.threshold, "测试用例的相似度应超过阈值"
+        assert cache.lookup(context, other) is None, f"{other!r} 不应命中 {prompt!r} 的缓存"
+        entry = cache.lookup(context, paraphrase)
+        assert entry is not None and entry.plan == [call], f"{paraphrase!r} 应该命中 {prompt!r} 的缓存"
+    assert cache.stats.hits == len(cases) and cache.stats.misses == len(cases), f"命中统计不正确: {cache.stats.to_dict()}"
+
+def test_semantic_cache_side_effect_tools():
+    """测试语义缓存：有副作用的工具命中缓存时必须重新执行（不请求模型）"""
+    print_test_header("测试语义缓存：schedule_reminder 不复用旧结果")
+    
+    cache = SemanticCache()
+    now = time.time()
+    assert not cache.is_fresh("schedule_reminder", now, now), "schedule_reminder 的结果不应被复用"
+    assert not cache.is_fresh("get_current_time", now, now), "get_current_time 的结果不应被复用"
+    assert cache.is_fresh("get_weather", now, now), "get_weather 的结果应在有效期内复用"
+
+if __name__ == "__main__":
+    test_multisteps_semantic_cache()
+    test_semantic_cache_entity_mismatch()
+    test_semantic_cache_side_effect_tools()
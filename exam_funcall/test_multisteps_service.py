@@ -0,0 +1,77 @@
+from exam_funcall import func_advanced
+from exam_funcall.function_caller import GPTFunctionCaller
+from exam_funcall.funcall_service import create_app
+from exam_funcall.function_caller.infra import (
+    print_test_header,
+    print_user_input,
+    fast_json
+)
+import json
+import httpx
+import asyncio
+
+def weather_caller_factory():
+    """只使用天气查询函数的调用器"""
+    return GPTFunctionCaller(
+        functions=[func_advanced.ADVANCED_FUNCTION_DESCRIPTIONS[0]],
+        function_map={"get_weather": func_advanced.get_weather}
+    )
+
+async def run_service_test():
+    app = create_app(weather_caller_factory, pool_size=2, max_queue=4)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver", timeout=120) as client:
+        # 健康检查
+        r = await client.get("/health")
+        assert r.status_code == 200, "健康检查失败"
+        
+        # 单次调用
+        user_input = "查询北京的天气"
+        print_user_input(user_input)
+        r = await client.post("/v1/call", json={
+            "message": user_input,
+            "system_message": "请使用get_weather函数查询用户指定城市的天气。"
+        })
+        assert r.status_code == 200, f"单次调用失败: {r.text}"
+        data = r.json()
+        assert data["tool_calls"], "没有函数调用"
+        assert data["tool_calls"][0]["name"] == "get_weather", "应该调用get_weather"
+        assert json.loads(data["tool_calls"][0]["arguments"])["city"] == "北京", "城市不正确"
+        assert data["function_results"][0]["result"]["location"].startswith("北京"), "函数结果不正确"
+        
+        # 批量调用：按完成顺序返回 NDJSON
+        cities = ["上海", "广州", "深圳"]
+        r = await client.post("/v1/batch", json={
+            "messages": [f"查询{city}的天气" for city in cities],
+            "system_message": "请使用get_weather函数查询用户指定城市的天气。"
+        })
+        assert r.status_code == 200, f"批量调用失败: {r.text}"
+        results = [fast_json.loads(line) for line in r.text.splitlines() if line]
+        assert sorted(item["index"] for item in results) == list(range(len(cities))), "结果索引不正确"
+        for item in results:
+            assert item["ok"], f"调用失败: {item}"
+            weather_call = json.loads(item["tool_calls"][0]["arguments"])
+            assert weather_call["city"] == cities[item["index"]], "城市不正确"
+        
+        # 参数错误返回 400
+        for payload in ({"messages": ["查询上海的天气"], "concurrency": "x"}, {"messages": ["查询上海的天气"], "concurrency": 0}):
+            r = await client.post("/v1/batch", json=payload)
+            assert r.status_code == 400, f"concurrency 错误时应返回400: {r.status_code}"
+        for payload in ({"message": user_input, "timeout": "x"}, {"message": user_input, "timeout": -1},
+                        {"message": user_input, "history": "x"}, {"message": user_input, "history": ["x"]}):
+            r = await client.post("/v1/call", json=payload)
+            assert r.status_code == 400, f"timeout 或 history 错误时应返回400: {payload} {r.status_code}"
+        
+        # 指标
+        metrics = (await client.get("/metrics")).json()
+        assert metrics["requests"]["call"] == 1, "请求计数不正确"
+        assert metrics["requests"]["batch_item"] == len(cities), "批量请求计数不正确"
+    app.state.pool.close()
+
+def test_multisteps_service():
+    """测试函数调用服务：通过 ASGITransport 调用单次和批量接口"""
+    print_test_header("测试函数调用服务 funcall_service")
+    asyncio.run(run_service_test())
+
+if __name__ == "__main__":
+    test_multisteps_service()
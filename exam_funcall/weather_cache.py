@@ -0,0 +1,274 @@
+"""按地理位置缓存的天气数据
+为 func_advanced.get_weather 和 exam_pai_complex/weather_agent 的工具提供共享缓存：
+- 键为规范化的位置：城市+国家（location_key），或经纬度所在的 geohash 网格（geo_key）
+- TTL 内直接返回缓存；过期但仍在 stale_ttl 窗口内时先返回旧数据，同时在后台刷新
+- 同一个键的并发未命中只会触发一次上游请求（single-flight）
+- 按 LRU 淘汰，最多保存 capacity 个网格
+因此每个网格在每个 TTL 内最多请求一次天气API。
+"""
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def location_key(city: str, country: str = "CN") -> str:
+    """城市+国家的规范化键，忽略大小写和多余空白"""
+    return f"{' '.join(city.split()).casefold()}|{country.strip().casefold()}"
+
+def geohash(lat: float, lng: float, precision: int = 5) -> str:
+    """经纬度的 geohash 编码（precision=5 时网格约 4.9km x 4.9km）"""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits, bit_count, even = 0, 0, True
+    while len(chars) < precision:
+        value, bounds = (lng, lng_range) if even else (lat, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            bounds[0] = mid
+        else:
+            bits <<= 1
+            bounds[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return "".join(chars)
+
+def geo_key(lat: float, lng: float, precision: int = 5) -> str:
+    """经纬度所在网格的键"""
+    return f"geo:{geohash(float(lat), float(lng), precision)}"
+
+@dataclass
+class WeatherCacheStats:
+    """缓存统计"""
+    hits: int = 0
+    stale_hits: int = 0
+    misses: int = 0
+    refreshes: int = 0
+    fetch_errors: int = 0
+    evictions: int = 0
+
+    @property
+    def requests(self) -> int:
+        return self.hits + self.stale_hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        """命中率（包含返回旧数据的命中）"""
+        return (self.hits + self.stale_hits) / self.requests if self.requests else 0.0
+
+    def to_dict(self) -> Dict:
+        return {**asdict(self), "requests": self.requests, "hit_rate": round(self.hit_rate, 4)}
+
+@dataclass
+class _Entry:
+    value: Any
+    fetched_at: float
+
+class WeatherCache:
+    """带 TTL、stale-while-revalidate 和 single-flight 的有界 LRU 缓存"""
+
+    def __init__(
+            self,
+            ttl: float = 600,
+            stale_ttl: float = 1800,
+            capacity: int = 10000,
+            clock: Callable[[], float] = time.monotonic
+    ):
+        """初始化缓存
+        Args:
+            ttl: 数据保持新鲜的秒数
+            stale_ttl: 过期后仍可返回旧数据（并后台刷新）的秒数
+            capacity: 最多缓存的键数量
+            clock: 时钟函数（可选，便于测试）
+        """
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.capacity = capacity
+        self.clock = clock
+        self.stats = WeatherCacheStats()
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._refreshing: Set[str] = set()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lookup(self, key: str) -> tuple:
+        """查找缓存（调用方需持有锁）
+        Returns:
+            (状态, 值)：状态为 "fresh"、"stale" 或 "miss"
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return "miss", None
+        age = self.clock() - entry.fetched_at
+        if age < self.ttl:
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return "fresh", entry.value
+        if age < self.ttl + self.stale_ttl:
+            self._entries.move_to_end(key)
+            self.stats.stale_hits += 1
+            return "stale", entry.value
+        return "miss", None
+
+    def _store(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = _Entry(value, self.clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def get(self, key: str, fetch: Callable[[], Any]) -> Any:
+        """获取缓存数据，未命中时调用 fetch 获取
+        Args:
+            key: location_key() 或 geo_key() 得到的键
+            fetch: 无参数的获取函数
+        Returns:
+            value: 天气数据
+        Raises:
+            Exception: 未命中且 fetch 失败时抛出 fetch 的异常（旧数据刷新失败时继续使用旧数据）
+        """
+        with self._lock:
+            state, value = self._lookup(key)
+            if state == "fresh":
+                return value
+            if state == "stale":
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    if self._executor is None:
+                        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="weather-refresh")
+                    self._executor.submit(self._refresh, key, fetch)
+                return value
+
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            self.stats.misses += 1
+
+        if owner:
+            try:
+                value = fetch()
+                self._store(key, value)
+                future.set_result(value)
+            except Exception as e:
+                with self._lock:
+                    self.stats.fetch_errors += 1
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                if not future.done():
+                    # 被 KeyboardInterrupt 等中断时取消，等待者重新获取而不是一直挂起
+                    future.cancel()
+        try:
+            return future.result()
+        except CancelledError:
+            if owner or not future.cancelled():
+                raise
+            return self.get(key, fetch)
+
+    def _refresh(self, key: str, fetch: Callable[[], Any]) -> None:
+        """后台刷新（失败时保留旧数据）"""
+        try:
+            self._store(key, fetch())
+            with self._lock:
+                self.stats.refreshes += 1
+        except Exception:
+            with self._lock:
+                self.stats.fetch_errors += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    async def aget(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """get() 的异步版本，fetch 为返回协程的无参数函数"""
+        with self._lock:
+            state, value = self._lookup(key)
+            if state == "fresh":
+                return value
+            if state == "stale":
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    # 保存任务引用，避免任务在完成前被回收
+                    task = asyncio.ensure_future(self._arefresh(key, fetch))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                return value
+
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            self.stats.misses += 1
+
+        if owner:
+            try:
+                value = await fetch()
+                self._store(key, value)
+                future.set_result(value)
+            except Exception as e:
+                with self._lock:
+                    self.stats.fetch_errors += 1
+                future.set_exception(e)
+                raise
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                if not future.done():
+                    # 所有者被取消（CancelledError 不是 Exception），等待者重新获取而不是一直挂起
+                    future.cancel()
+            return value
+        # asyncio.wait 不会在等待者被取消时取消其他请求共享的 future
+        waiter = asyncio.wrap_future(future)
+        await asyncio.wait({waiter})
+        if waiter.cancelled():
+            return await self.aget(key, fetch)
+        return waiter.result()
+
+    async def _arefresh(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> None:
+        """异步后台刷新（失败时保留旧数据）"""
+        try:
+            self._store(key, await fetch())
+            with self._lock:
+                self.stats.refreshes += 1
+        except Exception:
+            with self._lock:
+                self.stats.fetch_errors += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def invalidate(self, key: str) -> None:
+        """删除一个键"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """清空缓存和统计"""
+        with self._lock:
+            self._entries.clear()
+            self.stats = WeatherCacheStats()
+
+_weather_cache: Optional[WeatherCache] = None
+
+def get_weather_cache() -> WeatherCache:
+    """获取全局天气缓存"""
+    global _weather_cache
+    if _weather_cache is None:
+        _weather_cache = WeatherCache()
+    return _weather_cache
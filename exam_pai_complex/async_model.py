@@ -5,6 +5,10 @@ import json
 from dotenv import load_dotenv
 from rich.console import Console
 from rich.table import Table
+from pydantic_ai.models import Model
+
+from exam_funcall.function_caller.infra.request_scheduler import AsyncScheduledClient, get_request_scheduler
+from exam_pai_simple.lazy_model import LazyModel
 
 load_dotenv()
 
@@ -89,7 +93,8 @@ async def log_response(response: httpx.Response):
     g_response_count += 1
 
 
-def get_gpt_model():
+
+def _build_gpt_model() -> Model:
     import openai
     from pydantic_ai.models.openai import OpenAIModel
 
@@ -104,12 +109,19 @@ def get_gpt_model():
             })
     )
 
+    # Queue requests through the shared request scheduler (priority classes, deadlines, tenant fairness)
+    client = AsyncScheduledClient(client, get_request_scheduler())
+
     # Initialize the PydanticAI model with the Azure OpenAI client
     model = OpenAIModel('gpt-4o', openai_client=client)
     return model
 
 
-def get_qwen_model():
+def get_gpt_model() -> Model:
+    return LazyModel(_build_gpt_model, 'gpt-4o')
+
+
+def _build_qwen_model() -> Model:
     import openai
     from pydantic_ai.models.openai import OpenAIModel
 
@@ -128,9 +140,14 @@ def get_qwen_model():
     model = OpenAIModel(model_name, openai_client=client)
     return model
 
+
+def get_qwen_model() -> Model:
+    return LazyModel(_build_qwen_model, 'qwen-plus-1127')
+
+
 if __name__ == "__main__":
     model1 = get_gpt_model()
-    console.print(model1)
+    console.print(model1.model)
 
     model2 = get_qwen_model()
-    console.print(model2)
\ No newline at end of file
+    console.print(model2.model)
\ No newline at end of file
@@ -29,10 +29,26 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from exam_pai_complex.async_model import get_gpt_model
+from exam_funcall.weather_cache import WeatherCache, geo_key, get_weather_cache
+
+# Geocoding results rarely change, so they are kept for a day; weather uses the shared cache,
+# keyed by geohash cell, so each cell hits the weather API at most once per TTL.
+geocode_cache = WeatherCache(ttl=24 * 3600, stale_ttl=7 * 24 * 3600)
+
+# Cached fetches may run as a background refresh after the run that started them has finished,
+# so they use a client that lives as long as the process rather than one scoped to a run.
+_http_client: AsyncClient | None = None
+
+
+def http_client() -> AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = AsyncClient()
+    return _http_client
+
 
 @dataclass
 class Deps:
-    client: AsyncClient
     weather_api_key: str | None
     geo_api_key: str | None
 
@@ -63,20 +79,24 @@ async def get_lat_lng(
         # if no API key is provided, return a dummy response (London)
         return {'lat': 51.1, 'lng': -0.1}
 
-    params = {
-        'q': location_description,
-        'api_key': ctx.deps.geo_api_key,
-    }
-    with logfire.span('calling geocode API', params=params) as span:
-        r = await ctx.deps.client.get('https://geocode.maps.co/search', params=params)
-        r.raise_for_status()
-        data = r.json()
-        span.set_attribute('response', data)
+    async def fetch() -> dict[str, float]:
+        params = {
+            'q': location_description,
+            'api_key': ctx.deps.geo_api_key,
+        }
+        with logfire.span('calling geocode API', params=params) as span:
+            r = await http_client().get('https://geocode.maps.co/search', params=params)
+            r.raise_for_status()
+            data = r.json()
+            span.set_attribute('response', data)
+
+        if data:
+            return {'lat': data[0]['lat'], 'lng': data[0]['lon']}
+        else:
+            raise ModelRetry('Could not find the location')
 
-    if data:
-        return {'lat': data[0]['lat'], 'lng': data[0]['lon']}
-    else:
-        raise ModelRetry('Could not find the location')
+    key = ' '.join(location_description.split()).casefold()
+    return await geocode_cache.aget(key, fetch)
 
 
 @weather_agent.tool
@@ -92,66 +112,70 @@ async def get_weather(ctx: RunContext[Deps], lat: float, lng: float) -> dict[str
         # if no API key is provided, return a dummy response
         return {'temperature': '21 °C', 'description': 'Sunny'}
 
-    params = {
-        'apikey': ctx.deps.weather_api_key,
-        'location': f'{lat},{lng}',
-        'units': 'metric',
-    }
-    with logfire.span('calling weather API', params=params) as span:
-        r = await ctx.deps.client.get(
-            'https://api.tomorrow.io/v4/weather/realtime', params=params
-        )
-        r.raise_for_status()
-        data = r.json()
-        span.set_attribute('response', data)
-
-    values = data['data']['values']
-    # https://docs.tomorrow.io/reference/data-layers-weather-codes
-    code_lookup = {
-        1000: 'Clear, Sunny',
-        1100: 'Mostly Clear',
-        1101: 'Partly Cloudy',
-        1102: 'Mostly Cloudy',
-        1001: 'Cloudy',
-        2000: 'Fog',
-        2100: 'Light Fog',
-        4000: 'Drizzle',
-        4001: 'Rain',
-        4200: 'Light Rain',
-        4201: 'Heavy Rain',
-        5000: 'Snow',
-        5001: 'Flurries',
-        5100: 'Light Snow',
-        5101: 'Heavy Snow',
-        6000: 'Freezing Drizzle',
-        6001: 'Freezing Rain',
-        6200: 'Light Freezing Rain',
-        6201: 'Heavy Freezing Rain',
-        7000: 'Ice Pellets',
-        7101: 'Heavy Ice Pellets',
-        7102: 'Light Ice Pellets',
-        8000: 'Thunderstorm',
-    }
-    return {
-        'temperature': f'{values["temperatureApparent"]:0.0f}°C',
-        'description': code_lookup.get(values['weatherCode'], 'Unknown'),
-    }
+    async def fetch() -> dict[str, Any]:
+        params = {
+            'apikey': ctx.deps.weather_api_key,
+            'location': f'{lat},{lng}',
+            'units': 'metric',
+        }
+        with logfire.span('calling weather API', params=params) as span:
+            r = await http_client().get(
+                'https://api.tomorrow.io/v4/weather/realtime', params=params
+            )
+            r.raise_for_status()
+            data = r.json()
+            span.set_attribute('response', data)
+
+        values = data['data']['values']
+        # https://docs.tomorrow.io/reference/data-layers-weather-codes
+        code_lookup = {
+            1000: 'Clear, Sunny',
+            1100: 'Mostly Clear',
+            1101: 'Partly Cloudy',
+            1102: 'Mostly Cloudy',
+            1001: 'Cloudy',
+            2000: 'Fog',
+            2100: 'Light Fog',
+            4000: 'Drizzle',
+            4001: 'Rain',
+            4200: 'Light Rain',
+            4201: 'Heavy Rain',
+            5000: 'Snow',
+            5001: 'Flurries',
+            5100: 'Light Snow',
+            5101: 'Heavy Snow',
+            6000: 'Freezing Drizzle',
+            6001: 'Freezing Rain',
+            6200: 'Light Freezing Rain',
+            6201: 'Heavy Freezing Rain',
+            7000: 'Ice Pellets',
+            7101: 'Heavy Ice Pellets',
+            7102: 'Light Ice Pellets',
+            8000: 'Thunderstorm',
+        }
+        return {
+            'temperature': f'{values["temperatureApparent"]:0.0f}°C',
+            'description': code_lookup.get(values['weatherCode'], 'Unknown'),
+        }
+
+    return await get_weather_cache().aget(geo_key(lat, lng), fetch)
 
 
 async def main():
-    async with AsyncClient() as client:
-        # create a free API key at https://www.tomorrow.io/weather-api/
-        weather_api_key = os.getenv('WEATHER_API_KEY')
-        # create a free API key at https://geocode.maps.co/
-        geo_api_key = os.getenv('GEO_API_KEY')
-        deps = Deps(
-            client=client, weather_api_key=weather_api_key, geo_api_key=geo_api_key
-        )
+    # create a free API key at https://www.tomorrow.io/weather-api/
+    weather_api_key = os.getenv('WEATHER_API_KEY')
+    # create a free API key at https://geocode.maps.co/
+    geo_api_key = os.getenv('GEO_API_KEY')
+    deps = Deps(weather_api_key=weather_api_key, geo_api_key=geo_api_key)
+    try:
         result = await weather_agent.run(
             'What is the weather like in London and in Wiltshire?', deps=deps,
         )
         rich.print(result)
         print('Response:', result.data)
+        print('Weather cache:', get_weather_cache().stats.to_dict())
+    finally:
+        await http_client().aclose()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,191 @@
+"""Benchmark: batch question generation throughput, near-duplicate detection and resume.
+
+Runs `QuestionBatch` with local stand-in models (50 ms per call). The ask model draws from a
+pool of subjects, each asked in three phrasings ("What is the capital of France?", "Which city
+is the capital of France?", ...), so the batch sees exact and near duplicates; the reference
+model answers wrongly 10% of the time, which the evaluate model catches.
+
+- throughput in questions per minute at several concurrency levels;
+- `QuestionDeduper` on all pairs of pool phrasings: same-subject pairs caught, different-subject
+  pairs wrongly flagged, and the cost of a check against a large bank;
+- resume: a batch stopped halfway (with a torn last line) and run again.
+
+Fails if a bank holds two questions on the same subject, or if `QuestionDeduper` misses a
+same-subject pair or flags a different-subject pair.
+
+Run with:
+
+    python bench_batch.py [count]
+"""
+from __future__ import annotations as _annotations
+
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart, ToolCallPart, UserPromptPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from question_graph_base import ask_agent, evaluate_agent
+from question_graph_batch import QuestionBatch, QuestionDeduper, reference_agent
+
+LLM_LATENCY = 0.05  # seconds per simulated model call
+
+COUNTRIES = {
+    'France': 'Paris', 'Spain': 'Madrid', 'Italy': 'Rome', 'Germany': 'Berlin', 'Japan': 'Tokyo',
+    'Canada': 'Ottawa', 'Egypt': 'Cairo', 'Kenya': 'Nairobi', 'Peru': 'Lima', 'Norway': 'Oslo',
+    'Greece': 'Athens', 'Austria': 'Vienna', 'Portugal': 'Lisbon', 'Poland': 'Warsaw', 'Chile': 'Santiago',
+}
+ELEMENTS = {
+    'gold': 'Au', 'silver': 'Ag', 'iron': 'Fe', 'sodium': 'Na', 'potassium': 'K',
+    'lead': 'Pb', 'copper': 'Cu', 'tin': 'Sn', 'mercury': 'Hg', 'helium': 'He',
+}
+BOOKS = {
+    'Romeo and Juliet': 'Shakespeare', 'Pride and Prejudice': 'Jane Austen', '1984': 'George Orwell',
+    'Moby-Dick': 'Herman Melville', 'War and Peace': 'Leo Tolstoy', 'Don Quixote': 'Cervantes',
+    'The Odyssey': 'Homer', 'Hamlet': 'Shakespeare', 'Ulysses': 'James Joyce', 'Dracula': 'Bram Stoker',
+}
+
+
+def make_pool() -> list[tuple[list[str], str]]:
+    """Subjects as (phrasings, answer)."""
+    pool = []
+    for country, capital in COUNTRIES.items():
+        pool.append(([f'What is the capital of {country}?', f"What's the capital city of {country}?",
+                      f'Which city is the capital of {country}?'], capital))
+    for element, symbol in ELEMENTS.items():
+        pool.append(([f'What is the chemical symbol for {element}?', f"What's {element}'s chemical symbol?",
+                      f'What is the chemical symbol of {element}?'], symbol))
+    for book, author in BOOKS.items():
+        pool.append(([f'Who wrote {book}?', f'Who is the author of {book}?', f'Who wrote the book {book}?'], author))
+    return pool
+
+
+class StandIn:
+    def __init__(self, pool: list[tuple[list[str], str]], seed: int = 0):
+        self.pool = pool
+        self.answers = {phrasing: answer for phrasings, answer in pool for phrasing in phrasings}
+        self.subjects = {phrasing: i for i, (phrasings, _) in enumerate(pool) for phrasing in phrasings}
+        self.random = random.Random(seed)
+        self.calls = 0
+
+    @staticmethod
+    def prompt(messages: list[ModelMessage], tag: str) -> str:
+        text = next(part.content for part in messages[-1].parts if isinstance(part, UserPromptPart))
+        return text.split(f'<{tag}>')[1].split(f'</{tag}>')[0]
+
+    async def ask(self, messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        self.calls += 1
+        await asyncio.sleep(LLM_LATENCY)
+        phrasings, _ = self.random.choice(self.pool)
+        return ModelResponse(parts=[TextPart(self.random.choice(phrasings))])
+
+    async def reference(self, messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        self.calls += 1
+        await asyncio.sleep(LLM_LATENCY)
+        answer = self.answers[self.prompt(messages, 'question')]
+        return ModelResponse(parts=[TextPart(answer if self.random.random() >= 0.1 else 'I am not sure')])
+
+    async def evaluate(self, messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        self.calls += 1
+        await asyncio.sleep(LLM_LATENCY)
+        correct = self.prompt(messages, 'answer') == self.answers[self.prompt(messages, 'question')]
+        return ModelResponse(parts=[ToolCallPart(
+            info.result_tools[0].name, {'correct': correct, 'comment': 'Correct.' if correct else 'Wrong answer.'}
+        )])
+
+
+@contextlib.contextmanager
+def stand_in_models(stand_in: StandIn):
+    with (
+        ask_agent.override(model=FunctionModel(stand_in.ask)),
+        reference_agent.override(model=FunctionModel(stand_in.reference)),
+        evaluate_agent.override(model=FunctionModel(stand_in.evaluate)),
+    ):
+        yield
+
+
+def accepted_questions(path: Path) -> list[str]:
+    return [json.loads(line)['question'] for line in path.read_text().splitlines()]
+
+
+async def run_throughput(count: int, tmp: str) -> list[str]:
+    lines = [f'{"concurrency":>11} {"q/min":>8} {"seconds":>8} {"asked":>6} {"dups":>5} {"rejected":>8} '
+             f'{"model calls":>11} {"subjects":>8}']
+    for concurrency in (1, 4, 16, 32):
+        stand_in = StandIn(make_pool())
+        batch = QuestionBatch(Path(tmp) / f'bank_{concurrency}.jsonl', concurrency=concurrency)
+        with stand_in_models(stand_in):
+            stats = await batch.run(count)
+        subjects = len({stand_in.subjects[q] for q in accepted_questions(batch.path)})
+        assert subjects == stats.accepted, f'{stats.accepted} questions cover only {subjects} subjects'
+        lines.append(f'{concurrency:>11} {stats.questions_per_minute:>8.0f} {stats.seconds:>8.2f} {stats.asked:>6} '
+                     f'{stats.duplicates:>5} {stats.rejected:>8} {stand_in.calls:>11} {subjects:>4}/{stats.accepted}')
+    return lines
+
+
+def run_dedup_quality() -> list[str]:
+    pool = make_pool()
+    phrasings = [(phrasing, i) for i, (variants, _) in enumerate(pool) for phrasing in variants]
+    same = different = same_caught = different_flagged = 0
+    for (a, i), (b, j) in itertools.combinations(phrasings, 2):
+        deduper = QuestionDeduper()
+        deduper.add(a)
+        flagged = deduper.find(b) is not None
+        if i == j:
+            same += 1
+            same_caught += flagged
+        else:
+            different += 1
+            different_flagged += flagged
+    lines = [f'same-subject pairs caught: {same_caught}/{same}, '
+             f'different-subject pairs flagged: {different_flagged}/{different}']
+    assert same_caught == same and different_flagged == 0, lines[0]
+
+    rng = random.Random(0)
+    words = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 9))) for _ in range(5000)]
+    questions = [f"What is the {' '.join(rng.sample(words, 4))}?" for _ in range(10_000)]
+    deduper = QuestionDeduper()
+    start = time.perf_counter()
+    for question in questions:
+        deduper.add(question)
+    add_us = (time.perf_counter() - start) / len(questions) * 1e6
+    lines.append(f'add into a bank growing to {len(questions)} questions: {add_us:.0f} us per question')
+    return lines
+
+
+async def run_resume(count: int, tmp: str) -> str:
+    path = Path(tmp) / 'bank_resume.jsonl'
+    stand_in = StandIn(make_pool(), seed=1)
+    with stand_in_models(stand_in):
+        first = QuestionBatch(path, concurrency=8)
+        await first.run(count // 2)
+        with open(path, 'ab') as f:
+            f.write(b'{"question": "Interrupted wri')  # a torn last line
+        second = QuestionBatch(path, concurrency=8)
+        resumed = second.stats.resumed
+        await second.run(count)
+    lines = path.read_text().splitlines()
+    distinct = len({stand_in.subjects[q] for q in accepted_questions(path)})
+    assert distinct == len(lines), f'{len(lines)} questions cover only {distinct} subjects'
+    return (f'resume: first run wrote {first.total}, second resumed {resumed} and added {second.stats.accepted}; '
+            f'file has {len(lines)} lines covering {distinct} subjects')
+
+
+async def run_benchmark(count: int) -> None:
+    print(f'{len(make_pool())} subjects x 3 phrasings, simulated model latency {LLM_LATENCY * 1000:.0f} ms, '
+          f'target {count} questions')
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        report = [*await run_throughput(count, tmp), *run_dedup_quality(), await run_resume(count, tmp)]
+    print('\n'.join(report))
+
+
+if __name__ == '__main__':
+    asyncio.run(run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 25))
@@ -0,0 +1,123 @@
+"""Benchmark: CLI step latency, cold process against the warm daemon.
+
+Both sides use the local stand-in model from `bench_sessions.py` (50 ms per call). Each
+session is `--new`, a wrong answer, then a right one; the wrong-answer step is timed. It costs
+two model calls (`Evaluate`, then `Ask` for the next question), so 100 ms of it is model
+latency and the rest is overhead.
+
+- cold: one `python ... <answer>` process per step, importing everything and reopening the log;
+- daemon, thin client: one `python question_graph_cli.py <answer>` process per step, talking to
+  a warm daemon (includes the interpreter start-up of the client);
+- daemon, in-process: the request sent over the socket directly, the daemon's own step latency.
+
+Run with:
+
+    python bench_daemon.py [steps]
+"""
+from __future__ import annotations as _annotations
+
+import asyncio
+import contextlib
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+
+
+@contextlib.contextmanager
+def stand_in_models():
+    from pydantic_ai.models.function import FunctionModel
+
+    from bench_sessions import ask_model, evaluate_model
+    from question_graph_base import ask_agent, evaluate_agent
+
+    with ask_agent.override(model=FunctionModel(ask_model)), evaluate_agent.override(model=FunctionModel(evaluate_model)):
+        yield
+
+
+def serve() -> None:
+    from question_graph_daemon import QuestionGraphDaemon
+
+    with stand_in_models():
+        asyncio.run(QuestionGraphDaemon().serve())
+
+
+def run_cold(answer: str | None) -> None:
+    from question_graph_cli import run_cli
+
+    with stand_in_models():
+        asyncio.run(run_cli(answer))
+
+
+def timed_run(args: list[str], env: dict[str, str], cwd: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, *args], env=env, cwd=cwd, check=True, stdout=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000
+
+
+def timed_sessions(step, steps: int) -> list[float]:
+    """Run `steps` short sessions through `step(answer)`, timing the wrong-answer steps."""
+    samples = []
+    for _ in range(steps):
+        step('--new')
+        samples.append(step('wrong'))
+        step('right')
+    return samples
+
+
+def report(label: str, samples: list[float]) -> None:
+    print(f'{label:<28} median {statistics.median(samples):>7.1f} ms   min {min(samples):>7.1f} ms')
+
+
+def run_benchmark(steps: int) -> None:
+    from question_graph_cli import send_to_daemon
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(HERE), os.getenv('PYTHONPATH')])))
+    for name in ('AZURE_OPENAI_BASE_URL', 'AZURE_OPENAI_VERSION', 'AZURE_OPENAI_API_KEY'):
+        # the models are replaced by the stand-in, but the daemon still builds the Azure client at warm-up
+        env.setdefault(name, 'unused')
+    bench = str(HERE / 'bench_daemon.py')
+    cli = str(HERE / 'question_graph_cli.py')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report('cold process', timed_sessions(lambda answer: timed_run([bench, '--cold', answer], env, tmp), steps))
+
+        socket_path = Path(tmp) / 'question_graph.sock'
+        log_path = Path(tmp) / 'daemon.log'
+        with open(log_path, 'w') as log:
+            daemon = subprocess.Popen([sys.executable, bench, '--serve'], env=env, cwd=tmp, stdout=log)
+        try:
+            while send_to_daemon({'op': 'ping'}, socket_path) is None:
+                assert daemon.poll() is None, log_path.read_text()
+                time.sleep(0.05)
+            print(f'daemon: {log_path.read_text().strip()}')
+            report('daemon, thin client process',
+                   timed_sessions(lambda answer: timed_run([cli, answer], env, tmp), steps))
+
+            def request(answer: str) -> float:
+                start = time.perf_counter()
+                reply = send_to_daemon({'op': 'step', 'answer': None if answer == '--new' else answer}, socket_path)
+                assert reply is not None and reply['error'] is None, reply
+                return (time.perf_counter() - start) * 1000
+
+            report('daemon, in-process request', timed_sessions(request, steps))
+            start = time.perf_counter()
+            subprocess.run([sys.executable, '-c', 'pass'], check=True)
+            print(f'(python interpreter start-up alone: {(time.perf_counter() - start) * 1000:.1f} ms)')
+        finally:
+            send_to_daemon({'op': 'shutdown'}, socket_path)
+            daemon.wait(timeout=10)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--serve']:
+        serve()
+    elif sys.argv[1:2] == ['--cold']:
+        run_cold(None if sys.argv[2] == '--new' else sys.argv[2])
+    else:
+        run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -0,0 +1,126 @@
+"""Benchmark: evaluation cache on a shared question pool.
+
+Sessions run through `SessionManager` with local stand-in models (50 ms per call). The ask
+model draws questions from a small pool, and the simulated users answer with the usual
+spelling variants ("Paris", "paris", " Paris.", "PARIS!"), wrong at first about half the time.
+Reports `Evaluate` model calls, cache hit ratio and throughput with and without the cache,
+and the cost of a lookup.
+
+Run with:
+
+    python bench_eval_cache.py [sessions]
+"""
+from __future__ import annotations as _annotations
+
+import asyncio
+import contextlib
+import io
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart, ToolCallPart, UserPromptPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from question_graph_base import ask_agent, evaluate_agent
+from question_graph_eval_cache import EvaluationCache, normalize_answer
+from question_graph_sessions import SessionManager
+
+LLM_LATENCY = 0.05  # seconds per simulated model call
+POOL = {
+    'What is the capital of France?': 'Paris',
+    'What is the largest planet in the solar system?': 'Jupiter',
+    'What is the chemical symbol for gold?': 'Au',
+    'How many continents are there?': 'Seven',
+    'Who wrote Romeo and Juliet?': 'Shakespeare',
+    'What is the boiling point of water in Celsius?': '100',
+    'What is the smallest prime number?': 'Two',
+    'Which ocean is the largest?': 'Pacific',
+}
+WRONG = ['London', 'Mars', 'Ag', 'Five', 'Dickens', '90', 'One', 'Atlantic']
+
+
+def variants(answer: str) -> list[str]:
+    return [answer, answer.lower(), f' {answer}.', f'{answer.upper()}!', f'{answer}  ']
+
+
+class StandIn:
+    """Stand-in models drawing questions from POOL and counting evaluate calls."""
+
+    def __init__(self, seed: int = 0):
+        self.random = random.Random(seed)
+        self.evaluate_calls = 0
+
+    async def ask(self, messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        await asyncio.sleep(LLM_LATENCY)
+        return ModelResponse(parts=[TextPart(self.random.choice(list(POOL)))])
+
+    async def evaluate(self, messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        self.evaluate_calls += 1
+        await asyncio.sleep(LLM_LATENCY)
+        prompt = next(part.content for part in messages[-1].parts if isinstance(part, UserPromptPart))
+        question = prompt.split('<question>')[1].split('</question>')[0]
+        answer = prompt.split('<answer>')[1].split('</answer>')[0]
+        correct = normalize_answer(answer) == normalize_answer(POOL[question])
+        return ModelResponse(parts=[ToolCallPart(
+            info.result_tools[0].name,
+            {'correct': correct, 'comment': 'Well done.' if correct else 'Not quite.'},
+        )])
+
+
+async def user(manager: SessionManager, rng: random.Random) -> None:
+    reply = await manager.start()
+    while not reply.finished:
+        if rng.random() < 0.5:
+            answer = rng.choice(WRONG)
+        else:
+            answer = rng.choice(variants(POOL[reply.question]))
+        reply = await manager.answer(reply.session_id, answer)
+
+
+async def run_scenario(sessions: int, cache: EvaluationCache | None, spill_dir: str) -> dict:
+    stand_in = StandIn()
+    rng = random.Random(1)
+    manager = SessionManager(max_llm_concurrency=64, spill_dir=spill_dir, eval_cache=cache)
+    with (
+        ask_agent.override(model=FunctionModel(stand_in.ask)),
+        evaluate_agent.override(model=FunctionModel(stand_in.evaluate)),
+    ):
+        start = time.perf_counter()
+        await asyncio.gather(*(user(manager, rng) for _ in range(sessions)))
+        elapsed = time.perf_counter() - start
+    result = {
+        'answers': manager.stats.answers,
+        'evaluate_model_calls': stand_in.evaluate_calls,
+        'sessions_per_sec': round(sessions / elapsed, 1),
+    }
+    if cache is not None:
+        result.update(cache.stats.to_dict())
+    return result
+
+
+async def run_benchmark(sessions: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        without = await run_scenario(sessions, None, tmp)
+        cache = EvaluationCache(Path(tmp) / 'eval_cache.jsonl')
+        with_cache = await run_scenario(sessions, cache, tmp)
+        reopened = EvaluationCache(cache.path)
+        warm = await run_scenario(sessions, reopened, tmp)
+
+        lookups = [(question, answer) for question in POOL for answer in variants(POOL[question]) + WRONG]
+        start = time.perf_counter()
+        for _ in range(100):
+            for question, answer in lookups:
+                reopened.get(question, answer)
+        lookup_us = (time.perf_counter() - start) / (100 * len(lookups)) * 1e6
+    print(f'{len(POOL)} pooled questions, simulated model latency {LLM_LATENCY * 1000:.0f} ms')
+    print(f'{sessions} sessions, no cache:          {without}')
+    print(f'{sessions} sessions, empty cache:       {with_cache}')
+    print(f'{sessions} sessions, cache from file:   {warm}')
+    print(f'cache lookup (normalize + dict): {lookup_us:.1f} us')
+
+
+if __name__ == '__main__':
+    asyncio.run(run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 300))
@@ -0,0 +1,177 @@
+"""Benchmark: history storage cost of the question graph CLI.
+
+Simulates long sessions without calling a model.
+
+- `steps`: per-invocation cost. Every invocation either rewrites the whole JSON history
+  (`load_history` + `dump_history(indent=2)`, the old behaviour), or reads the last
+  snapshot from a `HistoryStore`, extends its state like the CLI does and appends the new
+  steps. The reloaded session is checked against the steps appended.
+- `snapshots`: storage size and dump/load time of a whole session, full JSON snapshots
+  (`dump_history`) against the delta-encoded log. Full snapshots grow quadratically, so
+  they are measured on a shorter session and extrapolated.
+
+Run with:
+
+    python bench_history_store.py steps --rounds 100
+    python bench_history_store.py snapshots --rounds 500
+"""
+from __future__ import annotations as _annotations
+
+import argparse
+import random
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from pydantic_ai.messages import ModelRequest, ModelResponse, TextPart, UserPromptPart
+from pydantic_graph import HistoryStep, NodeStep
+
+from question_graph_base import (
+    Answer,
+    Ask,
+    Evaluate,
+    QuestionState,
+    Reprimand,
+    question_graph,
+    snapshot_question_state,
+)
+from question_graph_history import HistoryStore
+
+
+def make_round(state: QuestionState, index: int) -> list[HistoryStep[QuestionState, None]]:
+    """The steps of one wrong-answer round (Ask, Answer, Evaluate, Reprimand), mutating `state`."""
+    now = datetime.now(timezone.utc)
+    question = f'Question {index}: what is the capital of country number {index}?'
+    state.ask_agent_messages += [
+        ModelRequest(parts=[UserPromptPart('Ask a simple question with a single correct answer.', timestamp=now)]),
+        ModelResponse(parts=[TextPart(question)], model_name='gpt-4o', timestamp=now),
+    ]
+    state.question = question
+    steps = [NodeStep(state, Ask(), snapshot_state=snapshot_question_state)]
+    answer = f'wrong answer {index}'
+    steps.append(NodeStep(state, Answer(answer), snapshot_state=snapshot_question_state))
+    state.evaluate_agent_messages += [
+        ModelRequest(parts=[UserPromptPart(f'<question>{question}</question><answer>{answer}</answer>', timestamp=now)]),
+        ModelResponse(parts=[TextPart(f'{{"correct": false, "comment": "Not quite, round {index}."}}')],
+                      model_name='gpt-4o', timestamp=now),
+    ]
+    steps.append(NodeStep(state, Evaluate(answer), snapshot_state=snapshot_question_state))
+    state.question = None
+    steps.append(NodeStep(state, Reprimand(f'Not quite, round {index}.'), snapshot_state=snapshot_question_state))
+    return steps
+
+
+def make_session(rounds: int) -> list[HistoryStep[QuestionState, None]]:
+    """A synthetic session of `rounds` wrong-answer rounds."""
+    state = QuestionState()
+    history: list[HistoryStep[QuestionState, None]] = []
+    for index in range(rounds):
+        history += make_round(state, index)
+    return history
+
+
+def check_round_trip(loaded: list[HistoryStep[QuestionState, None]],
+                     expected: list[HistoryStep[QuestionState, None]]) -> None:
+    """Fail unless the reloaded steps have the same nodes and states as the ones appended."""
+    assert len(loaded) == len(expected), f'{len(loaded)} steps reloaded, {len(expected)} appended'
+    for index, (step, original) in enumerate(zip(loaded, expected)):
+        assert step.node == original.node and step.state == original.state, f'step {index} differs after reload'
+
+
+def bench_steps(rounds: int) -> None:
+    session = make_session(rounds)
+    per_round = 4
+    samples = sorted({1, rounds // 4, rounds // 2, rounds})
+    with tempfile.TemporaryDirectory() as tmp:
+        json_file = Path(tmp) / 'history.json'
+        store = HistoryStore(Path(tmp) / 'history.jsonl', question_graph)
+        store.start_session()
+
+        json_total = store_total = 0.0
+        appended: list[HistoryStep[QuestionState, None]] = []
+        print(f'{"round":>6} {"rewrite JSON ms":>16} {"append log ms":>14} {"JSON KB":>10} {"log KB":>10}')
+        for r in range(1, rounds + 1):
+            new_steps = session[(r - 1) * per_round:r * per_round]
+
+            start = time.perf_counter()
+            history = question_graph.load_history(json_file.read_bytes()) if json_file.exists() else []
+            history += new_steps
+            json_file.write_bytes(question_graph.dump_history(history, indent=2))
+            json_ms = (time.perf_counter() - start) * 1000
+
+            # Like the CLI: resume from the last snapshot and extend its state in place
+            start = time.perf_counter()
+            last = store.load_last()
+            store_ms = (time.perf_counter() - start) * 1000
+            resumed_steps = make_round(last.state if last is not None else QuestionState(), r - 1)
+            start = time.perf_counter()
+            store.append(resumed_steps)
+            store_ms += (time.perf_counter() - start) * 1000
+            appended += resumed_steps
+
+            json_total += json_ms
+            store_total += store_ms
+            if r in samples:
+                print(f'{r:>6} {json_ms:>16.2f} {store_ms:>14.2f} '
+                      f'{json_file.stat().st_size / 1024:>10.0f} {store.path.stat().st_size / 1024:>10.0f}')
+        print(f'total: rewrite JSON {json_total / 1000:.2f} s, append log {store_total / 1000:.2f} s')
+        check_round_trip(HistoryStore(store.path, question_graph).load_session(), appended)
+
+        start = time.perf_counter()
+        store.start_session()
+        size = store.compact()
+        print(f'compaction after the session ended: {(time.perf_counter() - start) * 1000:.1f} ms, '
+              f'log {size} bytes')
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def bench_snapshots(rounds: int, baseline_rounds: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f'{"format":<28} {"rounds":>6} {"size KB":>10} {"dump ms":>10} {"load ms":>10}')
+
+        session = make_session(baseline_rounds)
+        data, dump_ms = timed(lambda: question_graph.dump_history(session, indent=2))
+        _, load_ms = timed(lambda: question_graph.load_history(data))
+        baseline = (len(data) / 1024, dump_ms, load_ms)
+        print(f'{"full JSON (dump_history)":<28} {baseline_rounds:>6} {baseline[0]:>10.0f} '
+              f'{baseline[1]:>10.1f} {baseline[2]:>10.1f}')
+        # every step stores the whole state, so size and time grow with rounds squared
+        scale = (rounds / baseline_rounds) ** 2
+        print(f'{"  extrapolated":<28} {rounds:>6} {baseline[0] * scale:>10.0f} '
+              f'{baseline[1] * scale:>10.1f} {baseline[2] * scale:>10.1f}')
+
+        for count in sorted({baseline_rounds, rounds}):
+            session = make_session(count)
+            store = HistoryStore(Path(tmp) / f'history_{count}.jsonl', question_graph)
+            store.start_session()
+            _, dump_ms = timed(lambda: store.append(session))
+            steps, load_ms = timed(lambda: HistoryStore(store.path, question_graph).load_session())
+            check_round_trip(steps, session)
+            size = store.path.stat().st_size / 1024
+            print(f'{"delta log (HistoryStore)":<28} {count:>6} {size:>10.0f} {dump_ms:>10.1f} {load_ms:>10.1f}')
+
+        reader = HistoryStore(store.path, question_graph)
+        indexes = random.Random(0).sample(range(len(session)), 20)
+        _, step_ms = timed(lambda: [reader.load_step(i) for i in indexes])
+        _, last_ms = timed(lambda: HistoryStore(store.path, question_graph).load_last())
+        last = reader.load_step(-1)
+        assert last.state == session[-1].state
+        print(f'reconstruct a random step: {step_ms / len(indexes):.1f} ms, resume (load_last): {last_ms:.1f} ms')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='History storage benchmark for the question graph')
+    parser.add_argument('mode', choices=('steps', 'snapshots'))
+    parser.add_argument('--rounds', type=int, help='session length (default 100 for steps, 500 for snapshots)')
+    parser.add_argument('--baseline-rounds', type=int, default=100, help='session length for full JSON snapshots')
+    args = parser.parse_args()
+    if args.mode == 'steps':
+        bench_steps(args.rounds or 100)
+    else:
+        bench_snapshots(args.rounds or 500, args.baseline_rounds)
@@ -0,0 +1,178 @@
+"""Benchmark: many concurrent question graph sessions on one event loop.
+
+The agents are overridden with a local stand-in model (`FunctionModel`) that sleeps for a
+fixed latency, then asks a numbered question or grades the answer. Every simulated user
+answers wrong once and then right, so a session makes four model calls.
+
+The prefetch scenario adds a think time before each answer and answers wrong twice, then
+compares the wait between submitting a wrong answer and getting the next question with and
+without question prefetch. A last scenario fails one Evaluate and one Ask call and checks
+that the session can still be answered and retried.
+
+Run with:
+
+    python bench_sessions.py [sessions]
+"""
+from __future__ import annotations as _annotations
+
+import asyncio
+import contextlib
+import io
+import sys
+import tempfile
+import time
+
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart, ToolCallPart, UserPromptPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from question_graph_base import ask_agent, evaluate_agent
+from question_graph_sessions import SessionManager
+
+LLM_LATENCY = 0.05  # seconds per simulated model call
+THINK_TIME = 0.2  # seconds a simulated user takes to answer in the prefetch scenario
+
+
+async def ask_model(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+    await asyncio.sleep(LLM_LATENCY)
+    return ModelResponse(parts=[TextPart(f'What is {len(messages)} + {len(messages)}?')])
+
+
+async def evaluate_model(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+    await asyncio.sleep(LLM_LATENCY)
+    prompt = next(part.content for part in messages[-1].parts if isinstance(part, UserPromptPart))
+    correct = 'right' in prompt
+    return ModelResponse(parts=[ToolCallPart(
+        info.result_tools[0].name,
+        {'correct': correct, 'comment': 'Well done.' if correct else 'Not quite.'},
+    )])
+
+
+async def user(manager: SessionManager, latencies: list[float]) -> None:
+    reply = await manager.start()
+    for answer in ('wrong', 'right'):
+        start = time.perf_counter()
+        reply = await manager.answer(reply.session_id, answer)
+        latencies.append(time.perf_counter() - start)
+    assert reply.finished
+
+
+async def run_scenario(sessions: int, max_llm_concurrency: int, spill_dir: str) -> dict:
+    manager = SessionManager(max_llm_concurrency=max_llm_concurrency, spill_dir=spill_dir)
+    latencies: list[float] = []
+    start = time.perf_counter()
+    await asyncio.gather(*(user(manager, latencies) for _ in range(sessions)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'sessions_per_sec': round(sessions / elapsed, 1),
+        'answer_p50_ms': round(latencies[len(latencies) // 2] * 1000, 1),
+        'answer_p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 1),
+        'llm_peak': manager.stats.llm_peak,
+        'elapsed_s': round(elapsed, 2),
+    }
+
+
+async def thinking_user(manager: SessionManager, latencies: list[float]) -> None:
+    reply = await manager.start()
+    for answer in ('wrong', 'wrong', 'right'):
+        await asyncio.sleep(THINK_TIME)
+        start = time.perf_counter()
+        reply = await manager.answer(reply.session_id, answer)
+        if not reply.finished:
+            latencies.append(time.perf_counter() - start)
+    assert reply.finished
+
+
+async def run_prefetch(sessions: int, prefetch_depth: int, spill_dir: str) -> dict:
+    manager = SessionManager(max_llm_concurrency=256, spill_dir=spill_dir, prefetch_depth=prefetch_depth)
+    latencies: list[float] = []
+    await asyncio.gather(*(thinking_user(manager, latencies) for _ in range(sessions)))
+    latencies.sort()
+    return {
+        'next_question_p50_ms': round(latencies[len(latencies) // 2] * 1000, 1),
+        'next_question_p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 1),
+        'model_calls': manager.stats.llm_calls + manager.prefetch_stats.hits + manager.prefetch_stats.wasted,
+        **manager.prefetch_stats.to_dict(),
+    }
+
+
+async def run_eviction(sessions: int, spill_dir: str) -> dict:
+    """Start sessions, spill them all to disk, then answer them (restoring each one)."""
+    manager = SessionManager(max_llm_concurrency=256, idle_timeout=0, spill_dir=spill_dir)
+    replies = await asyncio.gather(*(manager.start() for _ in range(sessions)))
+    start = time.perf_counter()
+    evicted = manager.evict_idle()
+    spill_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    await asyncio.gather(*(manager.answer(reply.session_id, 'right') for reply in replies))
+    answer_s = time.perf_counter() - start
+    return {
+        'evicted': evicted,
+        'spill_ms_per_session': round(spill_ms / evicted, 3),
+        'restored': manager.stats.restored,
+        'resident_after': manager.resident,
+        'answer_s': round(answer_s, 2),
+    }
+
+
+def fail_once(model_function):
+    """A stand-in model function that raises on its first call, like a transient 503."""
+    calls = 0
+
+    async def function(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise RuntimeError('503 Service Unavailable')
+        return await model_function(messages, info)
+
+    return function
+
+
+async def run_failure(spill_dir: str) -> dict:
+    """A failed Evaluate or Ask must leave the session resumable."""
+    manager = SessionManager(spill_dir=spill_dir)
+    reply = await manager.start()
+    session_id = reply.session_id
+    with evaluate_agent.override(model=FunctionModel(fail_once(evaluate_model))):
+        with contextlib.suppress(RuntimeError):
+            await manager.answer(session_id, 'wrong')
+        # still waiting for an answer to the same question
+        assert manager.get(session_id).question == reply.question
+        reply = await manager.answer(session_id, 'wrong')
+    with ask_agent.override(model=FunctionModel(fail_once(ask_model))):
+        with contextlib.suppress(RuntimeError):
+            await manager.answer(session_id, 'wrong')
+        reply = await manager.retry(session_id)
+    assert reply.question is not None
+    reply = await manager.answer(session_id, 'right')
+    assert reply.finished
+    return {'answers': manager.stats.answers, 'finished': manager.stats.finished}
+
+
+async def run_benchmark(sessions: int) -> None:
+    print(f'simulated model latency {LLM_LATENCY * 1000:.0f} ms, 4 model calls per session')
+    with (
+        ask_agent.override(model=FunctionModel(ask_model)),
+        evaluate_agent.override(model=FunctionModel(evaluate_model)),
+        tempfile.TemporaryDirectory() as spill_dir,
+        # Congratulate / Reprimand print their comment for every session
+        contextlib.redirect_stdout(io.StringIO()) as quiet,
+    ):
+        results = [(1, 20, await run_scenario(20, 1, spill_dir))]
+        for concurrency in (16, 64, 256):
+            results.append((concurrency, sessions, await run_scenario(sessions, concurrency, spill_dir)))
+        eviction = await run_eviction(sessions, spill_dir)
+        prefetch = [(depth, await run_prefetch(50, depth, spill_dir)) for depth in (0, 1, 2)]
+        failure = await run_failure(spill_dir)
+    del quiet
+    for concurrency, count, result in results:
+        print(f'{count:>6} sessions, LLM concurrency {concurrency:>3}: {result}')
+    print(f'spill and restore {sessions} idle sessions: {eviction}')
+    for depth, result in prefetch:
+        print(f'50 sessions, think time {THINK_TIME * 1000:.0f} ms, prefetch depth {depth}: {result}')
+    print(f'recovery from a failed Evaluate and a failed Ask: {failure}')
+
+
+if __name__ == '__main__':
+    asyncio.run(run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
@@ -0,0 +1,85 @@
+"""Benchmark: snapshot size and dump/load time, JSON against msgpack (optionally zstd compressed).
+
+Uses the synthetic wrong-answer sessions of `bench_history_store.py` (no model calls).
+
+- history: a whole session, `dump_history(indent=2)` / `load_history` (the JSON format), compact
+  JSON, and the snapshot formats of `question_graph_snapshot.py`; plus the time to the first
+  step when streaming a snapshot with `iter_history`;
+- state: the final `QuestionState` alone, JSON against `dump_state` / `load_state`.
+
+The zstd rows are skipped if the `zstandard` package is not installed.
+
+Run with:
+
+    python bench_snapshot.py [rounds]
+"""
+from __future__ import annotations as _annotations
+
+import io
+import sys
+import time
+
+import pydantic
+
+from bench_history_store import make_session
+from question_graph_base import QuestionState, question_graph
+import question_graph_snapshot as snapshot
+
+
+def best_ms(func, repeat: int = 3):
+    """The result and the best time of `repeat` calls."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append((time.perf_counter() - start) * 1000)
+    return result, min(times)
+
+
+def run_benchmark(rounds: int) -> None:
+    session = make_session(rounds)
+    compressions = [None] if snapshot.zstandard is None else [None, 'zstd']
+    print(f'session of {rounds} rounds, {len(session)} steps')
+    print(f'{"history format":<26} {"size KB":>10} {"dump ms":>10} {"load ms":>10} {"first step ms":>14}')
+
+    rows = [
+        ('JSON (indent=2)', lambda: question_graph.dump_history(session, indent=2), question_graph.load_history),
+        ('JSON (compact)', lambda: question_graph.dump_history(session), question_graph.load_history),
+    ]
+    for compression in compressions:
+        rows.append((
+            'msgpack' + (f' + {compression}' if compression else ''),
+            lambda c=compression: snapshot.dump_history(question_graph, session, compression=c),
+            lambda data: snapshot.load_history(question_graph, data),
+        ))
+    for name, dump, load in rows:
+        data, dump_ms = best_ms(dump)
+        steps, load_ms = best_ms(lambda: load(data))
+        assert len(steps) == len(session) and steps[-1].state == session[-1].state
+        first = ''
+        if snapshot.is_snapshot(data):
+            _, first_ms = best_ms(lambda: next(snapshot.iter_history(question_graph, io.BytesIO(data))))
+            first = f'{first_ms:.2f}'
+        print(f'{name:<26} {len(data) / 1024:>10.0f} {dump_ms:>10.1f} {load_ms:>10.1f} {first:>14}')
+    if snapshot.zstandard is None:
+        print('(zstandard is not installed, zstd rows skipped)')
+
+    state = session[-1].state
+    adapter = pydantic.TypeAdapter(QuestionState)
+    print(f'\n{"state format":<26} {"size KB":>10} {"dump ms":>10} {"load ms":>10}')
+    rows = [('JSON', lambda: adapter.dump_json(state), adapter.validate_json)]
+    for compression in compressions:
+        rows.append((
+            'msgpack' + (f' + {compression}' if compression else ''),
+            lambda c=compression: snapshot.dump_state(state, compression=c),
+            lambda data: snapshot.load_state(data, QuestionState),
+        ))
+    for name, dump, load in rows:
+        data, dump_ms = best_ms(dump, 10)
+        loaded, load_ms = best_ms(lambda: load(data), 10)
+        assert loaded == state
+        print(f'{name:<26} {len(data) / 1024:>10.1f} {dump_ms:>10.2f} {load_ms:>10.2f}')
+
+
+if __name__ == '__main__':
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100)
@@ -0,0 +1,75 @@
+"""Benchmark: per-node tracing of a question graph session, and the tracer's overhead.
+
+Runs a session of wrong answers with the local stand-in model from `bench_sessions.py`, with
+history appended to a `HistoryStore` after each step as the CLI does. Prints the tracer summary,
+writes `question_graph_trace.json` (Chrome trace) and `question_graph_trace.speedscope.json`,
+and compares the session time with and without tracing.
+
+Run with:
+
+    python bench_trace.py [rounds]
+"""
+from __future__ import annotations as _annotations
+
+import asyncio
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from pydantic_ai.models.function import FunctionModel
+from pydantic_graph import End
+
+from bench_sessions import ask_model, evaluate_model
+from question_graph_base import Answer, Ask, QuestionState, ask_agent, evaluate_agent, question_graph
+from question_graph_history import HistoryStore
+from question_graph_trace import GraphTracer
+
+
+async def run_session(rounds: int, store: HistoryStore, tracer: GraphTracer | None) -> float:
+    state = QuestionState()
+    node = Ask()
+    store.start_session()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        history = []
+        while True:
+            if tracer is not None:
+                node = await tracer.next(question_graph, node, history, state=state)
+            else:
+                node = await question_graph.next(node, history, state=state)
+            assert not isinstance(node, End)
+            if isinstance(node, Answer):
+                break
+        with tracer.span('history.append', 'history') if tracer else contextlib.nullcontext():
+            store.append(history)
+        node = Answer('wrong')
+    return time.perf_counter() - start
+
+
+async def run_benchmark(rounds: int) -> None:
+    models = {'ask_agent': FunctionModel(ask_model), 'evaluate_agent': FunctionModel(evaluate_model)}
+    with (
+        ask_agent.override(model=models['ask_agent']),
+        evaluate_agent.override(model=models['evaluate_agent']),
+        tempfile.TemporaryDirectory() as tmp,
+        contextlib.redirect_stdout(io.StringIO()),
+    ):
+        store = HistoryStore(Path(tmp) / 'history.jsonl', question_graph)
+        await run_session(1, store, None)  # warm-up
+        plain = await run_session(rounds, store, None)
+        tracer = GraphTracer('bench_trace')
+        with tracer.instrument(models=models, ask_agent=ask_agent, evaluate_agent=evaluate_agent):
+            traced = await run_session(rounds, store, tracer)
+    print(tracer.summary())
+    print(f'{rounds} rounds: {plain * 1000:.0f} ms untraced, {traced * 1000:.0f} ms traced '
+          f'(serialize spans are extra work done only when tracing)')
+    tracer.write_chrome_trace('question_graph_trace.json')
+    tracer.write_speedscope('question_graph_trace.speedscope.json')
+    print('wrote question_graph_trace.json and question_graph_trace.speedscope.json')
+
+
+if __name__ == '__main__':
+    asyncio.run(run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
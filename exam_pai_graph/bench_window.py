@@ -0,0 +1,112 @@
+"""Benchmark: prompt size per round over a long session, with and without history windows.
+
+Runs the question graph with stand-in models for a long run of wrong answers. The stand-in
+measures the prompt it receives (estimated tokens) and sleeps for a latency that grows with
+the prompt (20 ms + 0.02 ms per token), like a real model. The ask stand-in also counts how
+many earlier questions it can see, verbatim or in the summary.
+
+- unbounded: every exchange is sent (the window is disabled);
+- windowed: `ASK_WINDOW` / `EVALUATE_WINDOW` as configured in `question_graph_window.py`.
+
+Before the window, each round also appended `result.all_messages()` (history included), which
+doubled the stored history every round; it now appends `new_messages()`.
+
+Run with:
+
+    python bench_window.py [rounds]
+"""
+from __future__ import annotations as _annotations
+
+import asyncio
+import contextlib
+import io
+import sys
+import time
+
+from pydantic_ai.messages import ModelMessage, ModelResponse, SystemPromptPart, TextPart, ToolCallPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from pydantic_graph import End
+
+from question_graph_base import Answer, Ask, QuestionState, ask_agent, evaluate_agent, question_graph
+from question_graph_window import ASK_WINDOW, EVALUATE_WINDOW, estimate_tokens, message_text
+
+
+class StandIn:
+    def __init__(self):
+        self.round = 0
+        self.ask_tokens: list[int] = []
+        self.evaluate_tokens: list[int] = []
+        self.visible: list[int] = []
+
+    @staticmethod
+    async def respond(messages: list[ModelMessage]) -> int:
+        tokens = sum(estimate_tokens(message_text(m)) for m in messages)
+        await asyncio.sleep(0.02 + tokens * 0.00002)
+        return tokens
+
+    async def ask(self, messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        self.ask_tokens.append(await self.respond(messages))
+        responses = sum(isinstance(m, ModelResponse) for m in messages)
+        summarized = sum(
+            part.content.count('\n- ') for m in messages for part in m.parts if isinstance(part, SystemPromptPart)
+        )
+        self.visible.append(responses + summarized)
+        self.round += 1
+        return ModelResponse(parts=[TextPart(f'Question {self.round}: what is the capital of country number {self.round}?')])
+
+    async def evaluate(self, messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        self.evaluate_tokens.append(await self.respond(messages))
+        return ModelResponse(parts=[ToolCallPart(
+            info.result_tools[0].name, {'correct': False, 'comment': 'Not quite, try another one.'}
+        )])
+
+
+@contextlib.contextmanager
+def unbounded():
+    saved = [(w, w.keep_exchanges, w.max_tokens) for w in (ASK_WINDOW, EVALUATE_WINDOW)]
+    for window, _, _ in saved:
+        window.keep_exchanges = window.max_tokens = 10**9
+    try:
+        yield
+    finally:
+        for window, keep, max_tokens in saved:
+            window.keep_exchanges, window.max_tokens = keep, max_tokens
+
+
+async def run_session(rounds: int) -> tuple[StandIn, list[float]]:
+    stand_in = StandIn()
+    state = QuestionState()
+    node = Ask()
+    round_ms = []
+    with (
+        ask_agent.override(model=FunctionModel(stand_in.ask)),
+        evaluate_agent.override(model=FunctionModel(stand_in.evaluate)),
+    ):
+        start = time.perf_counter()
+        while len(round_ms) < rounds:
+            node = await question_graph.next(node, [], state=state, infer_name=False)
+            assert not isinstance(node, End)
+            if isinstance(node, Answer):
+                round_ms.append((time.perf_counter() - start) * 1000)
+                node = Answer('wrong')
+                start = time.perf_counter()
+    return stand_in, round_ms
+
+
+async def run_benchmark(rounds: int) -> None:
+    with contextlib.redirect_stdout(io.StringIO()):
+        with unbounded():
+            full, full_ms = await run_session(rounds)
+        windowed, windowed_ms = await run_session(rounds)
+    samples = sorted({1, 5, 10, rounds // 4, rounds // 2, rounds})
+    print(f'{"round":>6} | {"ask tokens":>17} | {"evaluate tokens":>17} | {"round ms":>15} | {"questions seen":>15}')
+    print(f'{"":>6} | {"full":>8} {"window":>8} | {"full":>8} {"window":>8} | {"full":>7} {"window":>7} | {"full":>7} {"window":>7}')
+    for r in samples:
+        i = r - 1
+        print(f'{r:>6} | {full.ask_tokens[i]:>8} {windowed.ask_tokens[i]:>8} | '
+              f'{full.evaluate_tokens[i - 1] if i else 0:>8} {windowed.evaluate_tokens[i - 1] if i else 0:>8} | '
+              f'{full_ms[i]:>7.1f} {windowed_ms[i]:>7.1f} | {full.visible[i]:>7} {windowed.visible[i]:>7}')
+
+
+if __name__ == '__main__':
+    asyncio.run(run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
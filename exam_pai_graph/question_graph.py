@@ -6,12 +6,15 @@ from typing import Annotated
 
 import logfire
 from devtools import debug
-from pydantic_graph import BaseNode, Edge, End, Graph, GraphRunContext, HistoryStep
+from pydantic_graph import BaseNode, Edge, End, EndStep, Graph, GraphRunContext, HistoryStep
 
 from pydantic_ai import Agent
 from pydantic_ai.format_as_xml import format_as_xml
 from pydantic_ai.messages import ModelMessage
 
+from question_graph_history import HistoryStore
+from question_graph_window import ASK_WINDOW, EVALUATE_WINDOW
+
 # 'if-token-present' means nothing will be sent (and the example will work) if you don't have logfire configured
 logfire.configure(send_to_logfire='if-token-present')
 
@@ -52,9 +55,9 @@ class Ask(BaseNode[QuestionState]):
     async def run(self, ctx: GraphRunContext[QuestionState]) -> Answer:
         result = await ask_agent.run(
             'Ask a simple question with a single correct answer.',
-            message_history=ctx.state.ask_agent_messages,
+            message_history=ASK_WINDOW.apply(ctx.state.ask_agent_messages),
         )
-        ctx.state.ask_agent_messages += result.all_messages()
+        ctx.state.ask_agent_messages += result.new_messages()
         ctx.state.question = result.data
         return Answer()
 
@@ -92,9 +95,9 @@ class Evaluate(BaseNode[QuestionState]):
         assert ctx.state.question is not None
         result = await evaluate_agent.run(
             format_as_xml({'question': ctx.state.question, 'answer': self.answer}),
-            message_history=ctx.state.evaluate_agent_messages,
+            message_history=EVALUATE_WINDOW.apply(ctx.state.evaluate_agent_messages),
         )
-        ctx.state.evaluate_agent_messages += result.all_messages()
+        ctx.state.evaluate_agent_messages += result.new_messages()
         if result.data.correct:
             return Congratulate(result.data.comment)
         else:
@@ -145,37 +148,42 @@ async def run_as_continuous():
 
 
 async def run_as_cli(answer: str | None):
-    history_file = Path('question_graph_history.json')
-    history = (
-        question_graph.load_history(history_file.read_bytes())
-        if history_file.exists()
-        else []
+    store = HistoryStore(
+        Path('question_graph_history.jsonl'),
+        question_graph,
+        legacy_path=Path('question_graph_history.json'),
     )
+    # only the last node snapshot is needed to resume
+    last = store.load_last()
 
-    if history:
-        last = history[-1]
-        assert last.kind == 'node', 'expected last step to be a node'
+    if last is not None and last.kind == 'node':
         state = last.state
         assert answer is not None, 'answer is required to continue from history'
         node = Answer(answer)
     else:
+        # no history, or the last session has finished
+        store.start_session()
         state = QuestionState()
         node = Ask()
     debug(state, node)
 
+    history: list[HistoryStep[QuestionState, None]] = []
     with logfire.span('run questions graph'):
         while True:
             node = await question_graph.next(node, history, state=state)
             if isinstance(node, End):
-                debug([e.data_snapshot() for e in history])
+                history.append(EndStep(result=node))
+                store.append(history)
+                debug([e.data_snapshot() for e in store.load_session()])
                 print('Finished!')
                 break
             elif isinstance(node, Answer):
                 print(state.question)
+                store.append(history)
                 break
             # otherwise just continue
 
-    history_file.write_bytes(question_graph.dump_history(history, indent=2))
+    store.compact_in_background()
 
 
 if __name__ == '__main__':
@@ -184,7 +192,7 @@ if __name__ == '__main__':
 
     try:
         sub_command = sys.argv[1]
-        assert sub_command in ('continuous', 'cli', 'mermaid')
+        assert sub_command in ('continuous', 'cli', 'mermaid', 'batch')
     except (IndexError, AssertionError):
         print(
             'Usage:\n'
@@ -192,7 +200,9 @@ if __name__ == '__main__':
             'or:\n'
             '  uv run -m pydantic_ai_examples.question_graph continuous\n'
             'or:\n'
-            '  uv run -m pydantic_ai_examples.question_graph cli [answer]',
+            '  uv run -m pydantic_ai_examples.question_graph cli [answer]\n'
+            'or:\n'
+            '  uv run -m pydantic_ai_examples.question_graph batch N [--out FILE] [--concurrency C]',
             file=sys.stderr,
         )
         sys.exit(1)
@@ -201,6 +211,10 @@ if __name__ == '__main__':
         print(question_graph.mermaid_code(start_node=Ask))
     elif sub_command == 'continuous':
         asyncio.run(run_as_continuous())
+    elif sub_command == 'batch':
+        from question_graph_batch import main as run_as_batch
+
+        run_as_batch(sys.argv[2:])
     else:
         a = sys.argv[2] if len(sys.argv) > 2 else None
         asyncio.run(run_as_cli(a))
\ No newline at end of file
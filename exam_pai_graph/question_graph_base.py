@@ -1,7 +1,8 @@
 from __future__ import annotations as _annotations
 
+import functools
 from dataclasses import dataclass, field
-from typing import Annotated
+from typing import TYPE_CHECKING, Annotated
 
 import logfire
 from pydantic_graph import BaseNode, Edge, End, Graph, GraphRunContext
@@ -9,31 +10,59 @@ from pydantic_ai import Agent
 from pydantic_ai.format_as_xml import format_as_xml
 from pydantic_ai.messages import ModelMessage
 
+from exam_pai_simple.lazy_model import LazyModel
+from question_graph_window import ASK_WINDOW, EVALUATE_WINDOW
+
+if TYPE_CHECKING:
+    from question_graph_eval_cache import EvaluationCache
+    from question_graph_prefetch import QuestionPrefetcher
+
 # Configure logfire
 logfire.configure(send_to_logfire='if-token-present')
 
-def get_azure_gpt_model():
+@functools.cache
+def get_azure_client():
+    """The Azure OpenAI client shared by both agents, so they use one HTTP connection pool."""
     import os 
     import openai
     import httpx
-    from pydantic_ai.models.openai import OpenAIModel
 
-    client = openai.AsyncAzureOpenAI(
+    return openai.AsyncAzureOpenAI(
         azure_endpoint=os.getenv("AZURE_OPENAI_BASE_URL"),
         api_version=os.getenv("AZURE_OPENAI_VERSION"),
         api_key=os.getenv("AZURE_OPENAI_API_KEY"),
         http_client=httpx.AsyncClient()
     )
 
-    model = OpenAIModel('gpt-4o', openai_client=client)
+def get_azure_gpt_model():
+    from pydantic_ai.models.openai import OpenAIModel
+
+    model = OpenAIModel('gpt-4o', openai_client=get_azure_client())
     return model
 
+def lazy_azure_model() -> LazyModel:
+    """Builds the Azure model on first use, so importing this module (e.g. to restore
+    a saved history) does not import `openai` or open any HTTP clients."""
+    return LazyModel(get_azure_gpt_model, 'gpt-4o')
+
 @dataclass
 class QuestionState:
     question: str | None = None
     ask_agent_messages: list[ModelMessage] = field(default_factory=list)
     evaluate_agent_messages: list[ModelMessage] = field(default_factory=list)
 
+def snapshot_question_state(state: QuestionState) -> QuestionState:
+    """Snapshot the state for the graph history.
+
+    Messages are never modified once appended, so snapshots copy the lists but share the
+    messages, instead of deep copying the whole (growing) conversation on every step.
+    """
+    return QuestionState(
+        question=state.question,
+        ask_agent_messages=list(state.ask_agent_messages),
+        evaluate_agent_messages=list(state.evaluate_agent_messages),
+    )
+
 @dataclass
 class EvaluationResult:
     correct: bool
@@ -41,25 +70,49 @@ class EvaluationResult:
 
 # Initialize agents
 ask_agent = Agent(
-    get_azure_gpt_model(),
+    lazy_azure_model(),
     defer_model_check=True,
 )
 
 evaluate_agent = Agent(
-    get_azure_gpt_model(),
+    lazy_azure_model(),
     result_type=EvaluationResult,
     system_prompt='Given a question and answer, evaluate if the answer is correct.',
 )
 
+@dataclass
+class QuestionDeps:
+    """Optional per-session services for the graph nodes, passed as `deps` to `question_graph.next`."""
+    prefetcher: QuestionPrefetcher | None = None
+    """Generates the next questions in the background while the user is answering."""
+    eval_cache: EvaluationCache | None = None
+    """Grades of previously evaluated (question, answer) pairs, reused instead of calling the model."""
+
+ASK_PROMPT = 'Ask a simple question with a single correct answer.'
+
+async def ask_question(history: list[ModelMessage]) -> tuple[str, list[ModelMessage]]:
+    """Ask the model for a new question.
+
+    Returns:
+        The question, and the messages to append to `QuestionState.ask_agent_messages`.
+    """
+    result = await ask_agent.run(
+        ASK_PROMPT,
+        message_history=ASK_WINDOW.apply(history),
+    )
+    return result.data, result.new_messages()
+
 @dataclass
 class Ask(BaseNode[QuestionState]):
-    async def run(self, ctx: GraphRunContext[QuestionState]) -> Answer:
-        result = await ask_agent.run(
-            'Ask a simple question with a single correct answer.',
-            message_history=ctx.state.ask_agent_messages,
-        )
-        ctx.state.ask_agent_messages += result.all_messages()
-        ctx.state.question = result.data
+    async def run(self, ctx: GraphRunContext[QuestionState, QuestionDeps | None]) -> Answer:
+        prefetcher = ctx.deps.prefetcher if ctx.deps is not None else None
+        prefetched = await prefetcher.take(ctx.state.ask_agent_messages) if prefetcher is not None else None
+        question, messages = prefetched or await ask_question(ctx.state.ask_agent_messages)
+        ctx.state.ask_agent_messages += messages
+        ctx.state.question = question
+        if prefetcher is not None:
+            # the user answers this question while the next ones are generated
+            prefetcher.fill(ctx.state.ask_agent_messages)
         return Answer()
 
 @dataclass
@@ -76,18 +129,24 @@ class Evaluate(BaseNode[QuestionState]):
 
     async def run(
         self,
-        ctx: GraphRunContext[QuestionState],
+        ctx: GraphRunContext[QuestionState, QuestionDeps | None],
     ) -> Congratulate | Reprimand:
         assert ctx.state.question is not None
-        result = await evaluate_agent.run(
-            format_as_xml({'question': ctx.state.question, 'answer': self.answer}),
-            message_history=ctx.state.evaluate_agent_messages,
-        )
-        ctx.state.evaluate_agent_messages += result.all_messages()
-        if result.data.correct:
-            return Congratulate(result.data.comment)
+        cache = ctx.deps.eval_cache if ctx.deps is not None else None
+        evaluation = cache.get(ctx.state.question, self.answer) if cache is not None else None
+        if evaluation is None:
+            result = await evaluate_agent.run(
+                format_as_xml({'question': ctx.state.question, 'answer': self.answer}),
+                message_history=EVALUATE_WINDOW.apply(ctx.state.evaluate_agent_messages),
+            )
+            ctx.state.evaluate_agent_messages += result.new_messages()
+            evaluation = result.data
+            if cache is not None:
+                cache.put(ctx.state.question, self.answer, evaluation)
+        if evaluation.correct:
+            return Congratulate(evaluation.comment)
         else:
-            return Reprimand(result.data.comment)
+            return Reprimand(evaluation.comment)
 
 @dataclass
 class Congratulate(BaseNode[QuestionState, None, None]):
@@ -111,5 +170,6 @@ class Reprimand(BaseNode[QuestionState]):
 # Create the graph
 question_graph = Graph(
     nodes=(Ask, Answer, Evaluate, Congratulate, Reprimand),
-    state_type=QuestionState
+    state_type=QuestionState,
+    snapshot_state=snapshot_question_state,
 ) 
\ No newline at end of file
@@ -0,0 +1,346 @@
+"""Batch question generation, to seed a question bank.
+
+`QuestionBatch` runs the `Ask` node's agent many times at once, without a graph per question:
+
+- `concurrency` workers each ask for a question, have `reference_agent` answer it and
+  `evaluate_agent` grade that reference answer; questions whose answer is graded incorrect
+  are dropped;
+- near-duplicate questions are dropped as soon as they are asked, before any further model
+  call (`QuestionDeduper`); a question that is rejected or fails is forgotten again, so its
+  subject can still be asked, as it would be on resume;
+- the most recent questions are sent to the ask agent as earlier exchanges, so the
+  `ASK_WINDOW` summary tells it which questions not to ask again;
+- accepted questions are appended to a JSONL file as they complete. Running again with the
+  same file resumes: its questions count toward the target and are not asked again.
+
+Usage:
+
+    python question_graph.py batch 100 --out question_bank.jsonl --concurrency 8
+"""
+from __future__ import annotations as _annotations
+
+import argparse
+import asyncio
+import os
+import random
+import re
+import time
+import zlib
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+import logfire
+import pydantic_core
+from pydantic_ai import Agent
+from pydantic_ai.format_as_xml import format_as_xml
+from pydantic_ai.messages import ModelMessage, ModelRequest, ModelResponse, TextPart, UserPromptPart
+
+from question_graph_base import ASK_PROMPT, ask_question, evaluate_agent, lazy_azure_model
+from question_graph_eval_cache import normalize_answer
+
+BATCH_FILE = Path('question_bank.jsonl')
+
+reference_agent = Agent(
+    lazy_azure_model(),
+    system_prompt='Answer the question with only the correct answer, as briefly as possible.',
+)
+
+# Ignored when comparing questions, so "What is the capital of France?" and
+# "Which city is the capital of France?" compare on "capital france" / "city capital france"
+# and the words that tell questions apart ("france" / "spain") carry most of the weight
+STOPWORDS = frozenset(
+    'a an the is are was were be been of in on at to for from by with and or as what whats which who '
+    'whom whose how many much when where why does do did there this that these those it its s our your '
+    'name can you called known'.split()
+)
+
+# Words that ask for the same thing, compared as the first one: "Who wrote Hamlet?" and
+# "Who is the author of Hamlet?" both compare on "author hamlet"
+SYNONYMS = {
+    word: group[0]
+    for group in (('author', 'wrote', 'written', 'writer', 'authored', 'penned'), ('largest', 'biggest'),
+                  ('smallest', 'tiniest'), ('invented', 'inventor', 'created', 'creator'))
+    for word in group
+}
+
+_MASK64 = (1 << 64) - 1
+
+
+def _canonical_word(word: str) -> str:
+    word = SYNONYMS.get(word, word)
+    # Plurals and possessives compare as the singular ("capitals" / "capital")
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        word = word[:-1]
+    return word
+
+
+def question_shingles(question: str) -> set[int]:
+    """Hashed canonical content words of a question (all words if it has none).
+
+    Words are compared whole, after `SYNONYMS` and plural folding, and in any order ("largest
+    planet in the solar system" / "planet that is the largest in the solar system"). Character
+    shingles of the words would let different subjects that share a few letters ("sodium" /
+    "helium") outscore rewordings of the same subject ("wrote" / "author").
+    """
+    # Word characters only: answer normalization keeps inner punctuation ("what's", "3.14")
+    words = re.findall(r'\w+', normalize_answer(question))
+    content = [w for w in words if w not in STOPWORDS] or words
+    return {zlib.crc32(_canonical_word(word).encode()) for word in content}
+
+
+class QuestionDeduper:
+    """Near-duplicate detection for generated questions.
+
+    Two questions are near duplicates when the Jaccard similarity of their word sets
+    (`question_shingles`) is at least `threshold`; the default of 0.6 takes one extra word in
+    three ("capital france" / "capital city france") but not one different word in two
+    ("capital city france" / "capital city spain"). Candidates are found with MinHash LSH: the
+    signature of each question is split into `bands` bands of `rows` values, and only questions
+    sharing a band are compared, so a check does not scan the whole bank.
+
+    Args:
+        threshold: Jaccard similarity at which questions are near duplicates.
+        bands: LSH bands of the MinHash signature.
+        rows: MinHash values per band; fewer rows find more candidates at low similarity.
+        seed: Seed of the MinHash functions.
+    """
+
+    def __init__(self, threshold: float = 0.6, *, bands: int = 16, rows: int = 2, seed: int = 0):
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        rng = random.Random(seed)
+        # (h ^ a) * b mod 2**64 with odd b is a permutation of the 64-bit hashes
+        self._hashers = [(rng.getrandbits(64), rng.getrandbits(64) | 1) for _ in range(bands * rows)]
+        self._buckets: defaultdict[tuple[int, ...], set[str]] = defaultdict(set)
+        # Known questions in the order they were added
+        self._shingles: dict[str, set[int]] = {}
+
+    @property
+    def questions(self) -> list[str]:
+        """Known questions, oldest first."""
+        return list(self._shingles)
+
+    def _band_keys(self, shingles: set[int]) -> list[tuple[int, ...]]:
+        signature = [min(((h ^ a) * b) & _MASK64 for h in shingles) for a, b in self._hashers]
+        return [(band, *signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+    def _match(self, shingles: set[int], keys: list[tuple[int, ...]]) -> tuple[str, float] | None:
+        candidates = {question for key in keys for question in self._buckets.get(key, ())}
+        best = None
+        for question in candidates:
+            other = self._shingles[question]
+            shared = len(shingles & other)
+            similarity = shared / (len(shingles) + len(other) - shared)
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (question, similarity)
+        return best
+
+    def find(self, question: str) -> tuple[str, float] | None:
+        """The most similar known question and its similarity, if `question` is a near duplicate."""
+        shingles = question_shingles(question)
+        return self._match(shingles, self._band_keys(shingles))
+
+    def add(self, question: str) -> bool:
+        """Add a question unless it is a near duplicate of a known one.
+
+        Returns:
+            Whether the question was added.
+        """
+        shingles = question_shingles(question)
+        keys = self._band_keys(shingles)
+        if question in self._shingles or self._match(shingles, keys) is not None:
+            return False
+        self._shingles[question] = shingles
+        for key in keys:
+            self._buckets[key].add(question)
+        return True
+
+    def remove(self, question: str) -> None:
+        """Forget a question added with `add`, so questions like it are no longer duplicates."""
+        shingles = self._shingles.pop(question, None)
+        if shingles is None:
+            return
+        for key in self._band_keys(shingles):
+            bucket = self._buckets[key]
+            bucket.discard(question)
+            if not bucket:
+                del self._buckets[key]
+
+
+@dataclass
+class BatchStats:
+    resumed: int = 0
+    """Questions already in the output file."""
+    asked: int = 0
+    accepted: int = 0
+    duplicates: int = 0
+    rejected: int = 0
+    """Questions whose reference answer was graded incorrect."""
+    failed: int = 0
+    seconds: float = 0.0
+
+    @property
+    def questions_per_minute(self) -> float:
+        return self.accepted / self.seconds * 60 if self.seconds else 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {**asdict(self), 'questions_per_minute': round(self.questions_per_minute, 1)}
+
+
+class QuestionBatch:
+    """Generates deduplicated questions with graded reference answers into a JSONL file.
+
+    Args:
+        path: The JSONL output; existing questions in it are kept and count toward the target.
+        concurrency: Questions in progress at once (each makes its model calls in sequence).
+        deduper: Near-duplicate detection, a `QuestionDeduper()` by default.
+        avoid_recent: The number of most recent questions sent to the ask agent as history.
+        on_item: Called with each record written to the file, e.g. to print progress.
+    """
+
+    def __init__(
+        self,
+        path: Path | str = BATCH_FILE,
+        *,
+        concurrency: int = 8,
+        deduper: QuestionDeduper | None = None,
+        avoid_recent: int = 20,
+        on_item: Callable[[dict[str, Any]], None] | None = None,
+    ):
+        self.path = Path(path)
+        self.concurrency = concurrency
+        self.deduper = deduper if deduper is not None else QuestionDeduper()
+        self.avoid_recent = avoid_recent
+        self.on_item = on_item
+        self.stats = BatchStats()
+        self._running = 0
+        if self.path.exists():
+            self._load()
+
+    @property
+    def total(self) -> int:
+        """Questions in the output file."""
+        return self.stats.resumed + self.stats.accepted
+
+    async def run(self, count: int, max_attempts: int | None = None) -> BatchStats:
+        """Generate questions until the file holds `count` of them.
+
+        Args:
+            count: The target number of questions in the file, resumed ones included.
+            max_attempts: Questions asked at most, by default three times the missing ones
+                (duplicates, rejected answers and failed calls all use up attempts).
+        """
+        missing = max(count - self.total, 0)
+        if max_attempts is None:
+            max_attempts = 3 * missing + self.concurrency
+        start = time.perf_counter()
+        with logfire.span('batch questions', count=count, resumed=self.stats.resumed):
+            await asyncio.gather(*(self._worker(count, max_attempts) for _ in range(min(self.concurrency, missing))))
+        self.stats.seconds += time.perf_counter() - start
+        return self.stats
+
+    async def _worker(self, count: int, max_attempts: int) -> None:
+        # Attempts in progress count toward the target, so the last questions are not asked by every worker
+        while self.total + self._running < count and self.stats.asked < max_attempts:
+            self._running += 1
+            self.stats.asked += 1
+            try:
+                await self._generate()
+            except Exception as e:
+                self.stats.failed += 1
+                logfire.warn('batch question failed: {error}', error=repr(e))
+            finally:
+                self._running -= 1
+
+    async def _generate(self) -> None:
+        question, _ = await ask_question(self._recent_history())
+        question = ' '.join(question.split())
+        # Added before answering, so a concurrent worker asking the same thing is a duplicate;
+        # removed again unless the question reaches the file, which is all a resumed run knows
+        if not self.deduper.add(question):
+            self.stats.duplicates += 1
+            return
+        written = False
+        try:
+            answer = (await reference_agent.run(format_as_xml({'question': question}))).data
+            evaluation = (await evaluate_agent.run(format_as_xml({'question': question, 'answer': answer}))).data
+            if not evaluation.correct:
+                self.stats.rejected += 1
+                return
+            record = {'question': question, 'answer': answer, 'comment': evaluation.comment}
+            self._append(record)
+            written = True
+        finally:
+            if not written:
+                self.deduper.remove(question)
+        self.stats.accepted += 1
+        if self.on_item is not None:
+            self.on_item(record)
+
+    def _recent_history(self) -> list[ModelMessage]:
+        """The most recent questions as earlier ask exchanges, for the `ASK_WINDOW` summary."""
+        messages: list[ModelMessage] = []
+        for question in self.deduper.questions[-self.avoid_recent:] if self.avoid_recent > 0 else []:
+            messages.append(ModelRequest(parts=[UserPromptPart(ASK_PROMPT)]))
+            messages.append(ModelResponse(parts=[TextPart(question)]))
+        return messages
+
+    # -- persistence ----------------------------------------------------------
+
+    def _load(self) -> None:
+        records = []
+        torn = False
+        with open(self.path, 'rb') as f:
+            for line in f:
+                torn = not line.endswith(b'\n')
+                try:
+                    record = pydantic_core.from_json(line)
+                    question = record['question']
+                except (ValueError, KeyError, TypeError):
+                    continue  # a torn last line from an interrupted batch
+                records.append(record)
+                self.deduper.add(question)
+        self.stats.resumed = len(records)
+        if torn:
+            # rewrite so the next record starts on a new line
+            tmp = self.path.with_name(self.path.name + '.tmp')
+            tmp.write_bytes(b''.join(pydantic_core.to_json(record) + b'\n' for record in records))
+            os.replace(tmp, self.path)
+
+    def _append(self, record: dict[str, Any]) -> None:
+        with open(self.path, 'ab') as f:
+            f.write(pydantic_core.to_json(record) + b'\n')
+
+
+async def run_batch(
+    count: int, path: Path | str = BATCH_FILE, *, concurrency: int = 8, threshold: float = 0.6
+) -> BatchStats:
+    """Generate questions into `path` until it holds `count` of them, printing progress and throughput."""
+    batch = QuestionBatch(
+        path,
+        concurrency=concurrency,
+        deduper=QuestionDeduper(threshold),
+        on_item=lambda record: print(f"{record['question']} -> {record['answer']}"),
+    )
+    if batch.stats.resumed:
+        print(f'Resuming with {batch.stats.resumed} questions from {path}')
+    stats = await batch.run(count)
+    print(
+        f'{stats.accepted} new questions ({batch.total} in {path}) in {stats.seconds:.1f} s, '
+        f'{stats.questions_per_minute:.1f} questions/min; asked {stats.asked}, '
+        f'{stats.duplicates} near duplicates, {stats.rejected} rejected answers, {stats.failed} failed'
+    )
+    return stats
+
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(prog='question_graph.py batch', description='Generate a question bank')
+    parser.add_argument('count', type=int, help='target number of questions in the output file')
+    parser.add_argument('--out', type=Path, default=BATCH_FILE, help=f'JSONL output (default {BATCH_FILE})')
+    parser.add_argument('--concurrency', type=int, default=8, help='questions in progress at once')
+    parser.add_argument('--threshold', type=float, default=0.6, help='near-duplicate similarity (0-1)')
+    args = parser.parse_args(argv)
+    asyncio.run(run_batch(args.count, args.out, concurrency=args.concurrency, threshold=args.threshold))
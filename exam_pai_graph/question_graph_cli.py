@@ -1,76 +1,234 @@
-import asyncio
+import contextlib
+import json
+import os
+import socket
 import sys
 from pathlib import Path
-import logfire
-from devtools import debug
-from pydantic_graph import End
 from typing import Optional
 
-from question_graph_base import QuestionState, Answer, question_graph
+# asyncio, pydantic-ai, logfire and the graph are imported only when the step runs in this
+# process, so the thin client (a daemon is listening on SOCKET_PATH) starts in a few ms.
+
+HISTORY_FILE = Path('question_graph_history.jsonl')
+LEGACY_HISTORY_FILE = Path('question_graph_history.json')
+SOCKET_PATH = Path(os.getenv('QUESTION_GRAPH_SOCKET', 'question_graph.sock'))
+
+def open_store():
+    """Open the history store used by CLI steps."""
+    from question_graph_base import question_graph
+    from question_graph_history import HistoryStore
+
+    return HistoryStore(HISTORY_FILE, question_graph, legacy_path=LEGACY_HISTORY_FILE)
+
+def make_deps():
+    """Graph deps for CLI steps: the persistent evaluation cache."""
+    from question_graph_base import QuestionDeps
+    from question_graph_eval_cache import CACHE_FILE, EvaluationCache
+
+    return QuestionDeps(eval_cache=EvaluationCache(CACHE_FILE))
+
+async def run_step(store, answer: Optional[str] = None, deps=None, tracer=None) -> None:
+    """Run one CLI step of the question graph against a history store.
+
+    Only the steps produced by this invocation are appended to the history log,
+    and resuming reads just the last node snapshot.
 
-async def run_cli(answer: Optional[str] = None) -> None:
-    """Run the question graph in CLI mode with history support.
-    
     Args:
-        answer: Optional answer to continue from previous state
+        store: The `HistoryStore` of the CLI session.
+        answer: Optional answer to continue from previous state, None starts a new session
+        deps: Optional `QuestionDeps` for the nodes, e.g. from `make_deps()`
+        tracer: Optional `GraphTracer` recording the nodes and the history store calls
     """
-    history_file = Path('question_graph_history.json')
-    history = []
-    
+    import logfire
+    from devtools import debug
+    from pydantic_graph import End, EndStep
+
+    from question_graph_base import QuestionState, Answer, Ask, question_graph
+
+    def traced(name):
+        return tracer.span(name, 'history') if tracer is not None else contextlib.nullcontext()
+
+    last = None
     try:
-        if history_file.exists():
-            history = question_graph.load_history(history_file.read_bytes())
+        if answer is None:
+            store.start_session()
+        else:
+            with traced('history.load_last'):
+                last = store.load_last()
     except Exception as e:
         print(f"Error loading history: {e}")
-        history = []
+        return
 
     with logfire.span('run cli questions'):
         try:
-            if history:
-                last = history[-1]
-                assert last.kind == 'node', 'expected last step to be a node'
+            if last is not None and last.kind == 'end':
+                print("Error: the last session has finished, start a new one with --new")
+                return
+            elif last is not None:
                 state = last.state
-                if answer is None:
-                    print("Error: answer is required to continue from history")
-                    return
                 node = Answer(answer)
+            elif answer is not None:
+                print("Error: no session to continue, start one with --new")
+                return
             else:
                 state = QuestionState()
-                node = question_graph.start_node()
+                node = Ask()
             debug(state, node)
 
+            history = []
             while True:
-                node = await question_graph.next(node, history, state=state)
+                if tracer is not None:
+                    node = await tracer.next(question_graph, node, history, state=state, deps=deps)
+                else:
+                    node = await question_graph.next(node, history, state=state, deps=deps)
                 if isinstance(node, End):
-                    debug([e.data_snapshot() for e in history])
-                    print('Finished!')
+                    history.append(EndStep(result=node))
                     break
                 elif isinstance(node, Answer):
                     print(state.question)
                     break
 
-            # Save history
+            # Save only the new steps, then compact finished sessions off the critical path
             try:
-                history_file.write_bytes(question_graph.dump_history(history, indent=2))
+                with traced('history.append'):
+                    store.append(history)
+                store.compact_in_background()
             except Exception as e:
                 print(f"Error saving history: {e}")
 
+            if isinstance(node, End):
+                debug([e.data_snapshot() for e in store.load_session()])
+                print('Finished!')
+
         except Exception as e:
             print(f"Error occurred: {e}")
             raise
 
+async def run_cli(answer: Optional[str] = None, trace: Optional[Path] = None) -> None:
+    """Run the question graph in CLI mode with history support, in this process.
+
+    Args:
+        answer: Optional answer to continue from previous state, None starts a new session
+        trace: Optional file for a Chrome trace of the step (a speedscope profile is written
+            next to it), a per-node summary is printed at the end
+    """
+    try:
+        store = open_store()
+        deps = make_deps()
+    except Exception as e:
+        print(f"Error loading history: {e}")
+        return
+    if trace is None:
+        await run_step(store, answer, deps)
+        return
+
+    from question_graph_base import ask_agent, evaluate_agent
+    from question_graph_trace import GraphTracer
+
+    tracer = GraphTracer('question_graph_cli')
+    try:
+        with tracer.instrument(ask_agent=ask_agent, evaluate_agent=evaluate_agent):
+            await run_step(store, answer, deps, tracer)
+    finally:
+        tracer.write_chrome_trace(trace)
+        tracer.write_speedscope(trace.with_suffix('.speedscope.json'))
+        print(tracer.summary())
+        print(f"Trace written to {trace} and {trace.with_suffix('.speedscope.json')}")
+
+def export_history(path: Path, format: Optional[str] = None) -> None:
+    """Write the current session's history to a file, as JSON or as a binary snapshot.
+
+    Args:
+        path: The file to write.
+        format: One of `question_graph_snapshot.FORMATS`, by default implied by the file name
+            (`.json`, `.zst` for msgpack-zstd, anything else msgpack)
+    """
+    from question_graph_base import question_graph
+    from question_graph_snapshot import format_for_path, write_history
+
+    format = format or format_for_path(path)
+    history = open_store().load_session()
+    size = write_history(path, question_graph, history, format=format)
+    print(f"Exported {len(history)} steps to {path} ({format}, {size} bytes)")
+
+def send_to_daemon(request: dict, socket_path: Path = SOCKET_PATH) -> Optional[dict]:
+    """Send one request to a running `question_graph_daemon.py`.
+
+    Args:
+        request: The JSON request, e.g. `{'op': 'step', 'answer': 'Paris'}`.
+        socket_path: The daemon's Unix socket.
+
+    Returns:
+        The daemon's reply, or None if no daemon is listening.
+    """
+    if not hasattr(socket, 'AF_UNIX') or not socket_path.exists():
+        return None
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(socket_path))
+        except (ConnectionRefusedError, FileNotFoundError):
+            # stale socket file left by a daemon that was killed
+            return None
+        sock.sendall(json.dumps(request).encode() + b'\n')
+        with sock.makefile('rb') as f:
+            line = f.readline()
+    if not line:
+        raise ConnectionError('the daemon closed the connection without a reply')
+    return json.loads(line)
+
 def main() -> None:
-    """Main entry point for CLI mode."""
-    if len(sys.argv) < 2:
+    """Main entry point for CLI mode.
+
+    If a daemon is listening on SOCKET_PATH the step runs there, otherwise in this process.
+    """
+    args = sys.argv[1:]
+    trace = None
+    if '--trace' in args:
+        i = args.index('--trace')
+        trace = Path(args[i + 1]) if i + 1 < len(args) else None
+        del args[i:i + 2]
+    export = format = None
+    for option in ('--export', '--format'):
+        if option in args:
+            i = args.index(option)
+            value = args[i + 1] if i + 1 < len(args) else None
+            del args[i:i + 2]
+            if option == '--export':
+                export = Path(value) if value else None
+            else:
+                format = value
+    if export is not None:
+        try:
+            export_history(export, format)
+        except (ValueError, ImportError) as e:
+            print(f"Error exporting history: {e}")
+            sys.exit(1)
+        return
+    local = '--no-daemon' in args or trace is not None
+    args = [arg for arg in args if arg != '--no-daemon']
+    if not args:
         print("Usage: python question_graph_cli.py <answer>")
         print("  or: python question_graph_cli.py --new (to start new session)")
+        print("  add --no-daemon to run in this process even if a daemon is running")
+        print("  add --trace FILE to write a per-node trace of the step (runs in this process)")
+        print("  or: python question_graph_cli.py --export FILE [--format json|msgpack|msgpack-zstd]")
+        print("      (write the current session's history, format by default from the file name)")
         sys.exit(1)
 
-    answer = None if sys.argv[1] == '--new' else sys.argv[1]
+    answer = None if args[0] == '--new' else args[0]
     try:
-        asyncio.run(run_cli(answer))
+        reply = None if local else send_to_daemon({'op': 'step', 'answer': answer})
+        if reply is None:
+            import asyncio
+
+            asyncio.run(run_cli(answer, trace))
+            return
+        print(reply['output'], end='')
+        if reply.get('error'):
+            print(f"Error occurred: {reply['error']}")
+            sys.exit(1)
     except KeyboardInterrupt:
         print("\nExiting...")
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
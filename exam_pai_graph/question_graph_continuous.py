@@ -5,7 +5,9 @@ import sys
 from devtools import debug
 from pydantic_graph import End
 
-from question_graph_base import QuestionState, Answer, Ask, question_graph
+from question_graph_base import QuestionDeps, QuestionState, Answer, Ask, question_graph
+from question_graph_eval_cache import CACHE_FILE, EvaluationCache
+from question_graph_prefetch import QuestionPrefetcher
 
 # Global flag for graceful shutdown
 shutdown_flag = False
@@ -20,16 +22,24 @@ def handle_interrupt(signum, frame):
         print("\nForce exiting...")
         sys.exit(1)
 
-async def run_continuous():
-    """Run the question graph in continuous mode, asking questions until correct answer."""
+async def run_continuous(prefetch_depth: int = 1):
+    """Run the question graph in continuous mode, asking questions until correct answer.
+
+    Args:
+        prefetch_depth: Questions generated in the background while the user is answering, 0 disables prefetch
+    """
     state = QuestionState()
     node = Ask()
     history = []
+    deps = QuestionDeps(
+        prefetcher=QuestionPrefetcher(prefetch_depth) if prefetch_depth else None,
+        eval_cache=EvaluationCache(CACHE_FILE),
+    )
     
     with logfire.span('run continuous questions'):
         try:
             while not shutdown_flag:
-                node = await question_graph.next(node, history, state=state)
+                node = await question_graph.next(node, history, state=state, deps=deps)
                 if isinstance(node, End):
                     debug([e.data_snapshot() for e in history])
                     print("Session completed successfully!")
@@ -37,7 +47,8 @@ async def run_continuous():
                 elif isinstance(node, Answer):
                     assert state.question, "Question must be set before answer"
                     try:
-                        node.answer = input(f'{state.question} ')
+                        # read in a thread so the event loop keeps prefetching the next question
+                        node.answer = await asyncio.to_thread(input, f'{state.question} ')
                         if not node.answer.strip():
                             print("Please provide a non-empty answer.")
                             continue
@@ -47,6 +58,8 @@ async def run_continuous():
             print(f"Error occurred: {e}")
             raise
         finally:
+            if deps.prefetcher is not None:
+                deps.prefetcher.cancel()
             if shutdown_flag:
                 print("\nSession ended by user.")
 
@@ -0,0 +1,148 @@
+"""Warm daemon for `question_graph_cli.py`.
+
+Every CLI invocation otherwise re-imports pydantic-ai and logfire, builds the Azure client
+and agents, and reopens the history log before running one graph step. The daemon does
+that once and then serves steps over a Unix socket, keeping the graph, the agents, the
+pooled HTTP client and the history store in memory. While it is running,
+`question_graph_cli.py` is a thin client: it sends `{"op": "step", "answer": ...}` and
+prints the output of the step.
+
+Protocol: one JSON request per connection, terminated by a newline, answered by one JSON
+line `{"output": str, "error": str | null}`. Ops are `step`, `ping` and `shutdown`.
+
+Run with:
+
+    python question_graph_daemon.py          # serve in the foreground
+    python question_graph_daemon.py --stop   # stop a running daemon
+"""
+from __future__ import annotations as _annotations
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import signal
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+from question_graph_cli import SOCKET_PATH, make_deps, open_store, run_step, send_to_daemon
+
+
+class QuestionGraphDaemon:
+    """Serves CLI steps of the question graph over a Unix socket.
+
+    Steps are serialized, as they all advance the one CLI session stored in the history log.
+
+    Args:
+        socket_path: The Unix socket to listen on.
+        store: The history store, `open_store()` by default.
+        deps: The graph deps, `make_deps()` by default (the evaluation cache stays in memory).
+    """
+
+    def __init__(self, socket_path: Path | str = SOCKET_PATH, store: Any = None, deps: Any = None):
+        self.socket_path = Path(socket_path)
+        self.store = store
+        self.deps = deps
+        self.steps = 0
+        self._step_lock = asyncio.Lock()
+        self._stop = asyncio.Event()
+
+    def warm_up(self) -> None:
+        """Import the graph, build the models and read the history tail before the first request."""
+        from exam_pai_simple.lazy_model import LazyModel
+        from question_graph_base import ask_agent, evaluate_agent
+
+        if self.store is None:
+            self.store = open_store()
+        if self.deps is None:
+            self.deps = make_deps()
+        for agent in (ask_agent, evaluate_agent):
+            if isinstance(agent.model, LazyModel):
+                agent.model.model
+        self.store.load_last()
+
+    async def handle(self, request: dict[str, Any]) -> dict[str, Any]:
+        op = request.get('op')
+        if op == 'ping':
+            output = f'question graph daemon, pid {os.getpid()}, {self.steps} steps served\n'
+            if self.deps is not None and self.deps.eval_cache is not None:
+                output += f'evaluation cache: {self.deps.eval_cache.stats.to_dict()}\n'
+            return {'output': output, 'error': None}
+        if op == 'shutdown':
+            self._stop.set()
+            return {'output': 'Daemon stopped\n', 'error': None}
+        if op != 'step':
+            return {'output': '', 'error': f'unknown op {op!r}'}
+
+        async with self._step_lock:
+            output = io.StringIO()
+            error = None
+            # Steps run one at a time, so redirecting stdout captures only this step's output
+            with contextlib.redirect_stdout(output):
+                try:
+                    await run_step(self.store, request.get('answer'), self.deps)
+                except Exception as e:
+                    error = f'{type(e).__name__}: {e}'
+            self.steps += 1
+            return {'output': output.getvalue(), 'error': error}
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            line = await reader.readline()
+            try:
+                request = json.loads(line)
+            except ValueError:
+                reply = {'output': '', 'error': 'invalid request'}
+            else:
+                reply = await self.handle(request)
+            writer.write(json.dumps(reply).encode() + b'\n')
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self) -> None:
+        """Listen until a `shutdown` request, SIGINT or SIGTERM."""
+        if send_to_daemon({'op': 'ping'}, self.socket_path) is not None:
+            raise RuntimeError(f'a daemon is already listening on {self.socket_path}')
+        self.socket_path.unlink(missing_ok=True)
+
+        start = time.perf_counter()
+        self.warm_up()
+        server = await asyncio.start_unix_server(self._handle_connection, path=str(self.socket_path))
+        os.chmod(self.socket_path, 0o600)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._stop.set)
+        print(f'Listening on {self.socket_path} (warm-up {(time.perf_counter() - start) * 1000:.0f} ms)', flush=True)
+        try:
+            async with server:
+                await self._stop.wait()
+        finally:
+            self.socket_path.unlink(missing_ok=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Warm daemon for question_graph_cli.py')
+    parser.add_argument('--socket', type=Path, default=SOCKET_PATH, help=f'Unix socket (default {SOCKET_PATH})')
+    parser.add_argument('--stop', action='store_true', help='stop a running daemon')
+    args = parser.parse_args()
+
+    if args.stop:
+        reply = send_to_daemon({'op': 'shutdown'}, args.socket)
+        if reply is None:
+            print('No daemon is running')
+        else:
+            print(reply['output'], end='')
+        return
+    if send_to_daemon({'op': 'ping'}, args.socket) is not None:
+        print(f'Error: a daemon is already listening on {args.socket}', file=sys.stderr)
+        sys.exit(1)
+    asyncio.run(QuestionGraphDaemon(args.socket).serve())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""Evaluation cache for the question graph.
+
+`Evaluate` calls `evaluate_agent` for every answer, even when the same question was answered
+the same way before. With a shared question pool the same answers come back all the time
+("Paris", "paris", " Paris."), so `EvaluationCache` stores grades keyed by the question and a
+normalized answer, and `Evaluate` reuses a stored grade without calling the model.
+
+Normalization: Unicode NFKC, case folding, punctuation around words removed (signs, decimal
+separators and `%` are kept), whitespace collapsed, then an optional synonym table maps whole normalized answers to a canonical form
+(e.g. `{'nyc': 'new york city'}`).
+
+Grades are appended to a JSONL file when `path` is given, and loaded again on open. Pass the
+cache to the graph through `QuestionDeps`:
+
+    deps = QuestionDeps(eval_cache=EvaluationCache('question_graph_eval_cache.jsonl'))
+"""
+from __future__ import annotations as _annotations
+
+import os
+import re
+import unicodedata
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Mapping
+
+import pydantic_core
+
+from question_graph_base import EvaluationResult
+
+CACHE_FILE = Path('question_graph_eval_cache.jsonl')
+
+
+_OPENERS = {')': '(', ']': '[', '}': '{'}
+
+
+def _is_punctuation(ch: str) -> bool:
+    return unicodedata.category(ch).startswith('P')
+
+
+def _strip_token(token: str) -> str:
+    """Strip punctuation around a word, keeping what changes its meaning.
+
+    Punctuation inside a token ("3.14", "3,14", "o(n)") is kept, as are a leading minus sign
+    before a digit ("-5"), a trailing percent sign ("5%") and closing brackets that match an
+    opening one in the token.
+    """
+    end = len(token)
+    while end and _is_punctuation(token[end - 1]):
+        ch = token[end - 1]
+        if ch == '%' or (ch in _OPENERS and token.count(_OPENERS[ch], 0, end) >= token.count(ch, 0, end)):
+            break
+        end -= 1
+    start = 0
+    while start < end and _is_punctuation(token[start]):
+        ch = token[start]
+        if ch == '-' and start + 1 < end and token[start + 1].isdigit():
+            break
+        if ch in '([{' and token.find({'(': ')', '[': ']', '{': '}'}[ch], start, end) >= 0:
+            break
+        start += 1
+    return token[start:end]
+
+
+def normalize_answer(answer: str, synonyms: Mapping[str, str] | None = None) -> str:
+    """Normalize an answer for cache lookups.
+
+    Only punctuation around words is dropped ("Paris." and "paris" match); signs, decimal
+    separators and `%` are kept, so "-5", "5", "5%", "3.14" and "3,14" stay different answers.
+
+    Args:
+        answer: The user's answer.
+        synonyms: Optional map from a normalized answer to its canonical form. Keys are normalized too.
+    """
+    text = unicodedata.normalize('NFKC', answer).casefold()
+    # A detached leading minus sign ("- 5") still negates the number
+    text = re.sub(r'^\s*-\s+(?=\d)', '-', text)
+    text = ' '.join(token for token in map(_strip_token, text.split()) if token)
+    if synonyms:
+        text = synonyms.get(text, text)
+    return text
+
+
+def normalize_question(question: str) -> str:
+    """Questions come from the model, only whitespace differences are ignored."""
+    return ' '.join(question.split())
+
+
+@dataclass
+class EvalCacheStats:
+    hits: int = 0
+    misses: int = 0
+    stored: int = 0
+    loaded: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {**asdict(self), 'hit_ratio': round(self.hit_ratio, 4)}
+
+
+class EvaluationCache:
+    """Grades keyed by (question, normalized answer), optionally persisted to a JSONL file.
+
+    Args:
+        path: Optional JSONL file the grades are appended to and loaded from.
+        synonyms: Optional map from normalized answers to a canonical answer.
+        max_entries: Maximum grades kept in memory, least recently used are dropped first.
+            The file is rewritten with the kept grades when it holds twice as many lines.
+    """
+
+    def __init__(
+        self,
+        path: Path | str | None = None,
+        *,
+        synonyms: Mapping[str, str] | None = None,
+        max_entries: int = 100_000,
+    ):
+        self.path = Path(path) if path else None
+        self.synonyms = {normalize_answer(k): normalize_answer(v) for k, v in (synonyms or {}).items()}
+        self.max_entries = max_entries
+        self.stats = EvalCacheStats()
+        self._entries: OrderedDict[tuple[str, str], EvaluationResult] = OrderedDict()
+        self._file_lines = 0
+        if self.path is not None and self.path.exists():
+            self._load()
+
+    def key(self, question: str, answer: str) -> tuple[str, str]:
+        return normalize_question(question), normalize_answer(answer, self.synonyms)
+
+    def __contains__(self, item: tuple[str, str]) -> bool:
+        """Whether `(question, answer)` has a stored grade, without touching the stats."""
+        return self.key(*item) in self._entries
+
+    def get(self, question: str, answer: str) -> EvaluationResult | None:
+        """The stored grade for this question and answer, or None."""
+        key = self.key(question, answer)
+        result = self._entries.get(key)
+        if result is None:
+            self.stats.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return result
+
+    def put(self, question: str, answer: str, result: EvaluationResult) -> None:
+        """Store a grade from the model."""
+        key = self.key(question, answer)
+        self._set(key, result)
+        self.stats.stored += 1
+        if self.path is not None:
+            self._append([self._record(key, result)])
+            if self._file_lines > 2 * max(len(self._entries), 1000):
+                self.compact()
+
+    def _set(self, key: tuple[str, str], result: EvaluationResult) -> None:
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # -- persistence ----------------------------------------------------------
+
+    @staticmethod
+    def _record(key: tuple[str, str], result: EvaluationResult) -> dict[str, Any]:
+        question, answer = key
+        return {'question': question, 'answer': answer, 'correct': result.correct, 'comment': result.comment}
+
+    def _load(self) -> None:
+        torn = False
+        with open(self.path, 'rb') as f:
+            for line in f:
+                self._file_lines += 1
+                torn = not line.endswith(b'\n')
+                try:
+                    record = pydantic_core.from_json(line)
+                    key = (record['question'], record['answer'])
+                    result = EvaluationResult(record['correct'], record['comment'])
+                except (ValueError, KeyError, TypeError):
+                    continue  # a torn last line, or a record from an incompatible version
+                self._set(key, result)
+        self.stats.loaded = len(self._entries)
+        if torn:
+            # a crash in the middle of an append; rewrite so the next record starts on a new line
+            self.compact()
+
+    def _append(self, records: list[dict[str, Any]]) -> None:
+        data = b''.join(pydantic_core.to_json(record) + b'\n' for record in records)
+        with open(self.path, 'ab') as f:
+            f.write(data)
+        self._file_lines += len(records)
+
+    def compact(self) -> None:
+        """Rewrite the file with only the grades kept in memory."""
+        if self.path is None:
+            return
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        tmp.write_bytes(b''.join(
+            pydantic_core.to_json(self._record(key, result)) + b'\n' for key, result in self._entries.items()
+        ))
+        os.replace(tmp, self.path)
+        self._file_lines = len(self._entries)
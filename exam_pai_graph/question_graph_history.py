@@ -0,0 +1,448 @@
+"""Append-only history store for question graph runs.
+
+`Graph.dump_history` rewrites the whole history on every CLI invocation, so each step
+costs O(total history). `HistoryStore` keeps the history in a JSONL log instead:
+
+- every line is one serialized `HistoryStep`, a session marker, or the header line;
+- a CLI step appends only the steps it produced;
+- resuming reads only the tail of the file to find the last node snapshot;
+- finished sessions are dropped by a compaction that runs in a background thread.
+
+Node steps are delta encoded: a step stores only the messages appended to each list field
+of the state since the previous step, plus a `state_keep` map with the length of the prefix
+taken from the previous step. Every `keyframe_interval` node steps (and at the start of each
+session) a full snapshot is written, so reconstructing a step never replays more than one
+keyframe interval. Decoded states share the message objects of the previous step, so loading
+a whole session costs O(log size) rather than O(steps x state size).
+"""
+from __future__ import annotations as _annotations
+
+import copy
+import dataclasses
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+import pydantic_core
+from pydantic_graph import Graph, HistoryStep
+
+FORMAT_VERSION = 2
+HEADER_KIND = 'header'
+SESSION_KIND = 'session'
+
+_TAIL_BLOCK = 64 * 1024
+
+# Records are written with a fixed leading key, so a line can be classified without parsing it
+_DELTA_PREFIX = b'{"state_keep":'
+_KEYFRAME_PREFIX = b'{"state":'
+_SESSION_PREFIX = b'{"kind":"session"'
+_HEADER_PREFIX = b'{"kind":"header"'
+
+
+class StepCodec:
+    """Delta encoding of `HistoryStep`s as JSON-compatible records.
+
+    Node steps store only the messages appended to each list field of the state since the
+    previous node step, plus a `state_keep` map with the length of the prefix taken from it;
+    every `keyframe_interval` node steps a full snapshot is written instead. Also used by
+    `question_graph_snapshot.py` for binary snapshots.
+
+    Args:
+        graph: The graph whose history is encoded.
+        keyframe_interval: A full state snapshot is written every this many node steps.
+    """
+
+    def __init__(self, graph: Graph[Any, Any, Any], keyframe_interval: int = 50):
+        self.graph = graph
+        self.keyframe_interval = keyframe_interval
+        # State of the last node step dumped, the base of the next delta (None: next step is a keyframe)
+        self.last_state: Any = None
+        self.since_keyframe = 0
+
+    def reset(self) -> None:
+        """Make the next node step a keyframe, e.g. at the start of a session."""
+        self.last_state, self.since_keyframe = None, 0
+
+    def dump(self, steps: Iterable[HistoryStep[Any, Any]]) -> list[dict[str, Any]]:
+        """Serialize steps, delta encoding node states against the previous node step."""
+        partial_steps = []
+        keeps = []
+        for step in steps:
+            keep = None
+            if step.kind == 'node':
+                keep = self._state_keep(step.state)
+                self.since_keyframe = 0 if keep is None else self.since_keyframe + 1
+                self.last_state = step.state
+                if keep is not None:
+                    # Only the appended tail of each list field is serialized
+                    partial = copy.copy(step.state)
+                    for name, count in keep.items():
+                        setattr(partial, name, getattr(step.state, name)[count:])
+                    step = dataclasses.replace(step, state=partial)
+            partial_steps.append(step)
+            keeps.append(keep)
+        records = self.graph.history_type_adapter.dump_python(partial_steps, mode='json')
+        return [record if keep is None else {'state_keep': keep, **record} for record, keep in zip(records, keeps)]
+
+    def _state_keep(self, state: Any) -> dict[str, int] | None:
+        """Prefix lengths shared with the previous state for each list field, None for a keyframe."""
+        previous = self.last_state
+        if (
+            previous is None
+            or self.since_keyframe + 1 >= self.keyframe_interval
+            or type(previous) is not type(state)
+            or not dataclasses.is_dataclass(state)
+        ):
+            return None
+        keep = {}
+        for f in dataclasses.fields(state):
+            old, new = getattr(previous, f.name), getattr(state, f.name)
+            if isinstance(old, list) and isinstance(new, list):
+                keep[f.name] = _common_prefix(old, new)
+        return keep
+
+    def load(self, records: Iterable[dict[str, Any]]) -> Iterator[HistoryStep[Any, Any]]:
+        """Decode records in order, applying deltas on top of the previous node state.
+
+        Args:
+            records: Step records and session markers, starting at a keyframe or session start.
+        """
+        adapter = self.graph.history_type_adapter
+        previous = None
+        for record in records:
+            if record.get('kind') == SESSION_KIND:
+                previous = None
+                continue
+            keep = record.pop('state_keep', None)
+            if record.get('kind') == 'node':
+                # The decoded state is already a fresh object; skip the deep copy in NodeStep.__post_init__
+                record['snapshot_state'] = _no_copy
+            step = adapter.validate_python([record])[0]
+            if step.kind == 'node':
+                step.snapshot_state = self.graph.snapshot_state
+                if keep is not None:
+                    if previous is None:
+                        raise ValueError('delta history step without a preceding keyframe')
+                    for name, count in keep.items():
+                        setattr(step.state, name, getattr(previous, name)[:count] + getattr(step.state, name))
+                previous = step.state
+            yield step
+
+
+class HistoryStore:
+    """Append-only JSONL log of `HistoryStep`s, grouped into sessions.
+
+    Args:
+        path: The JSONL log file.
+        graph: The graph whose history is stored (used for (de)serializing steps).
+        legacy_path: Optional `dump_history` JSON file, imported once if the log does not exist yet.
+        compact_bytes: Compaction is considered once the log is larger than this,
+            and again each time it doubles in size since the last compaction.
+        keep_sessions: The number of most recent sessions kept by compaction.
+        keyframe_interval: A full state snapshot is written every this many node steps.
+    """
+
+    def __init__(
+        self,
+        path: Path | str,
+        graph: Graph[Any, Any, Any],
+        *,
+        legacy_path: Path | str | None = None,
+        compact_bytes: int = 1 << 20,
+        keep_sessions: int = 1,
+        keyframe_interval: int = 50,
+    ):
+        self.path = Path(path)
+        self.graph = graph
+        self.legacy_path = Path(legacy_path) if legacy_path else None
+        self.compact_bytes = compact_bytes
+        self.keep_sessions = keep_sessions
+        self.keyframe_interval = keyframe_interval
+        self._codec = StepCodec(graph, keyframe_interval)
+        self._tail_known = False
+        self._lock = threading.RLock()
+        self._checked = False
+        self._compaction: threading.Thread | None = None
+
+    # -- encoding -------------------------------------------------------------
+
+    @staticmethod
+    def _encode(record: dict[str, Any]) -> bytes:
+        return pydantic_core.to_json(record) + b'\n'
+
+    @staticmethod
+    def _decode(line: bytes) -> dict[str, Any] | None:
+        """Parse one log line, returning None for blank or torn lines."""
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            return pydantic_core.from_json(line)
+        except ValueError:
+            return None
+
+    def _header(self, compacted_size: int) -> dict[str, Any]:
+        return {'kind': HEADER_KIND, 'version': FORMAT_VERSION, 'compacted_size': compacted_size}
+
+    # -- file management ------------------------------------------------------
+
+    def _ensure_file(self) -> None:
+        """Create the log (importing the legacy JSON history if present) and drop a torn last line.
+
+        Must be called with `self._lock` held.
+        """
+        if self._checked:
+            return
+        if not self.path.exists():
+            data = self._encode(self._header(0))
+            if self.legacy_path is not None and self.legacy_path.exists():
+                steps = self.graph.load_history(self.legacy_path.read_bytes())
+                data += self._encode(self._session_marker())
+                self._codec.reset()
+                data += b''.join(self._encode(record) for record in self._codec.dump(steps))
+            self._tail_known = True
+            tmp = self.path.with_name(self.path.name + '.tmp')
+            tmp.write_bytes(data)
+            os.replace(tmp, self.path)
+        else:
+            # A crash in the middle of an append leaves a partial last line; cut it off
+            with open(self.path, 'rb+') as f:
+                size = f.seek(0, os.SEEK_END)
+                if size:
+                    f.seek(size - 1)
+                    if f.read(1) != b'\n':
+                        f.truncate(self._last_newline_end(f, size))
+        self._checked = True
+
+    @staticmethod
+    def _last_newline_end(f: Any, size: int) -> int:
+        """Offset just after the last newline before `size` (0 if there is none)."""
+        end = size
+        while end > 0:
+            start = max(0, end - _TAIL_BLOCK)
+            f.seek(start)
+            block = f.read(end - start)
+            index = block.rfind(b'\n')
+            if index >= 0:
+                return start + index + 1
+            end = start
+        return 0
+
+    def _read_header(self) -> dict[str, Any]:
+        with open(self.path, 'rb') as f:
+            record = self._decode(f.readline())
+        if record is None or record.get('kind') != HEADER_KIND:
+            return self._header(0)
+        return record
+
+    @staticmethod
+    def _session_marker() -> dict[str, Any]:
+        return {'kind': SESSION_KIND, 'ts': datetime.now(timezone.utc).isoformat()}
+
+    # -- writing --------------------------------------------------------------
+
+    def _write(self, records: list[dict[str, Any]]) -> int:
+        """Append encoded records to the log. Must be called with `self._lock` held."""
+        data = b''.join(self._encode(record) for record in records)
+        if data:
+            with open(self.path, 'ab') as f:
+                f.write(data)
+        return len(data)
+
+    def append(self, steps: Iterable[HistoryStep[Any, Any]]) -> int:
+        """Append new history steps to the current session.
+
+        Args:
+            steps: The steps produced since the last append.
+
+        Returns:
+            The number of bytes written.
+        """
+        with self._lock:
+            self._ensure_file()
+            if not self._tail_known:
+                self._load_tail()
+            return self._write(self._codec.dump(steps))
+
+    def start_session(self) -> None:
+        """Start a new session; `load_last` returns None until steps are appended."""
+        with self._lock:
+            self._ensure_file()
+            self._write([self._session_marker()])
+            self._codec.reset()
+            self._tail_known = True
+
+    # -- reading --------------------------------------------------------------
+
+    def _iter_lines(self) -> Iterator[bytes]:
+        """Yield the raw record lines of the log, skipping the header."""
+        with self._lock:
+            self._ensure_file()
+        with open(self.path, 'rb') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith(_HEADER_PREFIX):
+                    yield line
+
+    def _iter_records(self) -> Iterator[dict[str, Any]]:
+        for line in self._iter_lines():
+            record = self._decode(line)
+            if record is not None:
+                yield record
+
+    def _iter_tail_records(self) -> Iterator[dict[str, Any]]:
+        """Yield records from the end of the log backwards, reading the file in blocks."""
+        with self._lock:
+            self._ensure_file()
+        with open(self.path, 'rb') as f:
+            end = f.seek(0, os.SEEK_END)
+            rest = b''
+            while end > 0:
+                start = max(0, end - _TAIL_BLOCK)
+                f.seek(start)
+                lines = (f.read(end - start) + rest).split(b'\n')
+                # The first piece may be a partial line unless we reached the start of the file
+                rest = lines.pop(0) if start > 0 else b''
+                for line in reversed(lines):
+                    record = self._decode(line)
+                    if record is not None and record.get('kind') != HEADER_KIND:
+                        yield record
+                end = start
+
+    def _load_tail(self) -> list[HistoryStep[Any, Any]]:
+        """Decode the current session's steps back to the last keyframe, and remember a snapshot
+        of the last node state as the base for the next delta."""
+        with self._lock:
+            chain = []
+            for record in self._iter_tail_records():
+                if record.get('kind') == SESSION_KIND:
+                    break
+                chain.append(record)
+                if record.get('kind') == 'node' and 'state_keep' not in record:
+                    break
+            chain.reverse()
+            since_keyframe = sum('state_keep' in record for record in chain)
+            steps = list(self._codec.load(chain))
+            node_steps = [step for step in steps if step.kind == 'node']
+            # Callers resume from the returned state and mutate it, so the delta base must be a copy
+            self._codec.last_state = self.graph.snapshot_state(node_steps[-1].state) if node_steps else None
+            self._codec.since_keyframe = since_keyframe
+            self._tail_known = True
+            return steps
+
+    def load_last(self) -> HistoryStep[Any, Any] | None:
+        """The last step of the current session, reading only the tail of the log."""
+        steps = self._load_tail()
+        return steps[-1] if steps else None
+
+    def load_step(self, index: int) -> HistoryStep[Any, Any]:
+        """Reconstruct one step of the current session, decoding only from the nearest keyframe.
+
+        Args:
+            index: The step index within the session (negative indexes count from the end).
+        """
+        lines: list[bytes] = []
+        for line in self._iter_lines():
+            if line.startswith(_SESSION_PREFIX):
+                lines = []
+            else:
+                lines.append(line)
+        target = range(len(lines))[index]
+        start = target
+        while start > 0 and not lines[start].startswith(_KEYFRAME_PREFIX):
+            start -= 1
+        records = [self._decode(line) for line in lines[start:target + 1]]
+        return list(self._codec.load(record for record in records if record is not None))[-1]
+
+    def load_session(self) -> list[HistoryStep[Any, Any]]:
+        """All steps of the current (last) session."""
+        records: list[dict[str, Any]] = []
+        for record in self._iter_records():
+            if record.get('kind') == SESSION_KIND:
+                records = []
+            else:
+                records.append(record)
+        return list(self._codec.load(records))
+
+    def load_all(self) -> list[HistoryStep[Any, Any]]:
+        """All steps in the log, across sessions."""
+        return list(self._codec.load(self._iter_records()))
+
+    # -- compaction -----------------------------------------------------------
+
+    def needs_compaction(self) -> bool:
+        if not self.path.exists():
+            return False
+        size = self.path.stat().st_size
+        return size > max(self.compact_bytes, 2 * self._read_header()['compacted_size'])
+
+    def compact(self) -> int:
+        """Rewrite the log keeping only the last `keep_sessions` sessions.
+
+        Appends made while compacting are carried over, so writers are only blocked
+        for the final copy-and-rename.
+
+        Returns:
+            The size of the log after compaction.
+        """
+        with self._lock:
+            self._ensure_file()
+            snapshot_size = self.path.stat().st_size
+        with open(self.path, 'rb') as f:
+            lines = f.read(snapshot_size).splitlines()
+
+        records = [(line, self._decode(line)) for line in lines]
+        records = [(line, r) for line, r in records if r is not None and r.get('kind') != HEADER_KIND]
+        markers = [i for i, (_, r) in enumerate(records) if r.get('kind') == SESSION_KIND]
+        first = markers[-self.keep_sessions] if len(markers) >= self.keep_sessions else 0
+        body = b''.join(line + b'\n' for line, _ in records[first:])
+
+        tmp = self.path.with_name(self.path.name + '.compact')
+        with self._lock:
+            with open(self.path, 'rb') as f:
+                f.seek(snapshot_size)
+                tail = f.read()
+            # The next compaction is considered once the log doubles from this size
+            header = self._encode(self._header(len(body)))
+            tmp.write_bytes(header + body + tail)
+            os.replace(tmp, self.path)
+            return len(header) + len(body) + len(tail)
+
+    def compact_in_background(self) -> threading.Thread | None:
+        """Start a compaction thread if the log has grown enough.
+
+        The thread is not a daemon, so a short-lived CLI process finishes the
+        compaction after printing its output instead of abandoning it.
+
+        Returns:
+            The compaction thread, or None if no compaction was needed.
+        """
+        if self._compaction is not None and self._compaction.is_alive():
+            return None
+        if not self.needs_compaction():
+            return None
+        self._compaction = threading.Thread(target=self.compact, name='history-compaction')
+        self._compaction.start()
+        return self._compaction
+
+
+def _no_copy(state: Any) -> Any:
+    return state
+
+
+def _common_prefix(old: list[Any], new: list[Any]) -> int:
+    """Length of the common prefix of two lists.
+
+    Snapshots share message objects, so the usual append-only case is settled by
+    identity comparisons inside a single list equality check.
+    """
+    if len(old) <= len(new) and new[:len(old)] == old:
+        return len(old)
+    count = 0
+    for a, b in zip(old, new):
+        if a is not b and a != b:
+            break
+        count += 1
+    return count
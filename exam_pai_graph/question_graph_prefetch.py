@@ -0,0 +1,137 @@
+"""Background question prefetch for the question graph.
+
+The `Ask` node normally calls the model only after the previous answer was evaluated, so the
+user waits a full model round-trip for every new question. A `QuestionPrefetcher` generates
+the next question(s) while the user is still answering the current one:
+
+- `Ask` calls `fill(history)` once its question is set, which starts up to `depth` background
+  generations, each continuing the ask history of the one before it;
+- the next `Ask` calls `take(history)` and uses the first buffered question (waiting for it if
+  it is still being generated) instead of calling the model;
+- a buffer generated from a different history is discarded, and `cancel()` drops everything
+  when the session ends.
+
+A prefetched question is wasted when the user answers correctly, so the cost is up to `depth`
+extra model calls per session. Pass it to the graph through `QuestionDeps`:
+
+    deps = QuestionDeps(QuestionPrefetcher(depth=1))
+    node = await question_graph.next(node, history, state=state, deps=deps)
+"""
+from __future__ import annotations as _annotations
+
+import asyncio
+import contextlib
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable
+
+from pydantic_ai.messages import ModelMessage
+
+from question_graph_base import ask_question
+
+# (question, messages to append, ask history after appending them)
+_Prefetched = tuple[str, list[ModelMessage], list[ModelMessage]]
+
+
+@dataclass
+class PrefetchStats:
+    hits: int = 0
+    """Questions served from the buffer."""
+    misses: int = 0
+    """`take` calls that found a stale buffer or a failed generation and fell back to the model."""
+    wasted: int = 0
+    """Generations cancelled or discarded without being used."""
+
+    def to_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+class QuestionPrefetcher:
+    """Bounded buffer of questions generated ahead of time for one session.
+
+    Args:
+        depth: Maximum number of questions buffered or being generated.
+        ask: Generates a question from an ask history, `ask_question` by default.
+        slots: Optional semaphore shared with foreground model calls, to cap LLM concurrency.
+        stats: Counters to update, possibly shared between the prefetchers of many sessions.
+    """
+
+    def __init__(
+        self,
+        depth: int = 1,
+        *,
+        ask: Callable[[list[ModelMessage]], Awaitable[tuple[str, list[ModelMessage]]]] = ask_question,
+        slots: asyncio.Semaphore | None = None,
+        stats: PrefetchStats | None = None,
+    ):
+        self.depth = depth
+        self.stats = stats if stats is not None else PrefetchStats()
+        self._ask = ask
+        self._slots = slots
+        self._buffer: deque[asyncio.Task[_Prefetched]] = deque()
+        # The ask history the first buffered question continues, None when the buffer is empty
+        self._base: list[ModelMessage] | None = None
+
+    def _matches(self, history: list[ModelMessage]) -> bool:
+        # Histories only ever grow by appending, so length and last message identify them
+        base = self._base
+        return base is not None and len(base) == len(history) and (not history or base[-1] is history[-1])
+
+    def ready(self, history: list[ModelMessage]) -> bool:
+        """Whether `take(history)` will be served from the buffer (possibly after waiting)."""
+        return bool(self._buffer) and self._matches(history)
+
+    def fill(self, history: list[ModelMessage]) -> None:
+        """Start generating the questions that follow `history`, up to `depth` in the buffer.
+
+        Must be called from a running event loop.
+        """
+        if not self._matches(history):
+            self.cancel()
+            self._base = list(history)
+        while len(self._buffer) < self.depth:
+            previous = self._buffer[-1] if self._buffer else None
+            self._buffer.append(asyncio.create_task(self._generate(self._base, previous)))
+
+    async def _generate(
+        self, history: list[ModelMessage], previous: asyncio.Task[_Prefetched] | None
+    ) -> _Prefetched:
+        if previous is not None:
+            # continue the question being generated before this one
+            _, _, history = await previous
+        async with self._slots or contextlib.nullcontext():
+            question, messages = await self._ask(history)
+        return question, messages, history + messages
+
+    async def take(self, history: list[ModelMessage]) -> tuple[str, list[ModelMessage]] | None:
+        """The next prefetched question for `history`, or None if the model has to be called.
+
+        Returns:
+            The question and the messages to append to the ask history, as `ask_question` does.
+        """
+        if not self.ready(history):
+            if self._buffer:
+                self.stats.misses += 1
+            self.cancel()
+            return None
+        task = self._buffer.popleft()
+        try:
+            question, messages, after = await task
+        except Exception:
+            self.cancel()
+            self.stats.misses += 1
+            return None
+        self._base = after if self._buffer else None
+        self.stats.hits += 1
+        return question, messages
+
+    def cancel(self) -> None:
+        """Cancel all pending generations and empty the buffer."""
+        for task in self._buffer:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # a failed generation is dropped, not reported as unretrieved
+        self.stats.wasted += len(self._buffer)
+        self._buffer.clear()
+        self._base = None
@@ -0,0 +1,331 @@
+"""Concurrent session manager for the question graph.
+
+`question_graph_continuous.py` drives one `QuestionState` per process and blocks on `input()`.
+`SessionManager` hosts many independent quiz sessions on one event loop instead:
+
+- each session is keyed by id and holds its `QuestionState` and the node to run next;
+- answers advance their session as they arrive, different sessions run concurrently
+  (steps of one session are serialized by a per-session lock);
+- nodes that call the model (`Ask`, `Evaluate`) share a semaphore that caps LLM concurrency;
+- idle sessions are spilled to disk and restored transparently on their next answer;
+- with `prefetch_depth`, the next question is generated while the user is answering
+  (see `question_graph_prefetch.py`), so a wrong answer gets its next question without waiting
+  for `Ask`;
+- with an `eval_cache`, answers graded before (for the same question) skip the `Evaluate` model call;
+- a failed model call is re-raised without losing the session: after a failed `Evaluate` the
+  answer can be submitted again, a failed `Ask` is resumed with `retry`.
+"""
+from __future__ import annotations as _annotations
+
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+from pydantic_graph import BaseNode, End, Graph, NodeStep
+
+from question_graph_base import Answer, Ask, Evaluate, QuestionDeps, QuestionState, question_graph
+from question_graph_eval_cache import EvaluationCache
+from question_graph_prefetch import PrefetchStats, QuestionPrefetcher
+
+
+@dataclass
+class Session:
+    session_id: str
+    state: QuestionState
+    node: BaseNode[QuestionState, Any, Any] | End[Any]
+    """The node to run next; an `Answer` without an answer while waiting for the user."""
+    last_active: float
+    deps: QuestionDeps = field(default_factory=QuestionDeps, repr=False)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return isinstance(self.node, End)
+
+
+@dataclass
+class SessionReply:
+    session_id: str
+    question: str | None
+    """The question waiting for an answer, None once the session has finished."""
+    finished: bool
+    comment: str | None = None
+    """The evaluation comment for the submitted answer."""
+
+
+@dataclass
+class SessionStats:
+    started: int = 0
+    answers: int = 0
+    finished: int = 0
+    llm_calls: int = 0
+    llm_peak: int = 0
+    spilled: int = 0
+    restored: int = 0
+
+    def to_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+class SessionManager:
+    """Hosts many question graph sessions on one event loop.
+
+    Args:
+        graph: The question graph.
+        max_llm_concurrency: Maximum number of model-calling nodes running at once.
+        llm_nodes: Node types that call the model and need an LLM slot.
+        idle_timeout: Seconds without activity after which `evict_idle` spills a session to disk.
+        max_resident: Maximum sessions kept in memory; the least recently active are spilled first.
+        spill_dir: Directory for spilled sessions, one JSON file per session.
+        clock: Time source, `time.monotonic` by default.
+        prefetch_depth: Questions generated ahead per session while the user answers, 0 disables prefetch.
+            Prefetches share the LLM semaphore with foreground calls.
+        eval_cache: Optional evaluation cache shared by all sessions.
+    """
+
+    def __init__(
+        self,
+        graph: Graph[QuestionState, Any, Any] = question_graph,
+        *,
+        max_llm_concurrency: int = 16,
+        llm_nodes: tuple[type[BaseNode[Any, Any, Any]], ...] = (Ask, Evaluate),
+        idle_timeout: float = 600.0,
+        max_resident: int = 10_000,
+        spill_dir: Path | str = 'question_sessions',
+        clock: Callable[[], float] = time.monotonic,
+        prefetch_depth: int = 0,
+        eval_cache: EvaluationCache | None = None,
+    ):
+        self.graph = graph
+        self.llm_nodes = llm_nodes
+        self.idle_timeout = idle_timeout
+        self.max_resident = max_resident
+        self.spill_dir = Path(spill_dir)
+        self.clock = clock
+        self.prefetch_depth = prefetch_depth
+        self.eval_cache = eval_cache
+        self.stats = SessionStats()
+        self.prefetch_stats = PrefetchStats()
+        self._llm_slots = asyncio.Semaphore(max_llm_concurrency)
+        self._llm_in_flight = 0
+        # Resident sessions in least-recently-active order
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+
+    # -- public API -----------------------------------------------------------
+
+    async def start(self, session_id: str | None = None) -> SessionReply:
+        """Start a session and run it up to its first question."""
+        session_id = session_id or uuid.uuid4().hex
+        if session_id in self._sessions or self._spill_path(session_id).exists():
+            raise ValueError(f'session {session_id!r} already exists')
+        session = self._new_session(session_id, QuestionState(), Ask())
+        self._sessions[session_id] = session
+        self.stats.started += 1
+        async with session.lock:
+            await self._advance(session)
+            self._evict_over_capacity()
+            return self._reply(session)
+
+    async def answer(self, session_id: str, answer: str) -> SessionReply:
+        """Submit an answer and run the session up to its next question (or its end).
+
+        Raises:
+            KeyError: The session does not exist.
+            ValueError: The session is not waiting for an answer.
+        """
+        while True:
+            session = self._get(session_id)
+            async with session.lock:
+                if self._sessions.get(session_id) is not session:
+                    continue  # spilled while we were waiting for the lock
+                if not isinstance(session.node, Answer) or session.node.answer is not None:
+                    raise ValueError(f'session {session_id!r} is not waiting for an answer')
+                session.node = Answer(answer)
+                self.stats.answers += 1
+                comment = await self._advance(session)
+                return self._reply(session, comment)
+
+    async def retry(self, session_id: str) -> SessionReply:
+        """Resume a session whose last step failed (e.g. `Ask` raised on a model error).
+
+        A failed `Evaluate` needs no retry: the session waits for the answer to be submitted again.
+
+        Raises:
+            KeyError: The session does not exist.
+            ValueError: The session is waiting for an answer, or has finished.
+        """
+        while True:
+            session = self._get(session_id)
+            async with session.lock:
+                if self._sessions.get(session_id) is not session:
+                    continue  # spilled while we were waiting for the lock
+                if session.finished or (isinstance(session.node, Answer) and session.node.answer is None):
+                    raise ValueError(f'session {session_id!r} has no failed step to retry')
+                await self._advance(session)
+                return self._reply(session)
+
+    def get(self, session_id: str) -> SessionReply:
+        """The current question of a session, restoring it from disk if needed."""
+        return self._reply(self._get(session_id))
+
+    def close(self, session_id: str) -> None:
+        """Forget a session, in memory and on disk."""
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._cancel_prefetch(session)
+        self._spill_path(session_id).unlink(missing_ok=True)
+
+    @property
+    def resident(self) -> int:
+        return len(self._sessions)
+
+    # -- graph driving --------------------------------------------------------
+
+    def _new_session(self, session_id: str, state: QuestionState, node: BaseNode[QuestionState, Any, Any]) -> Session:
+        deps = QuestionDeps(eval_cache=self.eval_cache)
+        if self.prefetch_depth:
+            deps.prefetcher = QuestionPrefetcher(self.prefetch_depth, slots=self._llm_slots, stats=self.prefetch_stats)
+        return Session(session_id, state, node, self.clock(), deps)
+
+    @staticmethod
+    def _cancel_prefetch(session: Session) -> None:
+        if session.deps.prefetcher is not None:
+            session.deps.prefetcher.cancel()
+
+    def _needs_llm_slot(self, session: Session) -> bool:
+        node = session.node
+        if not isinstance(node, self.llm_nodes):
+            return False
+        # An Ask served from the prefetch buffer only waits; the generation holds its own slot
+        prefetcher = session.deps.prefetcher
+        if isinstance(node, Ask) and prefetcher is not None and prefetcher.ready(session.state.ask_agent_messages):
+            return False
+        # A cached grade needs no model call
+        cache = session.deps.eval_cache
+        return not (isinstance(node, Evaluate) and cache is not None and (session.state.question, node.answer) in cache)
+
+    async def _advance(self, session: Session) -> str | None:
+        """Run nodes until the session waits for an answer or ends, returning the last evaluation comment."""
+        comment = None
+        while not session.finished:
+            node = session.node
+            if isinstance(node, Answer) and node.answer is None:
+                break
+            # Congratulate / Reprimand carry the evaluation comment
+            comment = getattr(node, 'comment', comment)
+            try:
+                session.node = await self._run_node(session, node)
+            except BaseException:
+                # Nodes only update the state once their model call succeeded, so the session can
+                # go back: a failed Evaluate waits for the answer again, other nodes are kept for `retry`
+                if isinstance(node, Evaluate):
+                    session.node = Answer()
+                session.last_active = self.clock()
+                raise
+        session.last_active = self.clock()
+        if session.session_id in self._sessions:
+            self._sessions.move_to_end(session.session_id)
+        if session.finished:
+            self.stats.finished += 1
+            self._cancel_prefetch(session)
+        return comment
+
+    async def _run_node(
+        self, session: Session, node: BaseNode[QuestionState, Any, Any]
+    ) -> BaseNode[QuestionState, Any, Any] | End[Any]:
+        if not self._needs_llm_slot(session):
+            return await self.graph.next(node, [], state=session.state, deps=session.deps, infer_name=False)
+        async with self._llm_slots:
+            self._llm_in_flight += 1
+            self.stats.llm_calls += 1
+            self.stats.llm_peak = max(self.stats.llm_peak, self._llm_in_flight)
+            try:
+                return await self.graph.next(node, [], state=session.state, deps=session.deps, infer_name=False)
+            finally:
+                self._llm_in_flight -= 1
+
+    def _reply(self, session: Session, comment: str | None = None) -> SessionReply:
+        question = None if session.finished else session.state.question
+        return SessionReply(session.session_id, question, session.finished, comment)
+
+    # -- residency ------------------------------------------------------------
+
+    def _get(self, session_id: str) -> Session:
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._restore(session_id)
+            self._sessions[session_id] = session
+            self._evict_over_capacity()
+        self._sessions.move_to_end(session_id)
+        session.last_active = self.clock()
+        return session
+
+    def _spill_path(self, session_id: str) -> Path:
+        return self.spill_dir / f'{session_id}.json'
+
+    def _spill(self, session: Session) -> None:
+        """Write a session to disk and drop it from memory.
+
+        The state and the pending node are stored as a single `NodeStep`, reusing the
+        graph's history serialization.
+        """
+        del self._sessions[session.session_id]
+        # Prefetched questions are not persisted, the restored session asks again
+        self._cancel_prefetch(session)
+        if session.finished:
+            return
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        step = NodeStep(session.state, session.node, snapshot_state=self.graph.snapshot_state)
+        path = self._spill_path(session.session_id)
+        tmp = path.with_name(path.name + '.tmp')
+        tmp.write_bytes(self.graph.dump_history([step]))
+        os.replace(tmp, path)
+        self.stats.spilled += 1
+
+    def _restore(self, session_id: str) -> Session:
+        path = self._spill_path(session_id)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            raise KeyError(session_id) from None
+        step = self.graph.load_history(data)[0]
+        path.unlink(missing_ok=True)
+        self.stats.restored += 1
+        return self._new_session(session_id, step.state, step.node)
+
+    def _evictable(self, session: Session) -> bool:
+        return not session.lock.locked()
+
+    def _evict_over_capacity(self) -> None:
+        for session in list(self._sessions.values()):
+            if len(self._sessions) <= self.max_resident:
+                break
+            if self._evictable(session):
+                self._spill(session)
+
+    def evict_idle(self) -> int:
+        """Spill sessions idle for longer than `idle_timeout`; returns the number evicted.
+
+        Runs synchronously on the event loop, so no session can be touched half-way through.
+        """
+        deadline = self.clock() - self.idle_timeout
+        evicted = 0
+        for session in list(self._sessions.values()):
+            # Sessions are ordered by activity, the rest are more recent
+            if session.last_active > deadline:
+                break
+            if self._evictable(session):
+                self._spill(session)
+                evicted += 1
+        return evicted
+
+    async def run_evictor(self, interval: float = 30.0) -> None:
+        """Evict idle sessions every `interval` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            self.evict_idle()
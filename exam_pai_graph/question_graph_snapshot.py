@@ -0,0 +1,231 @@
+"""Binary snapshots of question graph history and state.
+
+`question_graph.dump_history(history, indent=2)` writes pretty-printed JSON, which is large and
+slow to write and parse. A snapshot stores the same data as msgpack instead:
+
+- the file starts with `MAGIC` and a msgpack header map (`version`, `kind`, `compression`, `steps`);
+- the body is a stream of msgpack records, one per `HistoryStep` (or one record for a state),
+  optionally compressed as a single zstd frame (needs the `zstandard` package);
+- history records are delta encoded like the `HistoryStore` log (`StepCodec`): each node step
+  stores only the messages appended since the previous one, so a snapshot grows with the
+  conversation instead of with steps x state size, and decoded states share their messages;
+- `iter_history` reads a snapshot step by step, without loading the whole file.
+
+`read_history` also accepts the JSON format, so callers don't need to know which one a file uses.
+"""
+from __future__ import annotations as _annotations
+
+import io
+import os
+import sys
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import IO, Any, Literal
+
+import msgpack
+import pydantic
+from pydantic_graph import Graph, HistoryStep
+
+from question_graph_history import StepCodec
+
+try:
+    import zstandard
+except ImportError:  # optional, only needed for compressed snapshots
+    zstandard = None
+
+MAGIC = b'QGSNAP'
+FORMAT_VERSION = 1
+ZSTD_LEVEL = 3
+
+Compression = Literal['zstd'] | None
+FORMATS = {
+    'json': None,
+    'msgpack': None,
+    'msgpack-zstd': 'zstd',
+}
+"""Formats selectable from the CLI, with the compression of the msgpack ones."""
+
+
+def format_for_path(path: Path | str) -> str:
+    """The format implied by a file name: `.json`, `.zst` (msgpack-zstd), anything else msgpack."""
+    suffix = Path(path).suffix
+    if suffix == '.json':
+        return 'json'
+    if suffix == '.zst':
+        return 'msgpack-zstd'
+    return 'msgpack'
+
+
+def _zstd() -> Any:
+    if zstandard is None:
+        raise ImportError('zstd compressed snapshots need the zstandard package: pip install zstandard')
+    return zstandard
+
+
+# -- writing ------------------------------------------------------------------
+
+
+def _write_records(
+    f: IO[bytes], kind: str, records: Iterable[Any], count: int, compression: Compression
+) -> None:
+    if compression not in (None, 'zstd'):
+        raise ValueError(f'unknown snapshot compression: {compression!r}')
+    packer = msgpack.Packer(use_bin_type=True)
+    f.write(MAGIC)
+    f.write(packer.pack({'version': FORMAT_VERSION, 'kind': kind, 'compression': compression, 'steps': count}))
+    if compression == 'zstd':
+        with _zstd().ZstdCompressor(level=ZSTD_LEVEL).stream_writer(f, closefd=False) as writer:
+            for record in records:
+                writer.write(packer.pack(record))
+    else:
+        for record in records:
+            f.write(packer.pack(record))
+
+
+def dump_history(
+    graph: Graph[Any, Any, Any], history: list[HistoryStep[Any, Any]], *, compression: Compression = None
+) -> bytes:
+    """Serialize a graph history as a snapshot.
+
+    Args:
+        graph: The graph the history belongs to.
+        history: The history steps.
+        compression: None, or `'zstd'` to compress the body.
+    """
+    f = io.BytesIO()
+    records = _codec(graph).dump(history)
+    _write_records(f, 'history', records, len(records), compression)
+    return f.getvalue()
+
+
+def dump_state(state: Any, *, compression: Compression = None) -> bytes:
+    """Serialize a graph state (e.g. `QuestionState`) as a snapshot."""
+    record = _state_adapter(type(state)).dump_python(state, mode='json')
+    f = io.BytesIO()
+    _write_records(f, 'state', [record], 1, compression)
+    return f.getvalue()
+
+
+def write_history(
+    path: Path | str,
+    graph: Graph[Any, Any, Any],
+    history: list[HistoryStep[Any, Any]],
+    *,
+    format: str | None = None,
+) -> int:
+    """Write a history file in one of `FORMATS`, replacing it atomically.
+
+    Args:
+        path: The file to write.
+        graph: The graph the history belongs to.
+        history: The history steps.
+        format: One of `FORMATS`, by default implied by the file name (see `format_for_path`).
+
+    Returns:
+        The size of the file.
+    """
+    path = Path(path)
+    format = format or format_for_path(path)
+    if format not in FORMATS:
+        raise ValueError(f"unknown history format {format!r}, choose from: {', '.join(FORMATS)}")
+    tmp = path.with_name(path.name + '.tmp')
+    try:
+        with open(tmp, 'wb') as f:
+            if format == 'json':
+                f.write(graph.dump_history(history, indent=2))
+            else:
+                records = _codec(graph).dump(history)
+                _write_records(f, 'history', records, len(records), FORMATS[format])
+            size = f.tell()
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    os.replace(tmp, path)
+    return size
+
+
+# -- reading ------------------------------------------------------------------
+
+
+def is_snapshot(data: bytes) -> bool:
+    return data.startswith(MAGIC)
+
+
+def _open_records(f: IO[bytes], kind: str) -> tuple[dict[str, Any], Iterator[Any]]:
+    """Check the magic and header of a snapshot, and return the header and its record stream."""
+    start = f.tell()
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError('not a question graph snapshot')
+    unpacker = msgpack.Unpacker(f, raw=False)
+    try:
+        header = next(unpacker)
+    except StopIteration:
+        raise ValueError('truncated snapshot header') from None
+    if not isinstance(header, dict):
+        raise ValueError('corrupt snapshot header')
+    if header.get('version', 0) > FORMAT_VERSION:
+        raise ValueError(f'snapshot format version {header["version"]} is newer than this reader ({FORMAT_VERSION})')
+    if header.get('kind') != kind:
+        raise ValueError(f'expected a {kind} snapshot, got {header.get("kind")!r}')
+    if header.get('compression') == 'zstd':
+        # The header was read through the unpacker's buffer; continue from the end of it
+        f.seek(start + len(MAGIC) + unpacker.tell())
+        reader = _zstd().ZstdDecompressor().stream_reader(f, closefd=False)
+        return header, iter(msgpack.Unpacker(reader, raw=False))
+    if header.get('compression') is not None:
+        raise ValueError(f'unknown snapshot compression: {header["compression"]!r}')
+    return header, unpacker
+
+
+def iter_history(graph: Graph[Any, Any, Any], f: IO[bytes]) -> Iterator[HistoryStep[Any, Any]]:
+    """Decode the steps of a history snapshot one at a time.
+
+    Args:
+        graph: The graph the history belongs to.
+        f: A seekable binary file positioned at the start of the snapshot.
+    """
+    header, records = _open_records(f, 'history')
+    count = 0
+    for step in _codec(graph).load(records):
+        count += 1
+        yield step
+    if count != header['steps']:
+        raise ValueError(f'truncated snapshot: {count} of {header["steps"]} steps')
+
+
+def load_history(graph: Graph[Any, Any, Any], data: bytes) -> list[HistoryStep[Any, Any]]:
+    """Decode a history snapshot, or `dump_history` JSON."""
+    if not is_snapshot(data):
+        return graph.load_history(data)
+    return list(iter_history(graph, io.BytesIO(data)))
+
+
+def read_history(graph: Graph[Any, Any, Any], path: Path | str) -> list[HistoryStep[Any, Any]]:
+    """Read a history file in any of `FORMATS`."""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            f.seek(0)
+            return graph.load_history(f.read())
+        f.seek(0)
+        return list(iter_history(graph, f))
+
+
+def load_state(data: bytes, state_type: type[Any]) -> Any:
+    """Decode a state snapshot written by `dump_state`."""
+    _, records = _open_records(io.BytesIO(data), 'state')
+    return _state_adapter(state_type).validate_python(next(records))
+
+
+def _codec(graph: Graph[Any, Any, Any]) -> StepCodec:
+    # A snapshot is read sequentially, so the first node step is its only keyframe
+    return StepCodec(graph, keyframe_interval=sys.maxsize)
+
+
+_state_adapters: dict[type[Any], pydantic.TypeAdapter[Any]] = {}
+
+
+def _state_adapter(state_type: type[Any]) -> pydantic.TypeAdapter[Any]:
+    adapter = _state_adapters.get(state_type)
+    if adapter is None:
+        adapter = _state_adapters[state_type] = pydantic.TypeAdapter(state_type)
+    return adapter
@@ -0,0 +1,270 @@
+"""Per-node tracing for question graph runs, fully offline.
+
+The graph runs inside a single logfire span, which says nothing about how the time of a step
+splits between nodes, model calls and history serialization (and needs a logfire token to be
+looked at). `GraphTracer` records that locally:
+
+- `tracer.next(graph, node, history, state=...)` wraps `Graph.next` in a span named after the
+  node, then times the serialization of the steps it appended (`graph.dump_history`);
+- `with tracer.instrument(ask_agent=ask_agent, evaluate_agent=evaluate_agent):` wraps the agents'
+  models (or the ones given in `models=`), so every model request becomes a child span with its
+  latency and token usage;
+- `tracer.span(name)` times anything else, e.g. `HistoryStore.append`.
+
+Export with `write_chrome_trace(path)` (chrome://tracing, Perfetto) or `write_speedscope(path)`
+(https://www.speedscope.app), and print `summary()` for a text table per span name.
+"""
+from __future__ import annotations as _annotations
+
+import contextlib
+import contextvars
+import json
+import time
+from collections import defaultdict
+from collections.abc import AsyncIterator, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelMessage, ModelResponse
+from pydantic_ai.models import AgentModel, Model, ModelSettings, StreamedResponse, infer_model
+from pydantic_ai.result import Usage
+from pydantic_graph import BaseNode, End, Graph, HistoryStep
+
+_track: contextvars.ContextVar[str] = contextvars.ContextVar('question_graph_trace_track', default='main')
+
+
+@dataclass
+class Span:
+    name: str
+    category: str
+    track: str
+    start: float
+    """Seconds since the tracer was created."""
+    end: float = 0.0
+    args: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class GraphTracer:
+    """Records spans for graph nodes, model requests and serialization.
+
+    Args:
+        name: Name of the trace, used as the process / profile name in exports.
+    """
+
+    def __init__(self, name: str = 'question graph'):
+        self.name = name
+        self.spans: list[Span] = []
+        self._origin = time.perf_counter()
+
+    def _now(self) -> float:
+        return time.perf_counter() - self._origin
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str = 'app', **args: Any) -> Iterator[Span]:
+        """Time a block; the yielded span's `args` can be filled in before it ends."""
+        span = Span(name, category, _track.get(), self._now(), args=args)
+        try:
+            yield span
+        finally:
+            span.end = self._now()
+            self.spans.append(span)
+
+    @contextlib.contextmanager
+    def track(self, name: str) -> Iterator[None]:
+        """Record the spans of this block (and of tasks it starts) on their own track, e.g. per session."""
+        token = _track.set(name)
+        try:
+            yield
+        finally:
+            _track.reset(token)
+
+    async def next(
+        self,
+        graph: Graph[Any, Any, Any],
+        node: BaseNode[Any, Any, Any],
+        history: list[HistoryStep[Any, Any]],
+        **kwargs: Any,
+    ) -> BaseNode[Any, Any, Any] | End[Any]:
+        """`graph.next(node, history, **kwargs)` in a span named after the node.
+
+        The steps appended to `history` are then serialized with `graph.dump_history` in a
+        `serialize` span, which measures the state-serialization cost of the step.
+        """
+        before = len(history)
+        with self.span(type(node).__name__, 'node') as span:
+            result = await graph.next(node, history, **kwargs)
+            span.args['next'] = type(result).__name__
+        new_steps = history[before:]
+        if new_steps:
+            with self.span('serialize', 'serialize', steps=len(new_steps)) as span:
+                span.args['bytes'] = len(graph.dump_history(new_steps))
+        return result
+
+    @contextlib.contextmanager
+    def instrument(self, *, models: dict[str, Model] | None = None, **agents: Agent[Any, Any]) -> Iterator[None]:
+        """Trace the model requests of the agents while the block runs (via `Agent.override`).
+
+        The tracing override replaces any override already active on an agent, so a caller that
+        overrides an agent's model (e.g. with a test model) passes that model in `models`.
+
+        Args:
+            models: The models to trace by span name, for agents not using their own `model`.
+            agents: The agents by span name, e.g. `ask_agent=ask_agent`.
+        """
+        models = models or {}
+        with contextlib.ExitStack() as stack:
+            for label, agent in agents.items():
+                model = models[label] if label in models else infer_model(agent.model)
+                stack.enter_context(agent.override(model=TracingModel(model, self, label)))
+            yield
+
+    # -- reports --------------------------------------------------------------
+
+    def summary(self) -> str:
+        """A text table per span name: count, total, mean and max time, share of the traced time, tokens."""
+        groups: dict[tuple[str, str], list[Span]] = defaultdict(list)
+        for span in self.spans:
+            groups[(span.category, span.name)].append(span)
+        wall = (max(s.end for s in self.spans) - min(s.start for s in self.spans)) if self.spans else 0.0
+        lines = [
+            f'{"category":<10} {"name":<28} {"count":>6} {"total ms":>10} {"mean ms":>9} {"max ms":>9} '
+            f'{"% wall":>7} {"tokens in/out":>15}',
+        ]
+        for (category, name), spans in sorted(groups.items(), key=lambda item: -sum(s.duration for s in item[1])):
+            total = sum(s.duration for s in spans)
+            tokens = ''
+            if category == 'model':
+                tokens_in = sum(s.args.get('request_tokens') or 0 for s in spans)
+                tokens_out = sum(s.args.get('response_tokens') or 0 for s in spans)
+                tokens = f'{tokens_in}/{tokens_out}'
+            lines.append(
+                f'{category:<10} {name:<28} {len(spans):>6} {total * 1000:>10.1f} {total / len(spans) * 1000:>9.2f} '
+                f'{max(s.duration for s in spans) * 1000:>9.2f} {total / wall * 100 if wall else 0:>6.1f}% {tokens:>15}'
+            )
+        lines.append(f'wall time {wall * 1000:.1f} ms, {len(self.spans)} spans')
+        return '\n'.join(lines)
+
+    def chrome_trace(self) -> dict[str, Any]:
+        """The spans in Chrome trace event format, one thread per track."""
+        tids = {track: i for i, track in enumerate(dict.fromkeys(s.track for s in self.spans), start=1)}
+        events: list[dict[str, Any]] = [
+            {'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': self.name}},
+            *({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'name': track}} for track, tid in tids.items()),
+        ]
+        for span in sorted(self.spans, key=lambda s: (s.start, -s.end)):
+            events.append({
+                'name': span.name,
+                'cat': span.category,
+                'ph': 'X',
+                'ts': round(span.start * 1e6, 3),
+                'dur': round(span.duration * 1e6, 3),
+                'pid': 1,
+                'tid': tids[span.track],
+                'args': span.args,
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def speedscope(self) -> dict[str, Any]:
+        """The spans as speedscope evented profiles, one per track.
+
+        Speedscope needs properly nested events, so spans that overlap without nesting
+        (e.g. a background prefetch outliving its node) go to an extra lane of the track.
+        """
+        frames: dict[str, int] = {}
+        profiles = []
+        by_track: dict[str, list[Span]] = defaultdict(list)
+        for span in self.spans:
+            by_track[span.track].append(span)
+        for track, spans in by_track.items():
+            for lane_index, lane in enumerate(_nested_lanes(spans)):
+                events = []
+                for span in lane:
+                    frame = frames.setdefault(span.name, len(frames))
+                    end = max(span.end, span.start + 1e-9)  # a close must sort after its open
+                    events.append((span.start, 1, -end, {'type': 'O', 'frame': frame, 'at': span.start * 1000}))
+                    events.append((end, 0, -span.start, {'type': 'C', 'frame': frame, 'at': end * 1000}))
+                events.sort(key=lambda e: e[:3])
+                profiles.append({
+                    'type': 'evented',
+                    'name': track if lane_index == 0 else f'{track} ({lane_index + 1})',
+                    'unit': 'milliseconds',
+                    'startValue': min(s.start for s in lane) * 1000,
+                    'endValue': max(max(s.end, s.start + 1e-9) for s in lane) * 1000,
+                    'events': [e[3] for e in events],
+                })
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': self.name,
+            'exporter': 'question_graph_trace',
+            'shared': {'frames': [{'name': name} for name in frames]},
+            'profiles': profiles,
+        }
+
+    def write_chrome_trace(self, path: Path | str) -> None:
+        Path(path).write_text(json.dumps(self.chrome_trace()))
+
+    def write_speedscope(self, path: Path | str) -> None:
+        Path(path).write_text(json.dumps(self.speedscope()))
+
+
+def _nested_lanes(spans: list[Span]) -> list[list[Span]]:
+    """Split spans into lanes in which every pair of spans is either nested or disjoint."""
+    lanes: list[list[Span]] = []
+    stacks: list[list[Span]] = []
+    for span in sorted(spans, key=lambda s: (s.start, -s.end)):
+        for lane, stack in zip(lanes, stacks):
+            while stack and stack[-1].end <= span.start:
+                stack.pop()
+            if not stack or span.end <= stack[-1].end:
+                break
+        else:
+            lane, stack = [], []
+            lanes.append(lane)
+            stacks.append(stack)
+        lane.append(span)
+        stack.append(span)
+    return lanes
+
+
+class TracingModel(Model):
+    """Wraps a model so that every request is recorded as a `model` span."""
+
+    def __init__(self, model: Model, tracer: GraphTracer, label: str):
+        self.wrapped = model
+        self.tracer = tracer
+        self.label = label
+
+    async def agent_model(self, **kwargs: Any) -> AgentModel:
+        return TracingAgentModel(await self.wrapped.agent_model(**kwargs), self.tracer, self.label)
+
+    def name(self) -> str:
+        return self.wrapped.name()
+
+
+class TracingAgentModel(AgentModel):
+    def __init__(self, wrapped: AgentModel, tracer: GraphTracer, label: str):
+        self.wrapped = wrapped
+        self.tracer = tracer
+        self.label = label
+
+    async def request(
+        self, messages: list[ModelMessage], model_settings: ModelSettings | None
+    ) -> tuple[ModelResponse, Usage]:
+        with self.tracer.span(self.label, 'model', messages=len(messages)) as span:
+            response, usage = await self.wrapped.request(messages, model_settings)
+            span.args.update(request_tokens=usage.request_tokens, response_tokens=usage.response_tokens)
+        return response, usage
+
+    @contextlib.asynccontextmanager
+    async def request_stream(
+        self, messages: list[ModelMessage], model_settings: ModelSettings | None
+    ) -> AsyncIterator[StreamedResponse]:
+        with self.tracer.span(self.label, 'model', messages=len(messages), stream=True):
+            async with self.wrapped.request_stream(messages, model_settings) as response:
+                yield response
@@ -0,0 +1,143 @@
+"""Bounded message history for the question graph agents.
+
+`QuestionState.ask_agent_messages` and `evaluate_agent_messages` keep every exchange of the
+session (they are the graph history, and `HistoryStore` stores them as deltas). Sending all of
+it to the model makes every round's prompt longer than the last, so the agents get a window:
+
+- the last `keep_exchanges` exchanges are sent verbatim (an exchange starts at a request with
+  a user prompt and runs until the next one, tool calls and returns included);
+- the text of the dropped responses is condensed into one system prompt part, e.g. the
+  questions asked earlier, so the ask agent still avoids repeating them;
+- the whole window is trimmed to `max_tokens` (estimated), dropping the oldest exchanges and
+  then the oldest summary lines first;
+- system prompt parts of the first request are always kept.
+"""
+from __future__ import annotations as _annotations
+
+import dataclasses
+from dataclasses import dataclass
+from typing import Callable
+
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    SystemPromptPart,
+    TextPart,
+    ToolCallPart,
+    UserPromptPart,
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English), no tokenizer needed."""
+    return (len(text) + 3) // 4
+
+
+def message_text(message: ModelMessage) -> str:
+    """The text content of a message, as counted against the token budget."""
+    texts = []
+    for part in message.parts:
+        if isinstance(part, ToolCallPart):
+            texts.append(part.args_as_json_str())
+        else:
+            content = getattr(part, 'content', '')
+            texts.append(content if isinstance(content, str) else str(content))
+    return '\n'.join(texts)
+
+
+def split_exchanges(messages: list[ModelMessage]) -> list[list[ModelMessage]]:
+    """Split a message history into exchanges, each starting at a request with a user prompt."""
+    exchanges: list[list[ModelMessage]] = []
+    for message in messages:
+        starts = isinstance(message, ModelRequest) and any(isinstance(p, UserPromptPart) for p in message.parts)
+        if starts or not exchanges:
+            exchanges.append([])
+        exchanges[-1].append(message)
+    return exchanges
+
+
+@dataclass
+class MessageWindow:
+    """Window policy for an agent's message history.
+
+    Args:
+        keep_exchanges: Exchanges sent verbatim, the most recent ones.
+        max_tokens: Hard budget for the whole window (system prompt, summary and exchanges).
+        summary_title: Heading of the summary of dropped exchanges, None to drop them without a summary.
+        summary_line_chars: Each summarized response is cut to this many characters.
+        count_tokens: Token estimate for a text, `estimate_tokens` by default.
+    """
+
+    keep_exchanges: int = 4
+    max_tokens: int = 2000
+    summary_title: str | None = None
+    summary_line_chars: int = 200
+    count_tokens: Callable[[str], int] = estimate_tokens
+
+    def apply(self, messages: list[ModelMessage]) -> list[ModelMessage]:
+        """The messages to send as `message_history`; `messages` itself is not modified."""
+        exchanges = split_exchanges(messages)
+        system_parts = []
+        if messages and isinstance(messages[0], ModelRequest):
+            system_parts = [p for p in messages[0].parts if isinstance(p, SystemPromptPart)]
+        if len(exchanges) <= self.keep_exchanges and self._tokens(messages) <= self.max_tokens:
+            return messages
+
+        kept = exchanges[-self.keep_exchanges:] if self.keep_exchanges > 0 else []
+        dropped = exchanges[:len(exchanges) - len(kept)]
+        budget = self.max_tokens - sum(self.count_tokens(p.content) for p in system_parts)
+        # Drop the oldest kept exchanges until they fit, the summary gets what is left
+        while kept and sum(self._tokens(exchange) for exchange in kept) > budget:
+            dropped.append(kept.pop(0))
+        budget -= sum(self._tokens(exchange) for exchange in kept)
+
+        prefix_parts = list(system_parts)
+        summary = self._summary(dropped, budget)
+        if summary:
+            prefix_parts.append(SystemPromptPart(summary))
+        window = [message for exchange in kept for message in exchange]
+        if not prefix_parts:
+            return window
+        if window and isinstance(window[0], ModelRequest):
+            first = window[0]
+            own_parts = [p for p in first.parts if not isinstance(p, SystemPromptPart)]
+            window[0] = dataclasses.replace(first, parts=[*prefix_parts, *own_parts])
+        else:
+            window.insert(0, ModelRequest(parts=prefix_parts))
+        return window
+
+    def _tokens(self, messages: list[ModelMessage]) -> int:
+        return sum(self.count_tokens(message_text(message)) for message in messages)
+
+    def _summary(self, dropped: list[list[ModelMessage]], budget: int) -> str | None:
+        """One line per dropped response text, the most recent lines that fit in `budget`."""
+        if self.summary_title is None or not dropped:
+            return None
+        lines = []
+        for exchange in dropped:
+            for message in exchange:
+                if isinstance(message, ModelResponse):
+                    text = ' '.join(p.content for p in message.parts if isinstance(p, TextPart)).strip()
+                    if text:
+                        lines.append('- ' + ' '.join(text.split())[:self.summary_line_chars])
+        budget -= self.count_tokens(self.summary_title)
+        kept: list[str] = []
+        for line in reversed(lines):
+            cost = self.count_tokens(line) + 1
+            if cost > budget:
+                break
+            kept.append(line)
+            budget -= cost
+        if not kept:
+            return None
+        return '\n'.join([self.summary_title, *reversed(kept)])
+
+
+# Only a window of each agent's history is sent, so prompts stay the same size over long sessions
+ASK_WINDOW = MessageWindow(
+    keep_exchanges=4,
+    max_tokens=1500,
+    summary_title='Questions already asked, do not ask them again:',
+)
+EVALUATE_WINDOW = MessageWindow(keep_exchanges=2, max_tokens=1500)
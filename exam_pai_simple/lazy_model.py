@@ -0,0 +1,29 @@
+from typing import Callable
+
+from pydantic_ai.models import AgentModel, Model
+
+
+class LazyModel(Model):
+    """Model proxy that builds the real model (openai client + http client) on first use.
+
+    Importing `openai` and constructing clients is the bulk of our startup time, so agents
+    created at module level hold this proxy and pay that cost on their first run instead.
+    Only depends on `pydantic_ai.models`, so importing it is cheap.
+    """
+
+    def __init__(self, factory: Callable[[], Model], model_name: str):
+        self._factory = factory
+        self._model_name = model_name
+        self._model: Model | None = None
+
+    @property
+    def model(self) -> Model:
+        if self._model is None:
+            self._model = self._factory()
+        return self._model
+
+    async def agent_model(self, **kwargs) -> AgentModel:
+        return await self.model.agent_model(**kwargs)
+
+    def name(self) -> str:
+        return self._model_name